@@ -9,16 +9,30 @@ If Python and Arcade are installed, this example can be run from the command lin
 python -m arcade.examples.sprite_move_animation
 """
 import argparse
-import math
-import random
 import sys
-from typing import List, Tuple
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
 
 import arcade
-import pandas as pd
-from pandas import DataFrame
+import numpy as np
 from pyglet import media
 
+from assets import AssetLoader, NoMusic, PreloadedMusic, StartupTimer, StreamingMusic, format_rss
+from checkpoint import CHECKPOINT_FILE, CheckpointError, CheckpointWriter, read_checkpoint, roster_digest
+from eventlog import EVENT_LOG_FILE, DrawSettings, EventLogError, EventLogWriter, TickRecord, read_log, same_hits
+from lod import LOD_FULL, LOD_POINTS, CoinPoints, choose_detail, labelled_coins
+from pacing import DurationController, parse_duration
+from profiling import PHASES, FrameProfiler, NullProfiler
+from roster import Roster, RosterError, load_roster
+from simulation import (ChaserTable, Hits, Simulation, PLAYER_SCALE, TIER_BRASS, TIER_NORMAL, TIER_ORANGE, TIER_RED,
+                        WALK_FRAMES, fast_draw, format_winners, map_prizes_to_winners, read_prizes, write_winners)
+
+if TYPE_CHECKING:
+    # Only needed with --feed, --record or --worker, and then imported there
+    from feed import EventFeed
+    from recorder import FrameRecorder
+    from worker import SimulationWorker
+
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 600
 SCREEN_TITLE = "Weihnachtstombola 2020 - es kann nur eine(n) geben. Plus neun andere."
@@ -35,29 +49,61 @@ GAME_SOUND = DEMOLITION_RACE
 WINNERS_SOUND = RADAR
 GAME_OVER_SOUND = DONT_BELIEVE_IN_LOVE
 
+COIN_IMAGE = ":resources:images/items/gold_1.png"
 COIN_SCALE = 0.5
 # DEBUG_COIN_COUNT must be more than 10, otherwise game screen is never shown
 DEBUG_COIN_COUNT = 15
-CHARACTER_SCALING = 1
-
-COIN_DIAMETER = 10
 
-# How fast to move, and how fast to run the animation
-MOVEMENT_SPEED = 8
-UPDATES_PER_FRAME = 5
-MABEL_SPEED = MOVEMENT_SPEED
+# Movement speed, hit boxes and coin padding are game rules and live in simulation.py
 
-PLAYER_SCALE = 1.2
+# Images from Kenney.nl's Asset Pack 3, path and file name prefix for each chaser
+# Characters of the chasers, taken in turn. The first two chase the coins by default.
+CHARACTER_PATHS = {
+    'Mabel': ":resources:images/animated_characters/female_adventurer/femaleAdventurer",
+    'Robin': ":resources:images/animated_characters/male_adventurer/maleAdventurer",
+    'Greta': ":resources:images/animated_characters/female_person/femalePerson",
+    'Paul': ":resources:images/animated_characters/male_person/malePerson",
+    'Zombie': ":resources:images/animated_characters/zombie/zombie",
+    'Robot': ":resources:images/animated_characters/robot/robot",
+}
+DEFAULT_CHASER_COUNT = 2
 
 # Volume of the background music
 VOLUME = 0.01
 
-# Constants used to track if the player is facing left or right
-RIGHT_FACING = 0
-LEFT_FACING = 1
+# Font size and colour of the names on the coins
+LABEL_FONT_SIZE = 12
+LABEL_COLOR = arcade.color.WHITE
+
+# Rows of the winners list on screen at once, more winners scroll
+WINNER_ROWS = 10
+WINNER_FONT_SIZE = 20
+
+# Seconds of the winners list at the end of a recording
+RECORD_WINNERS_SECONDS = 15
+
+# Longest recording of a draw whose length is not known in advance, and how much longer than planned a draw with
+# a known length may run, before the recording is given up
+RECORD_MAX_SECONDS = 2 * 60 * 60
+RECORD_OVERTIME = 2
+
+# Tint of a coin for each colour tier of the simulation
+TIER_COLORS = {
+    TIER_NORMAL: arcade.color.WHITE,
+    TIER_BRASS: arcade.color.BRASS,
+    TIER_ORANGE: arcade.color.ORANGE_PEEL,
+    TIER_RED: arcade.color.CANDY_APPLE_RED,
+}
+
+# Frames between two refreshes of the frame times on the F3 overlay, twice a second at 60 frames per second
+PROFILE_REFRESH_FRAMES = 30
+
+# Ticks between two choices of the names shown when not all of them are
+LABEL_REFRESH_TICKS = 6
+
+# Coin sprites created per frame when the points give way to sprites, so the switch does not stall a frame
+COIN_SPRITES_PER_FRAME = 400
 
-# Padding for the coins
-PADDING = 25
 
 def is_debug():
     """
@@ -73,30 +119,104 @@ def is_debug():
         return sys.gettrace()
 
 
-def load_texture_pair(filename):
+class LabelCache:
     """
-    Load a texture pair, with the second being a mirror image.
-    :param filename: absolute path to textures
-    :return: none
+    Text textures rendered once and reused, keyed by text and font size.
+    Counts hits and misses so the cache can be checked.
     """
-    return [
-        arcade.load_texture(filename),
-        arcade.load_texture(filename, flipped_horizontally=True)
-    ]
+
+    def __init__(self):
+        self.textures: Dict[Tuple[str, float], arcade.Texture] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str, font_size: float = LABEL_FONT_SIZE) -> arcade.Texture:
+        """
+        Texture for a piece of text, rasterised on first use only.
+        :param text: text to render
+        :param font_size: size of the text
+        """
+        key = (text, font_size)
+        texture = self.textures.get(key)
+        if texture is None:
+            self.misses += 1
+            image = arcade.get_text_image(text, LABEL_COLOR, font_size)
+            texture = arcade.Texture(f"label-{font_size}-{text}", image, hit_box_algorithm="None")
+            self.textures[key] = texture
+        else:
+            self.hits += 1
+        return texture
+
+    def sprite(self, text: str, left: float, bottom: float, font_size: float = LABEL_FONT_SIZE) -> arcade.Sprite:
+        """ Sprite showing a cached text, placed like draw_text with anchor left/baseline """
+        sprite = arcade.Sprite()
+        sprite.texture = self.get(text, font_size)
+        sprite.left = left
+        sprite.bottom = bottom
+        return sprite
+
+    def __str__(self):
+        return f"Label cache: {len(self.textures)} textures, {self.hits} hits, {self.misses} misses"
+
+
+# Name textures are shared by all views and survive a restart of the game
+label_cache = LabelCache()
+
+
+def text_sprite(text: str, start_x: float, start_y: float, color: arcade.Color, font_size: float, width: int = 0,
+                align: str = "left", anchor_x: str = "left") -> arcade.Sprite:
+    """
+    Sprite showing a text, placed like draw_text with anchor_y baseline, but not drawn.
+    Views put their fixed texts into a SpriteList once and then draw them all in one call per frame.
+    :param text: text to show
+    :param start_x: x coordinate of the anchor
+    :param start_y: y coordinate of the lower edge of the text
+    :param color: colour of the text
+    :param font_size: size of the text
+    :param width: width of the text box, used with align
+    :param align: alignment of the lines within the text box
+    :param anchor_x: left, center or right
+    """
+    image = arcade.get_text_image(text, color, font_size, width=width, align=align)
+    sprite = arcade.Sprite()
+    sprite.texture = arcade.Texture(f"text-{font_size}-{width}-{align}-{color}-{text}", image,
+                                    hit_box_algorithm="None")
+    if anchor_x == "center":
+        sprite.center_x = start_x
+    elif anchor_x == "right":
+        sprite.right = start_x
+    else:
+        sprite.left = start_x
+    sprite.bottom = start_y
+    return sprite
 
 
 class MyConfig:
     """
     Configuration used by practically all views.
-    :param lose: data frame of player names and number of lives
+    :param roster: player names and number of lives
     :param winners: list of winners, filled at end of game
     :return: none
     """
 
     volume: float  # Volume of the sound, between 0 and 1
-
-    def __init__(self, lose: DataFrame, prizes: List[str], winners: list = None):
-        self.lose = lose
+    assets: AssetLoader  # Sounds and textures, shared by all views
+    music: Union[PreloadedMusic, StreamingMusic, NoMusic]  # Plays the background music of the views
+    profile: Optional[str]  # CSV file for the frame times of the game, None when not profiling
+    chasers: int  # Number of chasers at the start of the game
+    duration: Optional[float]  # Target duration of the game in seconds, None to play at MOVEMENT_SPEED
+    checkpoint: str  # File the game state is saved to every few seconds
+    resume_state: Optional[Dict[str, np.ndarray]]  # Saved game state to continue from, None for a new draw
+    seed: int  # Seed of the draw
+    event_log: str  # File every tick of the draw is logged to
+    replay: Optional[Tuple[DrawSettings, List[TickRecord]]]  # Logged draw to show again, None to play a new one
+    replay_speed: float  # Speed multiplier of a replay
+    feed: Optional["EventFeed"]  # Live feed of the draw for remote audiences, None when not published
+    worker: bool  # Run the draw in a worker process, see worker.py
+    fail: Callable[[str], None]  # Reports an error at the start of the draw like a wrong option, and exits
+
+    def __init__(self, roster: Roster, prizes: List[str], winners: list = None):
+        self.roster = roster
         self.prizes = prizes
 
         # Actually want an empty list as a default, but that leads to mutable errors
@@ -111,166 +231,104 @@ class MyView(arcade.View):
     Standard members for the views.
     :param config: configuration for the view (e.g. list of player names)
     :param next_view: view to move on to when this one is done, None if end of game.
+    :param sound_file: background music of the view
     :return: none
     """
 
-    def __init__(self, config: MyConfig, next_view=None):
+    def __init__(self, config: MyConfig, next_view=None, sound_file: str = None):
         super().__init__()
         self.config = config
         self.next_view = next_view
 
+        """ Music is loaded in the background, flag that currently no music playing"""
+        self.sound_file = sound_file
+        self.music_playing: media.Player = None
+
+    def play_music(self, loop: bool = True):
+        """ Start the music of this view, as soon as it has been loaded """
+        if self.music_playing is None and self.sound_file is not None:
+            self.music_playing = self.config.music.play(self.sound_file, self.config.volume, loop)
+
+    def stop_music(self):
+        if self.music_playing is not None:
+            self.config.music.stop(self.sound_file, self.music_playing)
+            self.music_playing = None
+
 
 class MyCoin(arcade.Sprite):
     """
     Standard members for the coins.
-    :param filename: filename for sprite data
+    :param texture: texture shared by all coins
     :param scale: scaling for sprite.
-    :param name: player name to attach to the coin
-    :param lives: number of lives the player has (equals number of tickets bought).
+    :param index: index of the coin in the simulation, the name and lives are looked up there
     :return: none
     """
 
-    def __init__(self, filename: str = None, scale: float = 1, name: str = None, lives: int = 0):
+    def __init__(self, texture: arcade.Texture, scale: float = 1, index: int = 0):
         # Set up parent class
-        super().__init__(filename, scale)
-        self.name = name
-        self.lives = lives
+        super().__init__(scale=scale)
+        self.texture = texture
+        self.index = index
 
 
 class PlayerCharacter(arcade.Sprite):
     """
-    Characteristics for Mabel. Mabel is the figure who collects the coins.
+    Sprite for Mabel. Mabel is the figure who collects the coins.
+    Movement and animation state come from a row of a simulation.ChaserTable, this class only picks textures.
+    :param chasers: chasers in the simulation
+    :param index: row of the chaser to render
     """
 
-    def __init__(self, character: str = 'Mabel'):
+    def __init__(self, chasers: ChaserTable, index: int, assets: AssetLoader):
 
         # Set up parent class
         super().__init__()
 
-        # Default to face-right
-        self.character_face_direction = RIGHT_FACING
-
-        # Used for flipping between image sequences
-        self.cur_texture = 0
-
-        self.scale = CHARACTER_SCALING
-
-        # Generate a random angle between -180 and 180 degrees (-pi and pi radians)
-        theta = random.randint(-180, 180)
-        self.change_x = MABEL_SPEED * math.sin(math.radians(theta))
-        self.change_y = MABEL_SPEED * math.cos(math.radians(theta))
-
-        # Adjust the collision box. Default includes too much empty space
-        # side-to-side. Box is centered at sprite center, (0, 0)
-        self.points = [[-22, -64], [22, -64], [22, 28], [-22, 28]]
-
-        # --- Load Textures ---
+        self.chasers = chasers
+        self.index = index
 
-        # Images from Kenney.nl's Asset Pack 3
-        if character == 'Mabel':
-            main_path = ":resources:images/animated_characters/female_adventurer/femaleAdventurer"
-        elif character == 'Robin':
-            main_path = ":resources:images/animated_characters/male_adventurer/maleAdventurer"
-        # main_path = ":resources:images/animated_characters/female_person/femalePerson"
-        # main_path = ":resources:images/animated_characters/male_person/malePerson"
-        # main_path = ":resources:images/animated_characters/zombie/zombie"
-        # main_path = ":resources:images/animated_characters/robot/robot"
+        # Textures come from the shared cache, so more chasers do not load the same images again
+        textures = assets.character(CHARACTER_PATHS[chasers.characters[index]], WALK_FRAMES)
+        self.idle_texture_pair = textures.idle
+        self.walk_textures = textures.walk
 
-        # Load textures for idle standing
-        self.idle_texture_pair = load_texture_pair(f"{main_path}_idle.png")
-
-        # Load textures for walking
-        self.walk_textures = []
-        for i in range(8):
-            texture = load_texture_pair(f"{main_path}_walk{i}.png")
-            self.walk_textures.append(texture)
-
-        self.change_x = MOVEMENT_SPEED
-        self.change_y = 0
-
-        self.center_x, self.center_y = random_xy_position()
         self.scale = PLAYER_SCALE
+        self.update()
+        self.update_animation()
 
     def update_animation(self, delta_time: float = 1 / 60):
 
-        # Figure out if we need to flip face left or right
-        if self.change_x < 0 and self.character_face_direction == RIGHT_FACING:
-            self.character_face_direction = LEFT_FACING
-        elif self.change_x > 0 and self.character_face_direction == LEFT_FACING:
-            self.character_face_direction = RIGHT_FACING
+        direction = self.chasers.face_direction[self.index]
+        frame = self.chasers.frame(self.index)
 
         # Idle animation
-        if self.change_x == 0 and self.change_y == 0:
-            self.texture = self.idle_texture_pair[self.character_face_direction]
+        if frame is None:
+            self.texture = self.idle_texture_pair[direction]
             return
 
         # Walking animation
-        self.cur_texture += 1
-        if self.cur_texture > 7 * UPDATES_PER_FRAME:
-            self.cur_texture = 0
-        frame = self.cur_texture // UPDATES_PER_FRAME
-        direction = self.character_face_direction
         self.texture = self.walk_textures[frame][direction]
 
-    def update(self, delta_time: float = 1 / 60):
-
-        # Generate a random angle between -90 and 90 degrees (-pi/2 and pi/2 radians)
-        theta = random.randint(-90, 90)
-        x_changed = False
-
-        # Change direction if end of screen
-        if self.left < COIN_DIAMETER:
-            # Hit left edge of screen. X velocity must be set positive, y velocity +ve or -ve.
-            # Angle between -90 and 90 (quadrant 1 and 4, ⊃)
-            # add nothing to the angle
-            self.change_x = MABEL_SPEED * math.cos(math.radians(theta))
-            self.change_y = MABEL_SPEED * math.sin(math.radians(theta))
-            x_changed = True
-        elif self.right > SCREEN_WIDTH - COIN_DIAMETER:
-            # Hit right edge of screen. X velocity must be set negative, y velocity +ve or -ve.
-            # Angle between 90 and -90 (quadrant 2 and 3, ⊂)
-            # Add 180 degrees to the angle
-            self.change_x = MABEL_SPEED * math.cos(math.radians(theta + 180))
-            self.change_y = MABEL_SPEED * math.sin(math.radians(theta + 180))
-            x_changed = True
-
-        if self.top > SCREEN_HEIGHT - COIN_DIAMETER:
-            # Hit right edge of screen. Y velocity must be set negative, X velocity +ve or -ve.
-            # Angle between 180 and 0 (quadrant 3 and 4 ⋃)
-            # Subtract 90 degrees from the angle
-            if x_changed:
-                # If x already changed, only update y
-                self.change_y = -1 * abs(self.change_y)
-            else:
-                # Otherwise update both x and y
-                self.change_x = MABEL_SPEED * math.cos(math.radians(theta - 90))
-                self.change_y = MABEL_SPEED * math.sin(math.radians(theta - 90))
-
-        elif self.bottom < COIN_DIAMETER:
-            # Hit bottom edge of screen. Y velocity must be set positive, X velocity +ve or -ve.
-            # Angle between 0 and 180 (quadrant 1 and 2, ⋂ )
-            # Add 90 degrees to the angle
-            if x_changed:
-                # If x already changed, only update y
-                self.change_y = abs(self.change_y)
-            else:
-                # Otherwise update both x and y
-                self.change_x = MABEL_SPEED * math.cos(math.radians(theta + 90))
-                self.change_y = MABEL_SPEED * math.sin(math.radians(theta + 90))
-
-        super(PlayerCharacter, self).update()
+    def update(self):
+        self.center_x = self.chasers.x[self.index]
+        self.center_y = self.chasers.y[self.index]
 
 
 class WinnersView(MyView):
-    """ View to show winners """
+    """
+    View to show winners.
+    Only WINNER_ROWS rows are on screen; with more prizes the list scrolls with the arrow keys, page keys
+    and the mouse wheel. The rows are a fixed pool of sprites that get the cached text of the winner they show,
+    so a frame costs the same however many prizes there are.
+    """
 
     def __init__(self, config: MyConfig, next_view: MyView = None):
         """ Set up the game and initialize the variables. """
-        super().__init__(config, next_view)
-
-        """ Load music and set flag that currently no music playing"""
-        self.sound_song = arcade.load_sound(WINNERS_SOUND)
-        self.music_playing: media.Player = None
+        super().__init__(config, next_view, WINNERS_SOUND)
+        self.text_list = None
+        self.row_list = None
+        self.position_sprite = None
+        self.first_row = 0
 
     def on_show(self):
         """ This is run once when we switch to this view """
@@ -280,30 +338,78 @@ class WinnersView(MyView):
         # to reset the viewport back to the start so we can see what we draw.
         arcade.set_viewport(0, SCREEN_WIDTH - 1, 0, SCREEN_HEIGHT - 1)
 
+        # The winners are known now, the fixed texts are rendered once
+        self.text_list = arcade.SpriteList()
+        self.text_list.append(text_sprite("Winners Screen", SCREEN_WIDTH / 2, 14 * SCREEN_HEIGHT / 16,
+                                          arcade.color.WHITE, font_size=50, anchor_x="center"))
+        self.text_list.append(text_sprite("Click to advance", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 8,
+                                          arcade.color.WHITE, font_size=20, anchor_x="center"))
+
+        """ List the winners, as many as fit on the screen """
+        self.row_list = arcade.SpriteList()
+        for _ in range(min(WINNER_ROWS, len(self.config.winners))):
+            self.row_list.append(arcade.Sprite())
+        self.position_sprite = None
+        if len(self.config.winners) > WINNER_ROWS:
+            self.position_sprite = arcade.Sprite()
+            self.row_list.append(self.position_sprite)
+        self.first_row = 0
+        self.show_rows()
+
+    def show_rows(self):
+        """ Give the row sprites the texts of the winners from first_row on """
+        winners = self.config.winners
+        for slot in range(min(WINNER_ROWS, len(winners))):
+            winner, prize = winners[self.first_row + slot]
+            sprite = self.row_list[slot]
+            sprite.texture = label_cache.get(f'{winner} - {prize.strip()}', WINNER_FONT_SIZE)
+            sprite.left = SCREEN_WIDTH / 8
+            sprite.bottom = (12 - slot) * SCREEN_HEIGHT / 16
+
+        if self.position_sprite is not None:
+            last = self.first_row + WINNER_ROWS
+            self.position_sprite.texture = label_cache.get(f"{self.first_row + 1}-{last} von {len(winners)}, "
+                                                           f"Pfeiltasten oder Mausrad zum Blättern")
+            self.position_sprite.right = 7 * SCREEN_WIDTH / 8
+            self.position_sprite.bottom = 13 * SCREEN_HEIGHT / 16
+
+    def scroll(self, rows: int):
+        """ Move the list by some rows, negative rows scroll towards the first winner """
+        first_row = min(max(self.first_row + rows, 0), max(len(self.config.winners) - WINNER_ROWS, 0))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.show_rows()
+
+    def on_key_press(self, symbol: int, modifiers: int):
+        rows = {
+            arcade.key.UP: -1,
+            arcade.key.DOWN: 1,
+            arcade.key.PAGEUP: -WINNER_ROWS,
+            arcade.key.PAGEDOWN: WINNER_ROWS,
+            arcade.key.HOME: -len(self.config.winners),
+            arcade.key.END: len(self.config.winners),
+        }.get(symbol)
+        if rows is not None:
+            self.scroll(rows)
+
+    def on_mouse_scroll(self, x: int, y: int, scroll_x: int, scroll_y: int):
+        # Wheel up shows earlier winners; touchpads report fractions of a notch
+        if scroll_y:
+            self.scroll(-round(scroll_y) or (-1 if scroll_y > 0 else 1))
+
     def on_draw(self):
         """ Draw this view """
         arcade.start_render()
-        arcade.draw_text("Winners Screen", SCREEN_WIDTH / 2, 14 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=50, anchor_x="center")
-
-        """ List all the winners """
-        i = 12
-        for (winner, prize) in self.config.winners:
-            arcade.draw_text(f'{winner} - {prize}', SCREEN_WIDTH / 8, i * SCREEN_HEIGHT / 16,
-                             arcade.color.WHITE, font_size=20, anchor_x="left")
-            i -= 1
-
-        arcade.draw_text("Click to advance", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 8,
-                         arcade.color.WHITE, font_size=20, anchor_x="center")
+        self.text_list.draw()
+        self.row_list.draw()
 
         """ When drawing for the first time, play sound"""
-        if not self.music_playing:
-            self.music_playing = self.sound_song.play(self.config.volume, loop=True)
+        self.play_music()
 
     def on_mouse_press(self, _x, _y, _button, _modifiers):
 
         """If the user presses the mouse button, show closing credits. """
-        self.sound_song.stop(self.music_playing)
+        self.stop_music()
         self.next_view.setup()
         self.window.show_view(self.next_view)
 
@@ -313,14 +419,11 @@ class GameOverView(MyView):
 
     def __init__(self, config: MyConfig, next_view: MyView = None):
         """ This is run once when we switch to this view """
-        super().__init__(config, next_view)
+        super().__init__(config, next_view, GAME_OVER_SOUND)
 
         # Reset the viewport, necessary if we have a scrolling game and we need
         # to reset the viewport back to the start so we can see what we draw.
         arcade.set_viewport(0, SCREEN_WIDTH - 1, 0, SCREEN_HEIGHT - 1)
-        """ Load music and set flag that currently no music playing"""
-        self.sound_song = arcade.load_sound(GAME_OVER_SOUND)
-        self.music_playing: media.Player = None
 
         self.text_color = arcade.color.WHITE
 
@@ -331,8 +434,14 @@ class GameOverView(MyView):
         self.attribution_font_size = 15.0
         self.leading = 6  # gap between lines
         self.credits_list = None
+        self.frame_list = None
 
     def setup(self):
+        # Title and footer stay in place, the credits scroll up between them
+        self.frame_list = arcade.SpriteList()
+        self.frame_list.append(self.title("Credits"))
+        self.frame_list.append(self.credit_contribution("Click anywhere to end", SCREEN_HEIGHT / 16))
+
         self.credits_list = arcade.SpriteList()
         
         self.credits_list.append(self.credit_contribution("\n" * 5, 14 * SCREEN_HEIGHT / 25))
@@ -397,8 +506,8 @@ class GameOverView(MyView):
         :param font_size: – Size of the text
         :param width: – Width of the text-box for the text to go into. Used with alignment.
         """
-        sprite = arcade.draw_text(text, SCREEN_WIDTH / 2, start_y, color, font_size, width, align="center",
-                                  anchor_x="center", anchor_y="baseline")
+        sprite = text_sprite(text, SCREEN_WIDTH / 2, start_y, color, font_size, width, align="center",
+                             anchor_x="center")
         return sprite
 
     def title(self, text: str) -> arcade.Sprite:
@@ -426,33 +535,28 @@ class GameOverView(MyView):
         """ Draw this view """
         # This command has to happen before we start drawing
         arcade.start_render()
-        self.title("Credits")
-
-        self.credit_contribution("Click anywhere to end", SCREEN_HEIGHT / 16)
+        self.frame_list.draw()
 
         # self.window.set_viewport(0, SCREEN_WIDTH - 1, SCREEN_HEIGHT / 16, 14 * SCREEN_HEIGHT / 16)
 
-        # Let the text move upwards
-        for sprite in self.credits_list:
-            if sprite.top > 14 * SCREEN_HEIGHT / 16:
-                sprite.remove_from_sprite_lists()
-
         # Draw all the sprites.
         self.credits_list.draw()
 
         """ When drawing for the first time, play sound"""
-        if not self.music_playing:
-            self.music_playing = self.sound_song.play(self.config.volume, loop=True)
+        self.play_music()
 
     def on_update(self, delta_time):
         """ Movement and game logic """
 
-        # Move the player
+        # Let the text move upwards
         self.credits_list.update()
+        for sprite in self.credits_list:
+            if sprite.top > 14 * SCREEN_HEIGHT / 16:
+                sprite.remove_from_sprite_lists()
 
     def on_mouse_press(self, _x, _y, _button, _modifiers):
         """If the user presses the mouse button, end the game. """
-        self.sound_song.stop(self.music_playing)
+        self.stop_music()
         self.window.close()
 
 
@@ -462,17 +566,30 @@ class InstructionView(MyView):
     def __init__(self, config: MyConfig, next_view: MyView = None):
         """ Set up the game and initialize the variables. """
         # super().__init__(width, height, title)
-        super().__init__(config, next_view)
+        super().__init__(config, next_view, INSTRUCTION_SOUND)
+        self.text_list = None
 
-        """ Load music and set flag that currently no music playing"""
-        self.sound_song = arcade.load_sound(INSTRUCTION_SOUND)
-        self.music_playing: media.Player = None
-
-    @staticmethod
-    def setup():
+    def setup(self):
         """ This is run once when we switch to this view """
         arcade.set_background_color(arcade.csscolor.DARK_SLATE_BLUE)
 
+        # All texts are rendered once here and then drawn in one call per frame
+        self.text_list = arcade.SpriteList()
+        self.text_list.append(text_sprite("Instructions Screen", SCREEN_WIDTH / 2, 14 * SCREEN_HEIGHT / 16,
+                                          arcade.color.WHITE, font_size=50, anchor_x="center"))
+        lines = [
+            "Mabel sammelt die Lose ein. Ihr habt alle so viele Leben, wie ihr Lose gekauft habt.",
+            "Ihr fangt irgendwo zufällig verteilt auf der Wiese an.",
+            "Wenn ihr noch Leben habt, erscheint euer Losmünze wieder irgendwo zufällig.",
+            "Wenn ihr nur noch wenige Leben habt, werden die Lose orange und dann rot.",
+            "Die letzten zehn Namen gewinnen.",
+        ]
+        for i, line in enumerate(lines):
+            self.text_list.append(text_sprite(line, SCREEN_WIDTH / 8, (12 - i) * SCREEN_HEIGHT / 16,
+                                              arcade.color.WHITE, font_size=20, anchor_x="left"))
+        self.text_list.append(text_sprite("Click to advance", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 8,
+                                          arcade.color.WHITE, font_size=20, anchor_x="center"))
+
     def on_show(self):
         """ This is run once when we switch to this view """
         arcade.set_background_color(arcade.csscolor.DARK_SLATE_BLUE)
@@ -484,61 +601,31 @@ class InstructionView(MyView):
     def on_draw(self):
         """ Draw this view """
         arcade.start_render()
-        arcade.draw_text("Instructions Screen", SCREEN_WIDTH / 2, 14 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=50, anchor_x="center")
-
-        arcade.draw_text("Mabel sammelt die Lose ein. Ihr habt alle so viele Leben, wie ihr Lose gekauft habt.",
-                         SCREEN_WIDTH / 8, 12 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=20, anchor_x="left")
-        arcade.draw_text("Ihr fangt irgendwo zufällig verteilt auf der Wiese an.", SCREEN_WIDTH / 8,
-                         11 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=20, anchor_x="left")
-        arcade.draw_text("Wenn ihr noch Leben habt, erscheint euer Losmünze wieder irgendwo zufällig.",
-                         SCREEN_WIDTH / 8, 10 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=20, anchor_x="left")
-        arcade.draw_text("Wenn ihr nur noch wenige Leben habt, werden die Lose orange und dann rot.", SCREEN_WIDTH / 8,
-                         9 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=20, anchor_x="left")
-        arcade.draw_text("Die letzten zehn Namen gewinnen.", SCREEN_WIDTH / 8, 8 * SCREEN_HEIGHT / 16,
-                         arcade.color.WHITE, font_size=20, anchor_x="left")
-
-        arcade.draw_text("Click to advance", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 8,
-                         arcade.color.WHITE, font_size=20, anchor_x="center")
+        self.text_list.draw()
 
         """ When drawing for the first time, play sound"""
-        if self.music_playing is None:
-            self.music_playing = self.sound_song.play(volume=self.config.volume)
+        self.play_music(loop=False)
+        self.config.assets.timer.first_frame()
 
     def on_mouse_press(self, _x, _y, _button, _modifiers):
         """If the user presses the mouse button, play the game. """
 
-        self.sound_song.stop(self.music_playing)
+        self.stop_music()
         # next_view = GameView(self.lose)
-        self.next_view.setup()
+        try:
+            self.next_view.setup()
+        except ValueError as error:
+            # E.g. the worker process cannot start the draw
+            self.config.fail(str(error))
         self.window.show_view(self.next_view)
 
 
-def map_prizes_to_winners(winners: List[str], prizes: List[str]) -> List[Tuple[str, str]]:
-
-    random.shuffle(winners)
-    random.shuffle(prizes)
-
-    return list(zip(winners, prizes))
-
-
-def random_xy_position() -> Tuple[int, int]:
-    return (
-        random.randrange(COIN_DIAMETER + PADDING, SCREEN_WIDTH - COIN_DIAMETER - PADDING),
-        random.randrange(COIN_DIAMETER + PADDING, SCREEN_HEIGHT - COIN_DIAMETER - PADDING)
-    )
-
-
 class GameView(MyView):
     """ Main application class. """
 
     def __init__(self, config: MyConfig, next_view: MyView):
         """ Set up the game and initialize the variables. """
-        super().__init__(config, next_view)
+        super().__init__(config, next_view, GAME_SOUND)
 
         # No mouse cursor
         self.window.set_mouse_visible(False)
@@ -548,14 +635,11 @@ class GameView(MyView):
         # Sprite lists
         self.player_list = None
         self.coin_list = None
+        self.label_list = None
 
-        """ Load music and set flag that currently no music playing"""
-        self.sound_song = arcade.load_sound(GAME_SOUND)
-        self.music_playing: media.Player = None
-
-        self.lose = config.lose
+        self.roster = config.roster
 
-        self.max_coins = len(config.lose.index)
+        self.max_coins = len(config.roster.names)
 
         if is_debug():
             print("Anzahl Lose: ", self.max_coins, "wurde für Debug runtergesetzt. Jetzt: ", DEBUG_COIN_COUNT)
@@ -563,29 +647,81 @@ class GameView(MyView):
 
         # Set up the player
         self.score = 0
-        self.player = None
+        self.sim: Simulation = None
+        self.pacing: Optional[DurationController] = None
+        self.checkpoints: Optional[CheckpointWriter] = None
+        self.event_log: Optional[EventLogWriter] = None
+        # Draw running in a worker process, self.sim then only follows it
+        self.worker: Optional["SimulationWorker"] = None
+        self.coin_sprites: Dict[int, MyCoin] = {}
+        self.label_sprites: Dict[int, arcade.Sprite] = {}
+
+        # Level of detail, see lod.py. Large rosters start with points instead of coin sprites.
+        self.detail = LOD_FULL
+        self.coin_points: Optional[CoinPoints] = None
+        self.points_dirty = False
+        # Coins still waiting for their sprite after the points were given up, the points are drawn until none is left
+        self.pending_coins: Optional[np.ndarray] = None
+        # Tick at which the shown names were last chosen
+        self.label_tick = 0
+
+        # Frame times per phase, F3 shows them on screen
+        self.profiler = FrameProfiler() if config.profile else NullProfiler()
+        self.show_profile = False
+        self.profile_list: Optional[arcade.SpriteList] = None
+        self.profile_frame = 0
+
+        # Position in a replayed log, and game time not yet replayed
+        self.replay_records: List[TickRecord] = []
+        self.replay_position = 0
+        self.replay_time = 0.0
+        self.replay_matches = True
 
     def setup(self):
         self.player_list = arcade.SpriteList()
         self.coin_list = arcade.SpriteList()
+        self.label_list = arcade.SpriteList()
 
-        self.score = 0
+        roster = self.roster.head(self.max_coins)
+        digest = roster_digest(roster.names, roster.lives)
+        if self.config.replay is not None:
+            settings, self.replay_records = self.config.replay
+        else:
+            settings = DrawSettings(self.config.seed, digest, len(self.config.prizes), SCREEN_WIDTH, SCREEN_HEIGHT,
+                                    list(CHARACTER_PATHS), self.config.chasers, self.config.duration)
+        self.sim, self.pacing = settings.simulation(roster.names, roster.lives)
+        self.sim.profiler = self.profiler
+
+        if self.config.replay is None:
+            if self.config.resume_state is not None:
+                self.sim.set_state(self.config.resume_state)
+                if self.pacing is not None:
+                    self.pacing.set_state(self.config.resume_state)
+            if self.config.worker:
+                from worker import SimulationWorker
+
+                # The worker paces, logs and saves the draw
+                self.worker = SimulationWorker(settings, roster.names, roster.lives, self.config.prizes,
+                                               self.config.resume_state, self.config.event_log, self.config.checkpoint)
+                self.pacing = None
+            else:
+                if self.config.resume_state is not None:
+                    self.event_log = EventLogWriter.resume(self.config.event_log, self.sim.tick)
+                else:
+                    self.event_log = EventLogWriter.create(self.config.event_log, settings)
+                self.checkpoints = CheckpointWriter(self.config.checkpoint, digest)
 
         # Set up the players
-        self.player_list.extend([PlayerCharacter('Mabel'), PlayerCharacter('Robin')])
+        self.player_list.extend([PlayerCharacter(self.sim.chasers, index, self.config.assets)
+                                 for index in range(len(self.sim.chasers))])
 
-        for i in range(self.max_coins):
-            l_name = self.lose.iloc[i]["Name"]
-            l_lose = self.lose.iloc[i]["Lose"]
-            coin = MyCoin(":resources:images/items/gold_1.png",
-                          scale=0.5, name=l_name, lives=l_lose)
-            # coin.center_x = COIN_DIAMETER + random.randrange(PADDING, (SCREEN_WIDTH - 2 * COIN_DIAMETER) - PADDING)
-            # coin.center_y = COIN_DIAMETER + random.randrange(PADDING, (SCREEN_HEIGHT - 2 * COIN_DIAMETER) - PADDING)
-            coin.center_x, coin.center_y = random_xy_position()
+        self.coin_sprites = {}
+        self.label_sprites = {}
+        self.coin_points = None
+        self.pending_coins = None
+        self.set_detail(choose_detail(LOD_FULL, self.sim.remaining))
 
-            self.coin_list.append(coin)
-
-        self.score = len(self.coin_list)
+        self.score = self.sim.remaining
 
         # Set the background color
         arcade.set_background_color(arcade.color.AMAZON)
@@ -595,42 +731,119 @@ class GameView(MyView):
         Render the screen.
         """
 
+        profiler = self.profiler
+        profiler.start()
+
         # This command has to happen before we start drawing
         arcade.start_render()
 
-        # Draw all the sprites.
-        self.coin_list.draw()
+        # Draw all the sprites. With many coins on the field they are points instead.
+        if self.showing_points:
+            self.coin_points.draw()
+        else:
+            self.coin_list.draw()
         self.player_list.draw()
+        profiler.mark("sprite_draw")
 
-        for coin in self.coin_list:
-            arcade.draw_text(coin.name, coin.center_x, coin.center_y, arcade.color.WHITE, 12)
+        self.label_list.draw()
+        profiler.mark("label_draw")
 
         # Put the text on the screen.
         output = f"{self.score}"
         arcade.draw_text(output, 10, 20, arcade.color.WHITE, font_size=60)
+        if self.show_profile:
+            self.draw_profile()
+        profiler.mark("hud")
+        profiler.end_frame(self.score)
 
         """ When drawing for the first time, play sound"""
-        if self.music_playing is None:
-            self.music_playing = self.sound_song.play(self.config.volume, loop=True)
+        self.play_music()
+
+    def sync_players(self):
+        """ Add and remove chaser sprites after the target-duration mode changed the number of chasers """
+        chasers = self.sim.chasers
+        while len(self.player_list) > len(chasers):
+            self.player_list[-1].remove_from_sprite_lists()
+        for index in range(len(self.player_list), len(chasers)):
+            self.player_list.append(PlayerCharacter(chasers, index, self.config.assets))
+
+    def draw_profile(self):
+        """ Frame time percentiles and the average of each phase, rendered again only twice a second """
+        frames = self.profiler.frames
+        if self.profile_list is None or frames - self.profile_frame >= PROFILE_REFRESH_FRAMES:
+            p50, p95, p99 = self.profiler.percentiles()
+            averages = self.profiler.averages(PROFILE_REFRESH_FRAMES)
+            lines = [f"Bild p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms  Lose {self.score}",
+                     "  ".join(f"{phase} {1000 * average:.2f}" for phase, average in zip(PHASES, averages))]
+            self.profile_list = arcade.SpriteList()
+            for line, text in enumerate(lines):
+                self.profile_list.append(text_sprite(text, 10, SCREEN_HEIGHT - 30 - 20 * line, arcade.color.WHITE,
+                                                     font_size=12))
+            self.profile_frame = frames
+        self.profile_list.draw()
+
+    def on_key_press(self, symbol: int, modifiers: int):
+        if symbol == arcade.key.F3:
+            self.show_profile = not self.show_profile
+            # Measure only while the overlay is shown, unless the frame times are written to a CSV at the end
+            if not self.config.profile:
+                self.profiler = FrameProfiler() if self.show_profile else NullProfiler()
+                self.sim.profiler = self.profiler
+                self.profile_list = None
 
     def on_update(self, delta_time):
         """ Movement and game logic """
 
         """Stop when there are as many coins as prizes left (i.e. 10 winners)"""
-        if len(self.coin_list) <= len(self.config.prizes):
-            winners = [obj.name for obj in self.coin_list]
-            winners_with_prizes = map_prizes_to_winners(winners, self.config.prizes)
-
-            # Save winners to file
-            with open('winners.txt', "w") as f:
-                for (name, prize) in winners_with_prizes:
-                    f.write(f"{name} - {prize}\n")
+        if self.sim.finished:
+            if self.worker is not None:
+                from worker import WorkerError
+
+                # The worker hands out the prizes, its log and checkpoint are closed by now
+                try:
+                    winners_with_prizes = self.worker.winners()
+                except WorkerError as error:
+                    self.worker_failed(error)
+                    return
+                if winners_with_prizes is None:
+                    return
+                self.worker.close()
+            else:
+                winners_with_prizes = self.sim.winners_with_prizes(self.config.prizes)
 
-            self.sound_song.stop(self.music_playing)
+            if self.config.replay is not None:
+                self.check_replay(winners_with_prizes)
+            else:
+                # Save winners to file, the draw no longer needs to be resumed
+                write_winners(winners_with_prizes)
+                if self.worker is None:
+                    self.event_log.close()
+                    self.checkpoints.close(remove=True)
+            if self.config.feed is not None:
+                self.config.feed.publish_winners(winners_with_prizes)
+                self.config.feed.close()
+            print(label_cache)
+
+            self.stop_music()
             self.config.winners = winners_with_prizes
             # next_view = WinnersView(winners)
             self.window.set_mouse_visible(True)
             self.window.show_view(self.next_view)
+            return
+
+        # Advance the draw, then follow it with the sprites
+        self.profiler.start()
+        if self.config.replay is not None:
+            self.replay_ticks(delta_time)
+        elif self.worker is not None:
+            self.follow_worker()
+        else:
+            hits = self.advance(delta_time)
+            self.event_log.record(self.sim.tick, delta_time, hits)
+            self.profiler.mark("bookkeeping")
+            self.show_hits(hits)
+            self.publish(hits)
+        self.update_detail()
 
         # Move the player
         self.player_list.update()
@@ -638,46 +851,281 @@ class GameView(MyView):
         # Update the players animation
         self.player_list.update_animation()
 
-        # Generate a list of all sprites that collided with the player.
-        hit_list = []
-        for player in self.player_list:
-            hit_list.extend(arcade.check_for_collision_with_list(player, self.coin_list))
-
-        # Loop through each colliding sprite, remove it, and add to the score.
-        for coin in hit_list:
-            coin.lives = coin.lives - 1
-            if coin.lives > 0:
-                coin.center_x, coin.center_y = random_xy_position()
-
-                # Change colour when lives get low, but not initially to not show up people with only one ticket.
-                if coin.lives == 3:
-                    coin.color = arcade.color.BRASS
-                elif coin.lives == 2:
-                    coin.color = arcade.color.ORANGE_PEEL
-                elif coin.lives == 1:
-                    coin.color = arcade.color.CANDY_APPLE_RED
+        self.score = self.sim.remaining
+        self.profiler.mark("sprites")
+
+        # Copy the state now, it is written to disk in the background. The log must reach as far as the state.
+        if self.checkpoints is not None and self.checkpoints.due:
+            self.event_log.flush()
+            state = self.sim.get_state()
+            if self.pacing is not None:
+                state.update(self.pacing.get_state())
+            self.checkpoints.save(state)
+
+    def advance(self, delta_time: float) -> Hits:
+        """ Step the draw by one tick """
+        hits = self.sim.step(delta_time)
+        if self.pacing is not None:
+            self.pacing.update(hits, delta_time)
+            self.sync_players()
+        self.profiler.mark("bookkeeping")
+        return hits
+
+    def follow_worker(self):
+        """ Take the latest state of the draw from the worker, all hits since the previous frame at once """
+        from worker import WorkerError, follow
+
+        try:
+            snapshot = self.worker.snapshot()
+        except WorkerError as error:
+            self.worker_failed(error)
+            return
+        if snapshot is None:
+            return
+        hits = follow(self.sim, snapshot)
+        self.sync_players()
+        self.show_hits(hits)
+        self.publish(hits)
+
+    def write_profile(self):
+        """ Write the frame times to the --profile CSV, also when the window is closed before the draw ends """
+        if not self.config.profile or not self.profiler.frames:
+            return
+        self.profiler.write_csv(self.config.profile)
+        p50, p95, p99 = self.profiler.percentiles()
+        print(f"Bildzeiten: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms -> {self.config.profile}")
+
+    def worker_failed(self, error: Exception):
+        """ The worker process is gone, the draw cannot go on here. Its last checkpoint is left for --resume. """
+        self.worker.close()
+        self.stop_music()
+        self.config.fail(f"{error}. Mit --resume geht es ab dem letzten Spielstand weiter.")
+
+    def show_hits(self, hits: Hits):
+        """
+        Only coins hit in a tick need their sprite touched.
+        Outside LOD_FULL not every coin has a sprite or name.
+        """
+        coins = self.sim.coins
+        if len(hits.index):
+            self.points_dirty = True
+        for index, lives in zip(hits.index, hits.lives):
+            sprite = self.coin_sprites.get(index)
+            label = self.label_sprites.get(index)
+            if lives > 0:
+                if sprite is not None:
+                    sprite.center_x, sprite.center_y = coins.x[index], coins.y[index]
+                    sprite.color = TIER_COLORS[coins.tier[index]]
+                if label is not None:
+                    label.left, label.bottom = coins.x[index], coins.y[index]
             else:
-                coin.remove_from_sprite_lists()
+                if sprite is not None:
+                    del self.coin_sprites[index]
+                    sprite.remove_from_sprite_lists()
+                if label is not None:
+                    del self.label_sprites[index]
+                    label.remove_from_sprite_lists()
+
+    def publish(self, hits: Hits):
+        """ Hand the tick to the live feed, which sends it on its own thread """
+        if self.config.feed is not None:
+            self.config.feed.publish_tick(self.sim.tick, self.sim.elapsed, self.sim.remaining, hits)
+
+    def update_detail(self):
+        """ Follow the level of detail as the field thins out, and the coins whose names are shown """
+        detail = choose_detail(self.detail, self.sim.remaining)
+        if detail != self.detail:
+            self.set_detail(detail)
+        else:
+            if detail != LOD_FULL and self.sim.tick - self.label_tick >= LABEL_REFRESH_TICKS:
+                # The worker and a replay can advance several ticks in one frame, so no tick number is certain
+                self.show_labels(labelled_coins(self.sim))
+            if self.pending_coins is not None:
+                self.create_coin_sprites(COIN_SPRITES_PER_FRAME)
+        if self.showing_points and self.points_dirty:
+            self.coin_points.update(self.sim)
+        self.points_dirty = False
+
+    @property
+    def showing_points(self) -> bool:
+        """ Whether the coins are drawn as points, also while their sprites are still being created """
+        return self.detail == LOD_POINTS or self.pending_coins is not None
+
+    def set_detail(self, detail: int):
+        """ Switch to another level of detail, creating or dropping coin sprites and names """
+        coins = self.sim.coins
+        self.detail = detail
+        if detail == LOD_POINTS:
+            self.coin_sprites = {}
+            self.coin_list = arcade.SpriteList()
+            self.pending_coins = None
+            if self.coin_points is None:
+                self.coin_points = CoinPoints(self.window.ctx, TIER_COLORS)
+            self.coin_points.update(self.sim)
+        elif not self.coin_sprites and self.pending_coins is None:
+            # Sprites only for coins on the field; they are dropped again when the coin is eliminated.
+            # Coming from the points there can be thousands, so they are created over the next frames.
+            self.pending_coins = coins.alive_index
+            self.create_coin_sprites(len(coins.alive_index) if self.coin_points is None else COIN_SPRITES_PER_FRAME)
+
+        self.show_labels(coins.alive_index if detail == LOD_FULL else labelled_coins(self.sim))
+
+    def create_coin_sprites(self, count: int):
+        """ Create the sprites of the next pending coins, skipping those eliminated in the meantime """
+        coins = self.sim.coins
+        batch, self.pending_coins = self.pending_coins[:count], self.pending_coins[count:]
+        coin_texture = self.config.assets.texture(COIN_IMAGE)
+        for index in batch[coins.alive[batch]].tolist():
+            sprite = MyCoin(coin_texture, scale=COIN_SCALE, index=index)
+            sprite.center_x, sprite.center_y = coins.x[index], coins.y[index]
+            sprite.color = TIER_COLORS[coins.tier[index]]
+            self.coin_sprites[index] = sprite
+            self.coin_list.append(sprite)
+        if not len(self.pending_coins):
+            self.pending_coins = None
+
+    def show_labels(self, indices: np.ndarray):
+        """ Show the names of these coins, and only these """
+        coins = self.sim.coins
+        self.label_tick = self.sim.tick
+        wanted = set(indices.tolist())
+        for index in [index for index in self.label_sprites if index not in wanted]:
+            self.label_sprites.pop(index).remove_from_sprite_lists()
+        for index in wanted.difference(self.label_sprites):
+            # Name labels are rasterised once, then only moved with their coin
+            label = label_cache.sprite(coins.name(index), coins.x[index], coins.y[index])
+            self.label_sprites[index] = label
+            self.label_list.append(label)
+
+    def replay_ticks(self, delta_time: float):
+        """ Step through the logged ticks that fit into this frame at the replay speed """
+        self.replay_time += delta_time * self.config.replay_speed
+        records = self.replay_records
+        while self.replay_position < len(records) and records[self.replay_position].delta_time <= self.replay_time:
+            record = records[self.replay_position]
+            self.replay_position += 1
+            self.replay_time -= record.delta_time
+            hits = self.advance(record.delta_time)
+            if self.replay_matches and not same_hits(hits, record.hits):
+                self.replay_matches = False
+                print(f"Tick {record.tick}: Wiederholung trifft andere Lose als protokolliert")
+            self.show_hits(hits)
+            self.publish(hits)
+        if self.replay_position == len(records) and not self.sim.finished and self.replay_matches:
+            self.replay_matches = False
+            print(f"Protokoll endet vor dem Ende der Ziehung, noch {self.sim.remaining} Lose im Spiel")
+
+    @property
+    def replay_ended(self) -> bool:
+        """ Whether a replayed log has run out before the end of the draw """
+        return (self.config.replay is not None and self.replay_position == len(self.replay_records) and
+                not self.sim.finished)
+
+    def check_replay(self, winners_with_prizes: List[Tuple[str, str]]):
+        """ Compare the winners of the replay with winners.txt """
+        try:
+            with open("winners.txt") as f:
+                same = f.read() == format_winners(winners_with_prizes)
+        except OSError:
+            same = False
+        if same and self.replay_matches:
+            print("Wiederholung: alle Treffer wie protokolliert, winners.txt stimmt überein")
+        else:
+            print("Wiederholung weicht ab:")
+            print(format_winners(winners_with_prizes), end="")
 
-        self.score = len(self.coin_list)
 
+class RecordingStopped(Exception):
+    """ The draw cannot be recorded to its end, the video so far is kept """
 
-def read_prizes(prizes_file: str) -> List[str]:
 
-    with open(prizes_file, 'r') as file:
-        prizes = file.readlines()
+def record_limit(config: MyConfig) -> float:
+    """ Seconds of video after which a draw that has not reached the winners is given up """
+    if config.replay is not None:
+        seconds = sum(record.delta_time for record in config.replay[1]) / config.replay_speed
+    elif config.duration is not None:
+        seconds = config.duration
+    else:
+        return RECORD_MAX_SECONDS
+    return RECORD_OVERTIME * seconds + RECORD_WINNERS_SECONDS
 
-    return prizes
+
+def record_draw(window: arcade.Window, recorder: "FrameRecorder", max_seconds: float) -> Optional[str]:
+    """
+    Render the draw offscreen at the recorder's frame rate, as fast as the machine can, and hand every frame to the
+    recorder. Recording ends RECORD_WINNERS_SECONDS after the winners are shown, or early if the draw cannot get
+    there: a replayed log ends before the draw, the game fails, or the video is longer than max_seconds.
+    :return: why the recording ended early, None if it shows the winners
+    """
+    delta_time = 1 / recorder.fps
+    game_view = window.current_view
+    winners_frames = round(RECORD_WINNERS_SECONDS * recorder.fps)
+    max_frames = round(max_seconds * recorder.fps)
+    start = time.perf_counter()
+    while winners_frames > 0:
+        try:
+            window.current_view.on_update(delta_time)
+        except RecordingStopped as error:
+            return str(error)
+        window.current_view.on_draw()
+        recorder.capture()
+        if window.current_view is not game_view:
+            winners_frames -= 1
+        elif game_view.replay_ended:
+            return f"Protokoll endet vor dem Ende der Ziehung, noch {game_view.sim.remaining} Lose im Spiel"
+        elif recorder.count >= max_frames:
+            return f"Ziehung nach {recorder.seconds:.0f}s Video nicht zu Ende"
+        if recorder.count % (60 * recorder.fps) == 0:
+            print(f"Aufnahme: {recorder.seconds:.0f}s Video in {time.perf_counter() - start:.0f}s")
+    return None
+
+
+def stop_recording(message: str):
+    """ config.fail while recording: end the video where it is, main reports the message """
+    raise RecordingStopped(message)
 
 
 def main():
     """ Main method """
 
+    timer = StartupTimer()
+
     parser = argparse.ArgumentParser(description='Weihnachtstombola.')
     parser.add_argument('-i', metavar='excelfile', dest='excelfile', type=str, required=True,
-                        help='Pfad zur Excel Datei, die die Namen und Lose enthält.')
+                        help='Pfad zur Excel- (.xlsx), CSV- oder TSV-Datei, die die Namen und Lose enthält.')
     parser.add_argument('-p', metavar='prizes', dest='prizes', type=str, required=True,
                         help='Pfad zu einer .txt-Datei, die die Preise enthält.')
+    parser.add_argument('--stream-audio', action='store_true',
+                        help='Musik beim Abspielen aus der Datei lesen statt vorab zu dekodieren. Spart Speicher.')
+    parser.add_argument('--profile', metavar='csvfile', type=str, default=None,
+                        help='Bildzeiten pro Phase messen und am Ende als CSV schreiben. F3 zeigt sie im Spiel.')
+    parser.add_argument('--chasers', type=int, default=DEFAULT_CHASER_COUNT,
+                        help=f'Anzahl Jäger, z.B. 10 bis 50 bei vielen Losen. Die Figuren wechseln sich ab: '
+                             f'{", ".join(CHARACTER_PATHS)}.')
+    parser.add_argument('--duration', type=parse_duration, default=None,
+                        help='Zieldauer des Spiels, z.B. 8m oder 90s. Anzahl und Tempo der Jäger passen sich an.')
+    parser.add_argument('--checkpoint', metavar='file', type=str, default=CHECKPOINT_FILE,
+                        help='Spielstand alle paar Sekunden in diese Datei speichern.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Ein abgebrochenes Spiel vom gespeicherten Spielstand aus fortsetzen.')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Startwert für den Zufallsgenerator. Ohne wird einer gewählt und im Protokoll vermerkt.')
+    parser.add_argument('--log', metavar='file', type=str, default=EVENT_LOG_FILE,
+                        help='Jeden Tick der Ziehung in dieses Protokoll schreiben.')
+    parser.add_argument('--replay', metavar='logfile', type=str, default=None,
+                        help='Eine protokollierte Ziehung noch einmal zeigen und mit winners.txt vergleichen.')
+    parser.add_argument('--speed', type=float, default=1.0, help='Geschwindigkeit der Wiederholung, z.B. 4.')
+    parser.add_argument('--feed', metavar='port', type=int, default=None,
+                        help='Ziehung live als WebSocket auf diesem Port übertragen, z.B. für ein Dashboard '
+                             'oder python feed.py --port port.')
+    parser.add_argument('--worker', action='store_true',
+                        help='Ziehung in einem eigenen Prozess rechnen. '
+                             'Hält das Tempo, auch wenn ein Bild länger dauert.')
+    parser.add_argument('--record', metavar='videofile', type=str, default=None,
+                        help='Ziehung ohne Fenster als Video aufnehmen, z.B. draw.mp4, schneller als in Echtzeit. '
+                             'Braucht ffmpeg.')
+    parser.add_argument('--fast', action='store_true',
+                        help='Gewinner sofort ziehen, ohne das Spiel zu zeigen. Gleiche Gewinnchancen wie im Spiel.')
 
     args = parser.parse_args()
     print(args.excelfile)
@@ -685,32 +1133,142 @@ def main():
     import os
     print(os.getcwd())
 
-    df_lose = pd.read_excel(args.excelfile)
+    try:
+        roster = load_roster(args.excelfile)
+    except RosterError as error:
+        parser.error(str(error))
     prizes = read_prizes(args.prizes)
-    config = MyConfig(df_lose, prizes)
+    config = MyConfig(roster, prizes)
     config.volume = VOLUME
+    config.profile = args.profile
+    config.chasers = args.chasers
+    config.duration = args.duration
+    config.checkpoint = args.checkpoint
+    config.resume_state = None
+    if args.resume:
+        try:
+            config.resume_state = read_checkpoint(args.checkpoint, roster_digest(roster.names, roster.lives))
+        except CheckpointError as error:
+            parser.error(str(error))
+    config.seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    print(f"Startwert: {config.seed}")
+    config.event_log = args.log
+    config.replay_speed = args.speed
+    config.replay = None
+    if args.replay:
+        try:
+            config.replay = read_log(args.replay)
+        except EventLogError as error:
+            parser.error(str(error))
+        if config.replay[0].roster != roster_digest(roster.names, roster.lives):
+            parser.error(f"{args.replay}: Ereignisprotokoll gehört zu einer anderen Losliste")
+    if args.worker and args.replay:
+        parser.error("--worker und --replay lassen sich nicht kombinieren")
+    if args.worker and args.record:
+        parser.error("--worker läuft in Echtzeit und lässt sich nicht aufnehmen")
+    config.worker = args.worker
+    config.fail = parser.error
+    config.feed = None
+    if args.feed is not None and not args.fast:
+        from feed import FEED_HOST, EventFeed
+
+        try:
+            # Coin indices are positions in the roster
+            config.feed = EventFeed(roster.names.__getitem__, port=args.feed)
+        except OSError as error:
+            parser.error(f"Übertragung auf Port {args.feed} nicht möglich ({error})")
+        print(f"Live-Übertragung: ws://{FEED_HOST}:{args.feed}")
+    timer.mark("Losliste")
+
+    if args.fast:
+        start = time.perf_counter()
+        rng = np.random.default_rng(config.seed)
+        survivors = fast_draw(roster.lives, len(prizes), rng)
+        winners_with_prizes = map_prizes_to_winners([roster.names[index] for index in survivors], prizes, rng)
+        write_winners(winners_with_prizes)
+        print(f"Schnelle Ziehung in {1000 * (time.perf_counter() - start):.1f} ms")
+        for (name, prize) in winners_with_prizes:
+            print(f"{name} - {prize.strip()}")
+        return
 
     # window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
-    window = arcade.Window(fullscreen=True, title=SCREEN_TITLE)
+    if args.record:
+        from recorder import RECORD_SIZE, FrameRecorder, RecorderError
+
+        # Offscreen, in the size of the video
+        window = arcade.Window(*RECORD_SIZE, SCREEN_TITLE)
+        window.set_visible(False)
+    else:
+        window = arcade.Window(fullscreen=True, title=SCREEN_TITLE)
 
     global SCREEN_HEIGHT, SCREEN_WIDTH
 
     left, SCREEN_WIDTH, bottom, SCREEN_HEIGHT = window.get_viewport()
     # SCREEN_WIDTH = screen_width
     # SCREEN_HEIGHT = screen_height
+    timer.mark("Fenster")
+
+    # Load assets in the order they are needed, while the instruction screen is already showing
+    config.assets = AssetLoader(timer)
+    if args.record:
+        # The video has no sound
+        config.music = NoMusic()
+    elif args.stream_audio:
+        config.music = StreamingMusic()
+    else:
+        config.music = PreloadedMusic(config.assets)
+    config.music.preload(INSTRUCTION_SOUND)
+    config.assets.preload_texture(COIN_IMAGE)
+    # Only the characters that chase from the start, the target-duration mode may add the others later
+    characters = len(CHARACTER_PATHS) if args.duration else args.chasers
+    for main_path in list(CHARACTER_PATHS.values())[:characters]:
+        config.assets.preload_character(main_path, WALK_FRAMES)
+    for sound_file in (GAME_SOUND, WINNERS_SOUND, GAME_OVER_SOUND):
+        config.music.preload(sound_file)
 
     # Set up window sequence
     # Start with Instruction View -> GameView -> WinnersView -> GameOverView
+    # The credits are set up when the winners view is left
     game_over_view = GameOverView(config)
-    game_over_view.setup()
     winners_view = WinnersView(config, game_over_view)
     game_view = GameView(config, winners_view)
-    start_view = InstructionView(config, game_view)
-    start_view.setup()
+    if config.resume_state is None and config.replay is None and not args.record:
+        start_view = InstructionView(config, game_view)
+        start_view.setup()
+    else:
+        # Straight back into the draw, into the replay, or into the recording
+        try:
+            game_view.setup()
+        except ValueError as error:
+            parser.error(str(error))
+        start_view = game_view
     window.show_view(start_view)
-    arcade.run()
+    timer.mark("Views")
+    try:
+        if args.record:
+            try:
+                recorder = FrameRecorder(args.record, *window.get_size())
+                config.fail = stop_recording
+                try:
+                    stopped = record_draw(window, recorder, record_limit(config))
+                except BaseException:
+                    # Also on Ctrl+C, ffmpeg must not be left running
+                    recorder.abort()
+                    raise
+                recorder.close()
+            except RecorderError as error:
+                parser.error(str(error))
+            print(f"Aufnahme: {recorder.seconds:.0f}s Video -> {args.record}")
+            if stopped is not None:
+                parser.error(f"Aufnahme abgebrochen: {stopped}")
+        else:
+            arcade.run()
+    finally:
+        # The frame times are most wanted when the draw went wrong
+        game_view.write_profile()
+    config.assets.shutdown()
 
-    print("Finished")
+    print(f"Finished, peak RSS {format_rss()}")
 
 
 if __name__ == "__main__":
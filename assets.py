@@ -0,0 +1,252 @@
+"""
+Sounds and textures, loaded once on a worker thread and shared by all views.
+
+The instruction screen is shown right away; the music and textures of the later views
+load in the background while people read it. A view that needs an asset before it has
+finished loading simply waits for it.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import arcade
+from pyglet import media
+
+
+def peak_rss() -> Optional[int]:
+    """ Peak resident set size of this process in bytes, None if it cannot be determined """
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_working_set()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _windows_peak_working_set() -> Optional[int]:
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def format_rss() -> str:
+    peak = peak_rss()
+    return "unbekannt" if peak is None else f"{peak / 2 ** 20:.0f} MB"
+
+
+class CharacterTextures(NamedTuple):
+    """
+    Texture pairs of one animated character, the second of each pair being a mirror image.
+    :param idle: textures for idle standing
+    :param walk: textures for each frame of the walk animation
+    """
+    idle: List[arcade.Texture]
+    walk: List[List[arcade.Texture]]
+
+
+def load_texture_pair(filename):
+    """
+    Load a texture pair, with the second being a mirror image.
+    :param filename: absolute path to textures
+    :return: none
+    """
+    return [
+        arcade.load_texture(filename),
+        arcade.load_texture(filename, flipped_horizontally=True)
+    ]
+
+
+def load_character(main_path: str, walk_frames: int) -> CharacterTextures:
+    """
+    Load all textures of a character from Kenney.nl's animated characters.
+    :param main_path: path and file name prefix, e.g. ".../female_adventurer/femaleAdventurer"
+    :param walk_frames: number of frames in the walk animation
+    """
+    return CharacterTextures(load_texture_pair(f"{main_path}_idle.png"),
+                             [load_texture_pair(f"{main_path}_walk{i}.png") for i in range(walk_frames)])
+
+
+class StartupTimer:
+    """ Collects how long each step of starting up took, printed once the first frame is drawn """
+
+    def __init__(self, started: float = None):
+        self.started = time.perf_counter() if started is None else started
+        self.last = self.started
+        # CPU time used before the timer was created is mostly interpreter start and imports
+        self.lines: List[str] = [f"  Python und Imports: {1000 * time.process_time():.0f} ms CPU"]
+        self.lock = threading.Lock()
+        self.reported = False
+
+    def mark(self, step: str):
+        """ Record the time since the previous mark on the main thread """
+        now = time.perf_counter()
+        with self.lock:
+            self.lines.append(f"  {step}: {1000 * (now - self.last):.0f} ms")
+        self.last = now
+
+    def background(self, step: str, duration: float):
+        """ Record something that ran on the worker thread """
+        with self.lock:
+            self.lines.append(f"  {step}: {1000 * duration:.0f} ms (im Hintergrund)")
+
+    def first_frame(self):
+        """ Call when a frame has been drawn, prints the report the first time """
+        if self.reported:
+            return
+        self.reported = True
+        self.mark("erstes Bild")
+        with self.lock:
+            print("Start:")
+            print("\n".join(self.lines))
+        print(f"  bis zum ersten Bild: {1000 * (time.perf_counter() - self.started):.0f} ms")
+        print(f"  Peak RSS: {format_rss()}")
+
+
+class AssetLoader:
+    """
+    Loads sounds and textures on one worker thread, each file only once.
+    :param timer: startup timer to report loading times to
+    """
+
+    def __init__(self, timer: StartupTimer = None):
+        self.timer = timer
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+        self._futures: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def _submit(self, key: Tuple, load: Callable, *args) -> Future:
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._executor.submit(self._timed, key, load, *args)
+                self._futures[key] = future
+        return future
+
+    def _timed(self, key: Tuple, load: Callable, *args):
+        start = time.perf_counter()
+        result = load(*args)
+        if self.timer is not None:
+            self.timer.background(f"{key[0]} {key[1]}", time.perf_counter() - start)
+        return result
+
+    def preload_sound(self, filename: str):
+        """ Start loading a sound in the background """
+        self._submit(("sound", filename), arcade.load_sound, filename)
+
+    def sound(self, filename: str, wait: bool = True) -> Optional[arcade.Sound]:
+        """
+        A loaded sound.
+        :param filename: sound file
+        :param wait: if False, return None instead of waiting while the sound is still loading
+        """
+        future = self._submit(("sound", filename), arcade.load_sound, filename)
+        if not wait and not future.done():
+            return None
+        return future.result()
+
+    def preload_texture(self, filename: str):
+        self._submit(("texture", filename), arcade.load_texture, filename)
+
+    def texture(self, filename: str) -> arcade.Texture:
+        return self._submit(("texture", filename), arcade.load_texture, filename).result()
+
+    def preload_character(self, main_path: str, walk_frames: int):
+        """ Start loading the textures of an animated character in the background """
+        self._submit(("character", main_path), load_character, main_path, walk_frames)
+
+    def character(self, main_path: str, walk_frames: int) -> CharacterTextures:
+        """ Textures of an animated character, shared by all chasers that use it """
+        return self._submit(("character", main_path), load_character, main_path, walk_frames).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class PreloadedMusic:
+    """
+    Music from fully decoded sounds, loaded in the background by an AssetLoader.
+    Every track stays in memory for the whole session.
+    :param assets: loader holding the sounds
+    """
+
+    def __init__(self, assets: AssetLoader):
+        self.assets = assets
+
+    def preload(self, filename: str):
+        self.assets.preload_sound(filename)
+
+    def play(self, filename: str, volume: float, loop: bool) -> Optional[media.Player]:
+        """ Start a track, or return None if it is still loading """
+        sound = self.assets.sound(filename, wait=False)
+        if sound is None:
+            return None
+        return sound.play(volume, loop=loop)
+
+    def stop(self, filename: str, player: media.Player):
+        self.assets.sound(filename).stop(player)
+
+
+class StreamingMusic:
+    """
+    Music streamed from the file while it plays. Only the current track is open,
+    the previous one is released when it is stopped.
+    """
+
+    def __init__(self):
+        self.player: Optional[media.Player] = None
+
+    def preload(self, filename: str):
+        """ Nothing to do, streaming sources are opened when they start playing """
+
+    def play(self, filename: str, volume: float, loop: bool) -> media.Player:
+        if self.player is not None:
+            self.release()
+        player = media.Player()
+        player.volume = volume
+        player.loop = loop
+        player.queue(media.load(filename, streaming=True))
+        player.play()
+        self.player = player
+        return player
+
+    def stop(self, filename: str, player: media.Player):
+        if player is self.player:
+            self.release()
+
+    def release(self):
+        """ Stop the current track and close its file and decoder """
+        self.player.pause()
+        self.player.delete()
+        self.player = None
+
+
+class NoMusic:
+    """ Plays nothing, for recording a video where there may be no sound device """
+
+    def preload(self, filename: str):
+        """ Nothing to load """
+
+    def play(self, filename: str, volume: float, loop: bool) -> None:
+        return None
+
+    def stop(self, filename: str, player: media.Player):
+        """ Nothing is playing """
@@ -0,0 +1,188 @@
+"""
+Benchmarks of the per-frame hot path at increasing roster sizes, without a window.
+
+Times setting up a draw and each phase of a tick as GameView.on_update runs it through the
+simulation: chaser movement, chaser animation, collision detection and hit processing,
+plus respawn positions drawn one by one, in a batch and from the RandomStream buffer.
+Results are written as JSON, so runs can be compared across commits:
+
+python benchmark.py --output bench.json
+python benchmark.py --baseline bench.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from profiling import PHASES, FrameProfiler, NullProfiler
+from simulation import RandomStream, Simulation, random_xy_position, random_xy_positions
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+# Field size of a typical full HD projector
+WIDTH = 1920
+HEIGHT = 1080
+
+# Lives per coin, high enough that no coin is eliminated while a benchmark runs and the roster size stays put
+BENCHMARK_LIVES = 1000000
+
+# Phases that Simulation.step marks
+TICK_PHASES = ("movement", "animation", "collision", "hits")
+
+# Regressions smaller than this are noise, whatever the relative change
+NOISE_FLOOR_US = 2.0
+
+
+def median_us(samples: Sequence[float]) -> float:
+    return float(np.median(samples)) * 1e6
+
+
+def time_call(function: Callable, repeat: int) -> float:
+    """ Median time of a call in microseconds """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return median_us(samples)
+
+
+def benchmark_size(size: int, ticks: int, rounds: int, seed: int, chasers: int = 2) -> Dict[str, float]:
+    """
+    Time the setup and every phase of a tick for one roster size.
+    :param size: number of coins
+    :param ticks: number of ticks to time per round
+    :param rounds: the fastest round counts, which evens out other load on the machine
+    :param seed: seed of the draw, so runs are comparable
+    :param chasers: number of chasers
+    :return: median microseconds per phase
+    """
+    names = [f"Person {i}" for i in range(size)]
+    lives = np.full(size, BENCHMARK_LIVES, dtype=np.int32)
+
+    setup_repeat = max(3, min(20, 200000 // size))
+    results = {"setup": time_call(lambda: Simulation(names, lives, 10, WIDTH, HEIGHT, seed=seed, chaser_count=chasers),
+                                  setup_repeat)}
+
+    sim = Simulation(names, lives, 10, WIDTH, HEIGHT, seed=seed, chaser_count=chasers)
+    best: Dict[str, float] = {}
+    for _ in range(rounds):
+        for phase, value in time_ticks(sim, ticks).items():
+            best[phase] = min(value, best.get(phase, value))
+    results.update(best)
+
+    rng = np.random.default_rng(seed)
+    results["respawn_one"] = time_call(lambda: random_xy_position(WIDTH, HEIGHT, rng), 1000)
+    results["respawn_100"] = time_call(lambda: random_xy_positions(100, WIDTH, HEIGHT, rng), 1000)
+    stream = RandomStream(rng, WIDTH, HEIGHT)
+    results["respawn_stream_100"] = time_call(lambda: stream.positions(100), 1000)
+    return results
+
+
+def time_ticks(sim: Simulation, ticks: int) -> Dict[str, float]:
+    """ Median microseconds of each phase of Simulation.step over a number of ticks, as its profiler marks them """
+    profiler = FrameProfiler()
+    sim.profiler = profiler
+    try:
+        for _ in range(ticks):
+            profiler.start()
+            sim.step()
+            profiler.end_frame(sim.remaining)
+    finally:
+        sim.profiler = NullProfiler()
+
+    rows = np.array([row[2:2 + len(PHASES)] for row in profiler.rows])
+    phases = {phase: rows[:, profiler.columns[phase]] for phase in TICK_PHASES}
+    phases["tick"] = rows[:, [profiler.columns[phase] for phase in TICK_PHASES]].sum(axis=1)
+    return {phase: median_us(samples) for phase, samples in phases.items()}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: List[int], ticks: int, rounds: int, seed: int, chasers: int = 2) -> dict:
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "ticks": ticks,
+            "rounds": rounds,
+            "chasers": chasers,
+            "unit": "us",
+        },
+        "results": {},
+    }
+    for size in sizes:
+        results = benchmark_size(size, ticks, rounds, seed, chasers)
+        report["results"][str(size)] = results
+        print(f"{size:7d} Münzen: " + ", ".join(f"{phase} {value:.1f}" for phase, value in results.items()) + " µs")
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Phases that got slower than the baseline by more than the tolerance.
+    :param tolerance: allowed relative slowdown, e.g. 0.25 for 25%
+    :return: one line per regression
+    """
+    regressions = []
+    for size, results in report["results"].items():
+        for phase, value in results.items():
+            before = baseline.get("results", {}).get(size, {}).get(phase)
+            if before is None:
+                continue
+            if value > before * (1 + tolerance) and value - before > NOISE_FLOOR_US:
+                regressions.append(f"{size} Münzen, {phase}: {before:.1f} -> {value:.1f} µs "
+                                   f"(+{100 * (value / before - 1):.0f}%)")
+    return regressions
+
+
+def main():
+    """ Run the benchmarks from the command line """
+
+    parser = argparse.ArgumentParser(description='Benchmarks der Spielschleife bei wachsender Anzahl Lose.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Anzahl Münzen.')
+    parser.add_argument('--ticks', type=int, default=200, help='Gemessene Ticks pro Runde.')
+    parser.add_argument('--rounds', type=int, default=3, help='Runden pro Größe, die schnellste zählt.')
+    parser.add_argument('--seed', type=int, default=1, help='Startwert für den Zufallsgenerator.')
+    parser.add_argument('--chasers', type=int, default=2, help='Anzahl Jäger.')
+    parser.add_argument('--output', type=str, default=None, help='Ergebnisse als JSON in diese Datei schreiben.')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='JSON eines früheren Laufs. Bei Verschlechterung endet das Programm mit Code 1.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Erlaubte Verschlechterung gegenüber der Baseline, 0.25 = 25%%.')
+
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.ticks, args.rounds, args.seed, args.chasers)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"Langsamer als {args.baseline} (Commit {baseline['meta'].get('commit')}):")
+            print("\n".join(f"  {line}" for line in regressions))
+            sys.exit(1)
+        print(f"Keine Verschlechterung gegenüber {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
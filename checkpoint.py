@@ -0,0 +1,122 @@
+"""
+Crash-safe snapshots of a running draw, so a crash or a sleeping laptop does not start the draw over.
+
+The game copies its state every few seconds, which takes well under a millisecond even for
+large rosters. A background thread writes the copy as an uncompressed .npz file: first to a
+temporary file, then renamed over the previous snapshot, so there is always one complete snapshot
+on disk. Restart with --resume to continue exactly where the snapshot was taken.
+"""
+import hashlib
+import os
+import queue
+import threading
+import time
+import zipfile
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+CHECKPOINT_FILE = "checkpoint.npz"
+
+# Seconds between two snapshots
+CHECKPOINT_INTERVAL = 5.0
+
+
+class CheckpointError(ValueError):
+    """ The snapshot cannot be read or does not belong to this roster """
+
+
+def roster_digest(names: Sequence[str], lives: np.ndarray) -> str:
+    """ Fingerprint of a roster, to make sure a snapshot is resumed with the roster it was taken from """
+    digest = hashlib.sha256()
+    digest.update("\0".join(names).encode("utf-8"))
+    digest.update(np.asarray(lives, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+
+def write_checkpoint(filename: str, state: Dict[str, np.ndarray]):
+    """
+    Write a snapshot atomically: readers see either the previous or the new file, never half of one.
+    :param filename: snapshot file
+    :param state: arrays to store, e.g. from Simulation.get_state
+    """
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as file:
+        np.savez(file, **state)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, filename)
+
+
+def read_checkpoint(filename: str, digest: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Read a snapshot.
+    :param filename: snapshot file
+    :param digest: roster_digest of the roster to resume with, None to skip the check
+    """
+    try:
+        with np.load(filename) as data:
+            state = {key: data[key] for key in data.files}
+    except (OSError, ValueError, zipfile.BadZipFile) as error:
+        raise CheckpointError(f"{filename}: Spielstand kann nicht gelesen werden ({error})") from None
+    if digest is not None and str(state.get("roster")) != digest:
+        raise CheckpointError(f"{filename}: Spielstand gehört zu einer anderen Losliste")
+    return state
+
+
+class CheckpointWriter:
+    """
+    Writes snapshots on a background thread, so the game does not wait for the disk.
+    If the previous snapshot is still being written when the next one is due, the new one is skipped.
+    :param filename: snapshot file
+    :param digest: roster_digest stored with every snapshot
+    :param interval: seconds between two snapshots
+    """
+
+    def __init__(self, filename: str, digest: str, interval: float = CHECKPOINT_INTERVAL):
+        self.filename = filename
+        self.digest = digest
+        self.interval = interval
+        self.last_save = time.perf_counter()
+        self.written = 0
+        self.skipped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="checkpoint", daemon=True)
+        self._thread.start()
+
+    @property
+    def due(self) -> bool:
+        return time.perf_counter() - self.last_save >= self.interval
+
+    def save(self, state: Dict[str, np.ndarray]):
+        """
+        Hand a snapshot to the writer thread without waiting.
+        :param state: arrays that are not changed afterwards, i.e. copies
+        """
+        self.last_save = time.perf_counter()
+        state["roster"] = np.array(self.digest)
+        try:
+            self._queue.put_nowait(state)
+        except queue.Full:
+            self.skipped += 1
+
+    def _run(self):
+        while True:
+            state = self._queue.get()
+            if state is None:
+                return
+            try:
+                write_checkpoint(self.filename, state)
+                self.written += 1
+            except OSError as error:
+                print(f"Spielstand konnte nicht gespeichert werden: {error}")
+
+    def close(self, remove: bool = False):
+        """
+        Wait for the last snapshot to be written and stop the thread.
+        :param remove: delete the snapshot, e.g. because the draw is over
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if remove and os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -0,0 +1,246 @@
+"""
+Append-only log of a draw, to reproduce it exactly for an audit ("why did I lose?").
+
+The log starts with the seed and settings of the draw. Then every tick appends a record with its
+frame time and the coins hit, with the lives they have left; lives <= 0 is an elimination. Positions
+are not logged: replaying the seed with the same frame times reproduces them, and the logged hits
+prove the replay took the same course.
+
+Replay a draw without a window and check it ends with the same winners.txt:
+python eventlog.py -i TombolaLose.xlsx -p prizes.txt --log draw.log
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from checkpoint import roster_digest
+from pacing import DurationController
+from roster import RosterError, load_roster
+from simulation import Hits, Simulation, format_winners, read_prizes
+
+EVENT_LOG_FILE = "draw.log"
+
+_MAGIC = b"TOMBOLA-LOG1"
+
+# Tick number, frame time in seconds and number of hits, followed by the coin indices and their lives
+_TICK = struct.Struct("<IdI")
+_HEADER_LENGTH = struct.Struct("<I")
+
+# Ticks buffered before they are written, about a second of game time
+FLUSH_TICKS = 60
+
+
+class EventLogError(ValueError):
+    """ The log cannot be read, or does not fit the roster or the saved game """
+
+
+class DrawSettings(NamedTuple):
+    """
+    Everything besides the frame times that decides the course of a draw.
+    :param seed: seed of the random number generator
+    :param roster: roster_digest of the roster
+    :param prize_count: number of prizes
+    :param width: width of the playing field
+    :param height: height of the playing field
+    :param characters: characters of the chasers, taken in turn
+    :param chaser_count: number of chasers at the start
+    :param duration: target duration in seconds, None without pacing
+    """
+    seed: int
+    roster: str
+    prize_count: int
+    width: int
+    height: int
+    characters: List[str]
+    chaser_count: int
+    duration: Optional[float]
+
+    def simulation(self, names: List[str], lives: np.ndarray) -> Tuple[Simulation, Optional[DurationController]]:
+        """ A new draw with these settings, and its duration controller if it has a target duration """
+        sim = Simulation(names, lives, self.prize_count, self.width, self.height, chasers=self.characters,
+                         seed=self.seed, chaser_count=self.chaser_count)
+        pacing = DurationController(sim, self.duration, self.seed) if self.duration else None
+        return sim, pacing
+
+
+class TickRecord(NamedTuple):
+    """
+    :param tick: number of the tick, starting at 1
+    :param delta_time: frame time the tick was stepped with
+    :param hits: coins hit in this tick
+    """
+    tick: int
+    delta_time: float
+    hits: Hits
+
+
+class EventLogWriter:
+    """
+    Appends tick records to a log. Records are buffered and written about once a second;
+    after a crash the log ends with the last complete record.
+    :param file: log opened for binary writing, positioned at its end
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.buffer: List[bytes] = []
+
+    @classmethod
+    def create(cls, filename: str, settings: DrawSettings) -> "EventLogWriter":
+        """ Start a new log with the settings of the draw """
+        header = json.dumps(settings._asdict()).encode("utf-8")
+        file = open(filename, "wb")
+        file.write(_MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        return cls(file)
+
+    @classmethod
+    def resume(cls, filename: str, tick: int) -> "EventLogWriter":
+        """
+        Continue a log after the game was resumed from a snapshot of the given tick.
+        Records after that tick were never part of the resumed draw and are cut off.
+        """
+        try:
+            with open(filename, "rb") as file:
+                _, end = read_header(file)
+                last = 0
+                for record in read_records(file):
+                    if record.tick > tick:
+                        break
+                    end = file.tell()
+                    last = record.tick
+        except OSError as error:
+            raise EventLogError(f"{filename}: Ereignisprotokoll kann nicht gelesen werden ({error})") from None
+        if last != tick:
+            raise EventLogError(f"{filename}: Ereignisprotokoll reicht nicht bis zum Spielstand (Tick {tick})")
+
+        file = open(filename, "r+b")
+        file.truncate(end)
+        file.seek(end)
+        return cls(file)
+
+    def record(self, tick: int, delta_time: float, hits: Hits):
+        self.buffer.append(_TICK.pack(tick, delta_time, len(hits.index)))
+        if len(hits.index):
+            self.buffer.append(hits.index.astype("<u4").tobytes() + hits.lives.astype("<i4").tobytes())
+        if len(self.buffer) >= FLUSH_TICKS:
+            self.flush()
+
+    def flush(self):
+        """ Write buffered records, e.g. before a snapshot is taken """
+        self.file.write(b"".join(self.buffer))
+        self.file.flush()
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_header(file: BinaryIO) -> Tuple[DrawSettings, int]:
+    """
+    Settings at the start of a log.
+    :return: the settings, and the offset of the first record
+    """
+    magic = file.read(len(_MAGIC))
+    if magic != _MAGIC:
+        raise EventLogError("kein Ereignisprotokoll der Tombola")
+    length, = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+    settings = DrawSettings(**json.loads(file.read(length).decode("utf-8")))
+    return settings, file.tell()
+
+
+def read_records(file: BinaryIO) -> Iterator[TickRecord]:
+    """ Tick records from the current position to the last complete one """
+    while True:
+        head = file.read(_TICK.size)
+        if len(head) < _TICK.size:
+            return
+        tick, delta_time, count = _TICK.unpack(head)
+        body = file.read(8 * count)
+        if len(body) < 8 * count:
+            return
+        index = np.frombuffer(body, dtype="<u4", count=count).astype(np.intp)
+        lives = np.frombuffer(body, dtype="<i4", offset=4 * count).astype(np.int32)
+        yield TickRecord(tick, delta_time, Hits(index, lives))
+
+
+def read_log(filename: str) -> Tuple[DrawSettings, List[TickRecord]]:
+    """ Settings and all complete records of a log """
+    try:
+        with open(filename, "rb") as file:
+            settings, _ = read_header(file)
+            return settings, list(read_records(file))
+    except OSError as error:
+        raise EventLogError(f"{filename}: Ereignisprotokoll kann nicht gelesen werden ({error})") from None
+    except EventLogError as error:
+        raise EventLogError(f"{filename}: {error}") from None
+
+
+def same_hits(a: Hits, b: Hits) -> bool:
+    return np.array_equal(a.index, b.index) and np.array_equal(a.lives, b.lives)
+
+
+def replay(settings: DrawSettings, records: List[TickRecord], names: List[str],
+           lives: np.ndarray) -> Simulation:
+    """
+    Step a draw again with the logged frame times.
+    :raises EventLogError: if a tick hits other coins than logged
+    :return: the draw after the last logged tick
+    """
+    if roster_digest(names, lives) != settings.roster:
+        raise EventLogError("Ereignisprotokoll gehört zu einer anderen Losliste")
+    sim, pacing = settings.simulation(names, lives)
+    for record in records:
+        hits = sim.step(record.delta_time)
+        if pacing is not None:
+            pacing.update(hits, record.delta_time)
+        if sim.tick != record.tick or not same_hits(hits, record.hits):
+            raise EventLogError(f"Tick {record.tick}: Wiederholung trifft andere Lose als protokolliert")
+    return sim
+
+
+def main():
+    """ Replay a logged draw without a window and compare the winners """
+
+    parser = argparse.ArgumentParser(description='Protokollierte Ziehung ohne Fenster wiederholen und prüfen.')
+    parser.add_argument('-i', metavar='excelfile', dest='excelfile', type=str, required=True,
+                        help='Pfad zur Excel- (.xlsx), CSV- oder TSV-Datei, die die Namen und Lose enthält.')
+    parser.add_argument('-p', metavar='prizes', dest='prizes', type=str, required=True,
+                        help='Pfad zu einer .txt-Datei, die die Preise enthält.')
+    parser.add_argument('--log', type=str, default=EVENT_LOG_FILE, help='Ereignisprotokoll der Ziehung.')
+    parser.add_argument('--winners', type=str, default='winners.txt', help='Gewinnerliste, mit der verglichen wird.')
+
+    args = parser.parse_args()
+
+    try:
+        roster = load_roster(args.excelfile)
+        settings, records = read_log(args.log)
+        sim = replay(settings, records, roster.names, roster.lives)
+    except (RosterError, EventLogError) as error:
+        parser.error(str(error))
+    print(f"{len(records)} Ticks wiederholt, {sim.elapsed:.0f}s Spielzeit, alle Treffer wie protokolliert")
+
+    if not sim.finished:
+        print(f"Protokoll endet vor dem Ende der Ziehung, noch {sim.remaining} Lose im Spiel")
+        sys.exit(1)
+
+    expected = format_winners(sim.winners_with_prizes(read_prizes(args.prizes)))
+    if not os.path.exists(args.winners):
+        print(expected, end="")
+        print(f"{args.winners} nicht gefunden")
+        sys.exit(1)
+    with open(args.winners) as f:
+        if f.read() != expected:
+            print(f"{args.winners} weicht von der Wiederholung ab:")
+            print(expected, end="")
+            sys.exit(1)
+    print(f"{args.winners} stimmt mit der Wiederholung überein")
+
+
+if __name__ == "__main__":
+    main()
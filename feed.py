@@ -0,0 +1,379 @@
+"""
+Live feed of the draw for remote audiences, as JSON messages over a local WebSocket.
+
+The game hands every tick with hits to an EventFeed, which only appends to a queue and returns.
+A background thread turns each tick into one message and sends the same bytes to every subscriber,
+so a dashboard, or a small relay that fans the feed out further, costs the game next to nothing.
+Subscribers that cannot keep up are dropped rather than slowing the game down.
+
+Messages:
+{"type": "hello", "tick": 120, "remaining": 512}                  on connecting
+{"type": "tick", "tick": 121, "time": 2.0, "remaining": 511,
+ "hits": [{"name": "Anna", "lives": 2}, {"name": "Ben", "lives": 0}]}  lives 0 is an elimination
+{"type": "winners", "winners": [{"name": "Anna", "prize": "Fahrrad"}]}
+
+Watch a running draw in the terminal:
+python feed.py --port 8765
+"""
+import argparse
+import base64
+import collections
+import hashlib
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simulation import Hits
+
+FEED_HOST = "127.0.0.1"
+FEED_PORT = 8765
+
+# Bytes queued for a subscriber before it is dropped as too slow
+MAX_BACKLOG = 1 << 20
+
+# Seconds the last messages get to reach the subscribers when the feed is closed
+CLOSE_TIMEOUT = 1.0
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+def encode_frame(payload: bytes, opcode: int = _OP_TEXT, mask: bool = False) -> bytes:
+    """ A single, final WebSocket frame. Frames from a client must be masked, frames from the server not. """
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, length)
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + _apply_mask(payload, key)
+
+
+def decode_frame(buffer: bytes) -> Optional[Tuple[int, bytes, int]]:
+    """
+    The first frame in a buffer.
+    :return: opcode, unmasked payload and bytes used, or None if the frame is not complete yet
+    """
+    if len(buffer) < 2:
+        return None
+    opcode = buffer[0] & 0x0F
+    masked = buffer[1] & 0x80
+    length = buffer[1] & 0x7F
+    offset = 2
+    if length == 126:
+        if len(buffer) < 4:
+            return None
+        length, = struct.unpack_from("!H", buffer, 2)
+        offset = 4
+    elif length == 127:
+        if len(buffer) < 10:
+            return None
+        length, = struct.unpack_from("!Q", buffer, 2)
+        offset = 10
+    key = b""
+    if masked:
+        key = buffer[offset:offset + 4]
+        offset += 4
+    if len(buffer) < offset + length:
+        return None
+    payload = buffer[offset:offset + length]
+    return opcode, _apply_mask(payload, key) if masked else payload, offset + length
+
+
+def _apply_mask(payload: bytes, key: bytes) -> bytes:
+    data = np.frombuffer(payload, dtype=np.uint8)
+    return (data ^ np.resize(np.frombuffer(key, dtype=np.uint8), len(data))).tobytes()
+
+
+def accept_key(key: str) -> str:
+    """ Sec-WebSocket-Accept for a Sec-WebSocket-Key (RFC 6455, section 4.2.2) """
+    return base64.b64encode(hashlib.sha1(key.encode("ascii") + _GUID).digest()).decode("ascii")
+
+
+class _Subscriber:
+
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.incoming = b""
+        self.outgoing = bytearray()
+        self.open = False
+
+
+class EventFeed:
+    """
+    WebSocket server publishing the draw, running on its own thread.
+    :param name: name of a coin by its index, called on the feed thread
+    :param host: address to listen on, local only by default
+    :param port: port to listen on
+    """
+
+    def __init__(self, name: Callable[[int], str], host: str = FEED_HOST, port: int = FEED_PORT):
+        self.name = name
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.server.setblocking(False)
+        self.address = self.server.getsockname()
+
+        # The game only appends here and pokes the wake-up socket
+        self._pending: collections.deque = collections.deque()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_writer.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.server, selectors.EVENT_READ)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+        self._subscribers: Dict[socket.socket, _Subscriber] = {}
+
+        # Read by the game, so ticks are not even queued while nobody watches
+        self.subscribers = 0
+        self.tick = 0
+        self.remaining = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="feed", daemon=True)
+        self._thread.start()
+
+    def publish_tick(self, tick: int, elapsed: float, remaining: int, hits: Hits):
+        """ Queue a tick without waiting; ticks without hits are not sent """
+        self.tick = tick
+        self.remaining = remaining
+        if self.subscribers and len(hits.index):
+            self._pending.append({"type": "tick", "tick": tick, "time": round(elapsed, 3), "remaining": remaining,
+                                  "hits": hits})
+            self._wake()
+
+    def publish_winners(self, winners_with_prizes: List[Tuple[str, str]]):
+        self._pending.append({"type": "winners", "winners": [{"name": name, "prize": prize.strip()}
+                                                             for (name, prize) in winners_with_prizes]})
+        self._wake()
+
+    def close(self):
+        """ Send what is queued, then close all connections and stop the thread """
+        self._pending.append(None)
+        self._wake()
+        self._thread.join()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b"\0")
+        except BlockingIOError:
+            # Already plenty of wake-ups pending
+            pass
+
+    def _run(self):
+        deadline = None
+        while deadline is None or (time.monotonic() < deadline and
+                                   any(subscriber.outgoing for subscriber in self._subscribers.values())):
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            for key, events in self._selector.select(timeout):
+                if key.fileobj is self.server:
+                    self._accept()
+                elif key.fileobj is self._wake_reader:
+                    self._wake_reader.recv(4096)
+                    if self._send_pending() and deadline is None:
+                        deadline = time.monotonic() + CLOSE_TIMEOUT
+                else:
+                    subscriber = self._subscribers.get(key.fileobj)
+                    if subscriber is None:
+                        # Dropped while handling an earlier event of this round
+                        continue
+                    if events & selectors.EVENT_READ:
+                        self._receive(subscriber)
+                    if events & selectors.EVENT_WRITE and key.fileobj in self._subscribers:
+                        self._flush(subscriber)
+
+        for subscriber in list(self._subscribers.values()):
+            self._drop(subscriber)
+        self._selector.close()
+        self.server.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+    def _send_pending(self) -> bool:
+        """ One message per queued event, the same bytes for every subscriber. True once close() was called. """
+        while self._pending:
+            event = self._pending.popleft()
+            if event is None:
+                frame = encode_frame(b"", _OP_CLOSE)
+            else:
+                hits = event.get("hits")
+                if hits is not None:
+                    # A coin hit by two chasers at once can end below 0, the feed says 0 for every elimination
+                    event["hits"] = [{"name": self.name(index), "lives": max(lives, 0)}
+                                     for index, lives in zip(hits.index.tolist(), hits.lives.tolist())]
+                frame = encode_frame(json.dumps(event, ensure_ascii=False).encode("utf-8"))
+            for subscriber in list(self._subscribers.values()):
+                if subscriber.open:
+                    self._send(subscriber, frame)
+            if event is None:
+                return True
+        return False
+
+    def _accept(self):
+        try:
+            connection, _ = self.server.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        subscriber = _Subscriber(connection)
+        self._subscribers[connection] = subscriber
+        self._selector.register(connection, selectors.EVENT_READ)
+
+    def _receive(self, subscriber: _Subscriber):
+        try:
+            data = subscriber.connection.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(subscriber)
+            return
+        subscriber.incoming += data
+        if not subscriber.open:
+            self._handshake(subscriber)
+            return
+
+        # Subscribers only listen; answer pings and closes, ignore anything else they send
+        while True:
+            frame = decode_frame(subscriber.incoming)
+            if frame is None:
+                return
+            opcode, payload, used = frame
+            subscriber.incoming = subscriber.incoming[used:]
+            if opcode == _OP_PING:
+                self._send(subscriber, encode_frame(payload, _OP_PONG))
+            elif opcode == _OP_CLOSE:
+                self._send(subscriber, encode_frame(b"", _OP_CLOSE))
+                self._flush(subscriber)
+                self._drop(subscriber)
+                return
+
+    def _handshake(self, subscriber: _Subscriber):
+        if b"\r\n\r\n" not in subscriber.incoming:
+            if len(subscriber.incoming) > 8192:
+                self._drop(subscriber)
+            return
+        request, _, subscriber.incoming = subscriber.incoming.partition(b"\r\n\r\n")
+        lines = request.decode("latin-1").split("\r\n")
+        headers = {name.strip().lower(): value.strip()
+                   for name, _, value in (line.partition(":") for line in lines[1:])}
+        if not lines[0].startswith("GET ") or headers.get("upgrade", "").lower() != "websocket" or \
+                "sec-websocket-key" not in headers:
+            self._send(subscriber, b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            self._flush(subscriber)
+            self._drop(subscriber)
+            return
+
+        subscriber.open = True
+        self.subscribers += 1
+        self._send(subscriber, ("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                                f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n")
+                   .encode("ascii"))
+        hello = {"type": "hello", "tick": self.tick, "remaining": self.remaining}
+        self._send(subscriber, encode_frame(json.dumps(hello).encode("utf-8")))
+
+    def _send(self, subscriber: _Subscriber, data: bytes):
+        if len(subscriber.outgoing) + len(data) > MAX_BACKLOG:
+            # Too slow for the draw, let it reconnect
+            self.dropped += 1
+            self._drop(subscriber)
+            return
+        was_empty = not subscriber.outgoing
+        subscriber.outgoing += data
+        self._flush(subscriber)
+        if was_empty and subscriber.outgoing and subscriber.connection in self._subscribers:
+            self._selector.modify(subscriber.connection, selectors.EVENT_READ | selectors.EVENT_WRITE)
+
+    def _flush(self, subscriber: _Subscriber):
+        try:
+            sent = subscriber.connection.send(subscriber.outgoing)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._drop(subscriber)
+            return
+        del subscriber.outgoing[:sent]
+        if not subscriber.outgoing and subscriber.connection in self._subscribers:
+            self._selector.modify(subscriber.connection, selectors.EVENT_READ)
+
+    def _drop(self, subscriber: _Subscriber):
+        if self._subscribers.pop(subscriber.connection, None) is None:
+            return
+        if subscriber.open:
+            self.subscribers -= 1
+        subscriber.outgoing.clear()
+        self._selector.unregister(subscriber.connection)
+        subscriber.connection.close()
+
+
+def main():
+    """ Minimal subscriber: print the feed of a running draw """
+
+    parser = argparse.ArgumentParser(description='Live-Übertragung einer laufenden Ziehung anzeigen.')
+    parser.add_argument('--host', type=str, default=FEED_HOST, help='Adresse des Spiels.')
+    parser.add_argument('--port', type=int, default=FEED_PORT, help='Port der Übertragung (--feed im Spiel).')
+
+    args = parser.parse_args()
+
+    try:
+        connection = socket.create_connection((args.host, args.port))
+    except OSError as error:
+        parser.error(f"keine Übertragung auf {args.host}:{args.port} ({error})")
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    connection.sendall(f"GET / HTTP/1.1\r\nHost: {args.host}:{args.port}\r\nUpgrade: websocket\r\n"
+                       f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+                       .encode("ascii"))
+    buffer = b""
+    while b"\r\n\r\n" not in buffer:
+        data = connection.recv(4096)
+        if not data:
+            parser.error("Verbindung abgelehnt")
+        buffer += data
+    response, _, buffer = buffer.partition(b"\r\n\r\n")
+    if accept_key(key) not in response.decode("latin-1"):
+        parser.error("keine WebSocket-Übertragung")
+
+    while True:
+        frame = decode_frame(buffer)
+        if frame is None:
+            data = connection.recv(65536)
+            if not data:
+                return
+            buffer += data
+            continue
+        opcode, payload, used = frame
+        buffer = buffer[used:]
+        if opcode == _OP_CLOSE:
+            return
+        event = json.loads(payload.decode("utf-8"))
+        if event["type"] == "tick":
+            eliminated = [hit["name"] for hit in event["hits"] if hit["lives"] <= 0]
+            line = f"{event['time']:8.1f}s  {event['remaining']:6d} Lose  {len(event['hits'])} Treffer"
+            print(line + (f", raus: {', '.join(eliminated)}" if eliminated else ""))
+        elif event["type"] == "winners":
+            for winner in event["winners"]:
+                print(f"{winner['name']} - {winner['prize']}")
+        else:
+            print(f"Verbunden bei Tick {event['tick']}, {event['remaining']} Lose im Spiel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Memory per participant, measured with tracemalloc, for a large roster.
+
+Shows what the roster and the draw hold per participant, next to the plain Python
+models they replaced, a list of name strings and an object per participant:
+
+python footprint.py --size 100000
+python footprint.py -i TombolaLose.xlsx
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable, List, Set, Tuple
+
+import numpy as np
+
+from roster import NameTable, RosterError, load_roster
+from simulation import Simulation
+from spatial import SpatialGrid
+
+DEFAULT_SIZE = 100000
+
+# Field size of a typical full HD projector
+WIDTH = 1920
+HEIGHT = 1080
+
+
+class _Participant:
+    """ An object per participant, as a sprite subclass would hold it, for comparison """
+
+    def __init__(self, name: str, lives: int, x: float, y: float):
+        self.name = name
+        self.lives = lives
+        self.x = x
+        self.y = y
+
+
+def _set_grid(grid: SpatialGrid) -> List[Set[int]]:
+    """ A set of coins per grid cell, as the spatial grid held them before, for comparison """
+    cells: List[Set[int]] = [set() for _ in range(grid.columns * grid.rows)]
+    for index, cell in enumerate(grid.cell_of.tolist()):
+        if cell >= 0:
+            cells[cell].add(index)
+    return cells
+
+
+def _array_grid(count: int, x: np.ndarray, y: np.ndarray) -> SpatialGrid:
+    grid = SpatialGrid(WIDTH, HEIGHT, count)
+    grid.insert(np.arange(count), x, y)
+    return grid
+
+
+def allocated(build: Callable[[], object]) -> Tuple[object, int]:
+    """ Bytes still allocated by what build returns """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def measure(names: List[str], lives: np.ndarray) -> List[Tuple[str, int]]:
+    """ Bytes held by each model of the roster and by the draw """
+    count = len(names)
+    # The names come as bytes from the file, so the strings are built inside the measurement
+    encoded = [name.encode("utf-8") for name in names]
+    _, strings = allocated(lambda: [name.decode("utf-8") for name in encoded])
+    table, packed = allocated(lambda: NameTable(name.decode("utf-8") for name in encoded))
+    xy = np.random.default_rng(1).random((2, count)) * [[WIDTH], [HEIGHT]]
+    _, objects = allocated(lambda: [_Participant(name.decode("utf-8"), int(lives[i]), float(xy[0, i]), float(xy[1, i]))
+                                    for i, name in enumerate(encoded)])
+    grid, arrays = allocated(lambda: _array_grid(count, xy[0], xy[1]))
+    _, sets = allocated(lambda: _set_grid(grid))
+    _, sim = allocated(lambda: Simulation(table, lives, 10, WIDTH, HEIGHT, seed=1))
+    return [
+        ("Namen als Liste von Strings", strings),
+        ("Namen als NameTable", packed),
+        ("Objekt pro Teilnehmer (Name, Leben, x, y)", objects),
+        ("NameTable + Leben", packed + lives.nbytes),
+        ("Raster als Set pro Zelle", sets),
+        ("Raster als Arrays", arrays),
+        ("Ziehung (Münzen, Raster, Platzierung, Zufall)", sim),
+        ("NameTable + Leben + Ziehung", packed + lives.nbytes + sim),
+    ]
+
+
+def main():
+    """ Print bytes per participant """
+
+    parser = argparse.ArgumentParser(description='Speicherbedarf pro Teilnehmer messen.')
+    parser.add_argument('-i', metavar='excelfile', dest='excelfile', type=str, default=None,
+                        help='Losliste (.xlsx, .csv oder .tsv). Ohne wird eine erfundene mit --size Namen gemessen.')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help='Anzahl erfundener Teilnehmer.')
+
+    args = parser.parse_args()
+
+    if args.excelfile:
+        try:
+            roster = load_roster(args.excelfile)
+        except RosterError as error:
+            parser.error(str(error))
+        names, lives = list(roster.names), roster.lives
+    else:
+        names = [f"Vorname{i} Nachname{i % 977}" for i in range(args.size)]
+        lives = np.random.default_rng(1).integers(1, 6, args.size).astype(np.int32)
+
+    print(f"{len(names)} Teilnehmer, Bytes pro Teilnehmer:")
+    for label, size in measure(names, lives):
+        print(f"  {label:<48} {size / len(names):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
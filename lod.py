@@ -0,0 +1,156 @@
+"""
+Level of detail for the playing field, so the game keeps its frame rate with very large rosters.
+
+With thousands of coins the names overlap into an unreadable blob and drawing a sprite and a
+label per coin costs more than a frame. The detail follows the number of coins on the field:
+
+LOD_FULL:   a sprite and a name for every coin
+LOD_NAMES:  a sprite for every coin, names only for coins in danger or close to a chaser
+LOD_POINTS: all coins as one batch of coloured points, names as in LOD_NAMES
+
+A tier only becomes finer once the field has thinned out well below its threshold,
+so the detail does not flicker back and forth around it.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+from arcade.gl import BufferDescription
+
+from simulation import TIER_NORMAL, Simulation
+
+LOD_FULL = 0
+LOD_NAMES = 1
+LOD_POINTS = 2
+
+# Coins on the field above which LOD_NAMES and LOD_POINTS are used
+LOD_THRESHOLDS = (400, 4000)
+
+# A finer tier is used again only below this fraction of its threshold
+LOD_HYSTERESIS = 0.8
+
+# Coins that were hit and have at most this many lives left are in danger, their names are always shown.
+# Coins that start with few lives are not: their names would all be shown from the first frame.
+DANGER_LIVES = 2
+
+# Names are shown for coins this close to a chaser's collision box, in pixels
+NEAR_CHASER = 60
+
+# Most names shown at once outside LOD_FULL; coins close to a chaser come first
+MAX_LABELS = 400
+
+# Diameter of a coin drawn as a point, in pixels
+POINT_SIZE = 12
+
+_VERTEX_SHADER = """
+#version 330
+
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+uniform float point_size;
+
+in vec2 in_vert;
+in vec4 in_color;
+out vec4 v_color;
+
+void main() {
+    gl_Position = proj.matrix * vec4(in_vert, 0.0, 1.0);
+    gl_PointSize = point_size;
+    v_color = in_color;
+}
+"""
+
+_FRAGMENT_SHADER = """
+#version 330
+
+in vec4 v_color;
+out vec4 f_color;
+
+void main() {
+    // Round points
+    if (length(gl_PointCoord - vec2(0.5)) > 0.5) {
+        discard;
+    }
+    f_color = v_color;
+}
+"""
+
+_POINT = np.dtype([("x", "f4"), ("y", "f4"), ("color", "u1", 4)])
+
+
+def choose_detail(current: int, remaining: int) -> int:
+    """
+    Level of detail for the number of coins on the field.
+    :param current: level used so far
+    :param remaining: coins on the field
+    """
+    detail = sum(remaining > threshold for threshold in LOD_THRESHOLDS)
+    if detail < current:
+        # Finer only once the field has thinned out well below the threshold
+        return min(current, sum(remaining > LOD_HYSTERESIS * threshold for threshold in LOD_THRESHOLDS))
+    return detail
+
+
+def labelled_coins(sim: Simulation) -> np.ndarray:
+    """ Coins whose names are shown outside LOD_FULL: close to a chaser, or in danger of being eliminated """
+    chasers = sim.chasers
+    coins = sim.coins
+    candidates, owners = sim.grid.query_many(chasers.left - NEAR_CHASER, chasers.bottom - NEAR_CHASER,
+                                             chasers.right + NEAR_CHASER, chasers.top + NEAR_CHASER)
+    near = candidates[(coins.x[candidates] >= chasers.left[owners] - NEAR_CHASER) &
+                      (coins.x[candidates] <= chasers.right[owners] + NEAR_CHASER) &
+                      (coins.y[candidates] >= chasers.bottom[owners] - NEAR_CHASER) &
+                      (coins.y[candidates] <= chasers.top[owners] + NEAR_CHASER)]
+    alive = coins.alive_index
+    # The tier changes only when a coin is hit
+    danger = alive[(coins.tier[alive] != TIER_NORMAL) & (coins.lives[alive] <= DANGER_LIVES)]
+    # Enough coins in danger to fill up the names even if some of them are also near a chaser
+    labelled = np.concatenate([near, danger[:MAX_LABELS + len(near)]])
+    _, first = np.unique(labelled, return_index=True)
+    return labelled[np.sort(first)][:MAX_LABELS]
+
+
+class CoinPoints:
+    """
+    All coins on the field drawn as one batch of round points, in the colour of their tier.
+    Coins only move when they are hit, so call update() only after ticks with hits.
+    :param ctx: OpenGL context of the window
+    :param tier_colors: colour of each tier
+    """
+
+    def __init__(self, ctx, tier_colors: Dict[int, Tuple[int, ...]]):
+        self.ctx = ctx
+        self.program = ctx.program(vertex_shader=_VERTEX_SHADER, fragment_shader=_FRAGMENT_SHADER)
+        self.program["point_size"] = POINT_SIZE
+        self.buffer = ctx.buffer(reserve=_POINT.itemsize)
+        self.geometry = ctx.geometry([BufferDescription(self.buffer, "2f 4f1", ["in_vert", "in_color"],
+                                                        normalized=["in_color"])])
+        self.colors = np.zeros((max(tier_colors) + 1, 4), dtype=np.uint8)
+        for tier, color in tier_colors.items():
+            self.colors[tier] = tuple(color) + (255,) * (4 - len(color))
+        self.count = 0
+        self.points = np.zeros(0, dtype=_POINT)
+
+    def update(self, sim: Simulation):
+        """ Take the positions and tiers of all coins on the field """
+        coins = sim.coins
+        alive = coins.alive_index
+        if len(self.points) < len(alive):
+            self.points = np.zeros(len(alive), dtype=_POINT)
+        points = self.points[:len(alive)]
+        points["x"] = coins.x[alive]
+        points["y"] = coins.y[alive]
+        points["color"] = self.colors[coins.tier[alive]]
+
+        self.count = len(alive)
+        if self.buffer.size < points.nbytes:
+            self.buffer.orphan(size=points.nbytes)
+        self.buffer.write(points.tobytes())
+
+    def draw(self):
+        if not self.count:
+            return
+        self.ctx.enable(self.ctx.BLEND, self.ctx.PROGRAM_POINT_SIZE)
+        self.geometry.render(self.program, mode=self.ctx.POINTS, vertices=self.count)
+        self.ctx.disable(self.ctx.PROGRAM_POINT_SIZE)
@@ -0,0 +1,214 @@
+"""
+Target-duration mode: adjusts the number and speed of the chasers so the draw ends on schedule.
+
+Coins respawn uniformly, so every remaining coin is caught at the same rate, proportional to
+the number of chasers times their speed. On its own clock every coin needs as many hits as it has
+lives, so the amount of catching still needed is the moment the last coin but the winners is
+eliminated, drawn from Gamma distributions like simulation.fast_draw. The controller measures the
+catch rate while the draw runs and spreads the catching still needed over the time that is left.
+
+Try a target duration without a window:
+python pacing.py -i TombolaLose.xlsx -p prizes.txt --duration 8m
+"""
+import argparse
+import json
+import math
+import re
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from roster import RosterError, load_roster
+from simulation import (CHASER_HIT_BOX, COIN_HIT_RADIUS, FRAME_RATE, MAX_TICK_TIME, MOVEMENT_SPEED, PLAYER_SCALE, Hits,
+                        Simulation, read_prizes)
+
+# Slowest and fastest chasers, in pixels per frame. Beyond the fast limit another chaser joins instead.
+MIN_SPEED = 2
+COMFORT_SPEED = 2 * MOVEMENT_SPEED
+MAX_SPEED = 5 * MOVEMENT_SPEED
+
+MAX_CHASERS = 50
+
+# Seconds of game time between two adjustments
+REPLAN_INTERVAL = 1.0
+
+# Once the target is this close or already past, plan to finish within this many seconds
+FINISH_WINDOW = 3.0
+
+# Weight of the latest measurement in the catch rate, exponential moving average
+RATE_SMOOTHING = 0.3
+
+# Hits a measurement of the catch rate needs, fewer are too noisy. Near the end this takes several seconds.
+MIN_MEASURED_HITS = 10
+
+# Samples of the remaining catching, their median is used
+ESTIMATE_SAMPLES = 5
+
+# Combined with the seed of the draw for the random stream of the estimates
+PACING_STREAM = 1
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d*)?)\s*([hms]?)")
+
+
+def parse_duration(text: str) -> float:
+    """
+    Seconds of a duration like "8m", "90s", "1m30s" or "480" (seconds).
+    :raises ValueError: if the text is not a duration
+    """
+    text = text.strip().lower()
+    seconds = 0.0
+    position = 0
+    for match in _DURATION_PART.finditer(text):
+        if match.start() != position or not match.group(0):
+            break
+        value = float(match.group(1))
+        seconds += value * {"h": 3600, "m": 60, "s": 1, "": 1}[match.group(2)]
+        position = match.end()
+    if not text or position != len(text) or seconds <= 0:
+        raise ValueError(f"'{text}' ist keine Dauer, z.B. 8m, 90s oder 1m30s")
+    return seconds
+
+
+def remaining_catching(lives: np.ndarray, winner_count: int, rng: np.random.Generator) -> float:
+    """
+    Hits per coin still needed until only the winners are left, the median of a few sampled draws.
+    :param lives: lives of the coins still on the field
+    :param winner_count: number of coins left when the draw stops
+    """
+    eliminations = len(lives) - winner_count
+    if eliminations <= 0:
+        return 0.0
+    hits_needed = np.maximum(lives.astype(np.float64), 1)
+    samples = [np.partition(rng.standard_gamma(hits_needed), eliminations - 1)[eliminations - 1]
+               for _ in range(ESTIMATE_SAMPLES)]
+    return float(np.median(samples))
+
+
+class DurationController:
+    """
+    Steers a Simulation towards ending after a target duration.
+    Call update() after every step with the hits of that step.
+    :param sim: the draw to steer
+    :param duration: target duration in seconds of game time
+    :param seed: seed of the draw. The estimates draw from a stream derived from it, so they do not change
+                 the draw itself but are reproduced with it.
+    """
+
+    def __init__(self, sim: Simulation, duration: float, seed: Optional[int] = None):
+        self.sim = sim
+        self.duration = duration
+        self.rng = np.random.default_rng(None if seed is None else [PACING_STREAM, seed])
+        self.min_chasers = len(sim.chasers)
+
+        # Catch rate per coin and second, per pixel per frame of all chasers together.
+        # Starts from the area a chaser sweeps, then follows what is measured.
+        left, bottom, right, top = CHASER_HIT_BOX
+        reach = PLAYER_SCALE * ((right - left) + (top - bottom)) / 2 + 2 * COIN_HIT_RADIUS
+        self.rate = FRAME_RATE * reach / (sim.width * sim.height)
+
+        self._since_plan = 0.0
+        self._hits = 0
+        self._exposure = 0.0
+
+        self.plan()
+
+    @property
+    def pace(self) -> float:
+        """ Number of chasers times their speed """
+        return len(self.sim.chasers) * self.sim.speed
+
+    def update(self, hits: Hits, delta_time: float):
+        """
+        Measure the catch rate and adjust the chasers once every REPLAN_INTERVAL.
+        :param hits: coins hit in the last step
+        :param delta_time: length of the last step in seconds
+        """
+        if self.sim.finished:
+            return
+        delta_time = min(delta_time, MAX_TICK_TIME)
+        # Coin seconds weighted by the pace, the catch rate is hits per such unit
+        self._hits += len(hits.index)
+        self._exposure += (self.sim.remaining + np.count_nonzero(hits.lives <= 0)) * self.pace * delta_time
+        self._since_plan += delta_time
+        if self._since_plan < REPLAN_INTERVAL:
+            return
+
+        if self._hits >= MIN_MEASURED_HITS:
+            measured = self._hits / self._exposure
+            self.rate += RATE_SMOOTHING * (measured - self.rate)
+            self._hits = 0
+            self._exposure = 0.0
+        self._since_plan = 0.0
+        self.plan()
+
+    def plan(self):
+        """ Choose number of chasers and speed for the catching still needed in the time left """
+        coins = self.sim.coins
+        needed = remaining_catching(coins.lives[coins.alive_index], self.sim.prize_count, self.rng)
+        time_left = max(self.duration - self.sim.elapsed, FINISH_WINDOW)
+        pace = needed / (self.rate * time_left)
+
+        count = min(MAX_CHASERS, max(self.min_chasers, math.ceil(pace / COMFORT_SPEED)))
+        speed = min(MAX_SPEED, max(MIN_SPEED, pace / count))
+        self.sim.set_pace(count, speed)
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """ Measurements so far, to continue with them after a resume """
+        return {
+            "pacing_rate": np.array(self.rate),
+            "pacing_min_chasers": np.array(self.min_chasers),
+            "pacing_measured": np.array([self._since_plan, self._hits, self._exposure]),
+            "pacing_rng": np.array(json.dumps(self.rng.bit_generator.state)),
+        }
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """ Continue from get_state. States without pacing, e.g. of a draw without a target duration, are ignored. """
+        if "pacing_rate" not in state:
+            return
+        self.rate = float(state["pacing_rate"])
+        self.min_chasers = int(state["pacing_min_chasers"])
+        since_plan, hits, exposure = state["pacing_measured"].tolist()
+        self._since_plan, self._hits, self._exposure = since_plan, int(hits), exposure
+        self.rng.bit_generator.state = json.loads(str(state["pacing_rng"]))
+
+
+def main():
+    """ Play a draw with a target duration at the frame rate of the game, without a window """
+
+    parser = argparse.ArgumentParser(description='Ziehung mit Zieldauer ohne Fenster durchspielen.')
+    parser.add_argument('-i', metavar='excelfile', dest='excelfile', type=str, required=True,
+                        help='Pfad zur Excel- (.xlsx), CSV- oder TSV-Datei, die die Namen und Lose enthält.')
+    parser.add_argument('-p', metavar='prizes', dest='prizes', type=str, required=True,
+                        help='Pfad zu einer .txt-Datei, die die Preise enthält.')
+    parser.add_argument('--duration', type=parse_duration, default="8m", help='Zieldauer, z.B. 8m, 90s oder 1m30s.')
+    parser.add_argument('--seed', type=int, default=None, help='Startwert für den Zufallsgenerator.')
+    parser.add_argument('--width', type=int, default=1920, help='Breite des Spielfelds.')
+    parser.add_argument('--height', type=int, default=1080, help='Höhe des Spielfelds.')
+
+    args = parser.parse_args()
+
+    try:
+        roster = load_roster(args.excelfile)
+    except RosterError as error:
+        parser.error(str(error))
+    prizes = read_prizes(args.prizes)
+
+    sim = Simulation(roster.names, roster.lives, len(prizes), args.width, args.height, seed=args.seed)
+    controller = DurationController(sim, args.duration, args.seed)
+
+    start = time.perf_counter()
+    report_every = args.duration / 8
+    next_report = report_every
+    while not sim.finished:
+        controller.update(sim.step(), 1 / FRAME_RATE)
+        if sim.elapsed >= next_report:
+            next_report += report_every
+            print(f"{sim.elapsed:6.0f}s: {sim.remaining} Lose, {len(sim.chasers)} Jäger mit "
+                  f"{sim.speed:.1f} px/Bild")
+    print(f"Ende nach {sim.elapsed:.0f}s Spielzeit, Ziel {args.duration:.0f}s "
+          f"(gerechnet in {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Where coins appear: spread out with a minimum spacing, and not right next to a chaser.
+
+The field is divided into square cells holding at most one coin each. A coin is placed at a random
+spot around the middle of a free cell, so two coins are always at least (1 - 2 * JITTER) cells apart,
+a Poisson-disk like spread without any rejection. The free cells are kept in a list, so picking one at
+random and taking or giving back a cell costs O(1) however many coins there are. A respawning coin
+skips cells close to a chaser, so it is not caught again on the next tick.
+
+The cell size follows the roster: NOMINAL_CELL_SIZE when the coins fit, smaller for big rosters, down
+to MIN_CELL_SIZE. Coins that do not fit even then are placed anywhere at random, without spacing.
+"""
+import math
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Side of a cell in pixels when there is room, about the size of a coin
+NOMINAL_CELL_SIZE = 48
+MIN_CELL_SIZE = 4
+
+# At most this share of the cells is taken at the start, so there are always free cells to respawn into
+MAX_FILL = 0.5
+
+# A coin may sit this fraction of a cell away from the middle of its cell, in x and in y
+JITTER = 0.2
+
+# Cells within this many pixels of a chaser's collision box are avoided when a coin respawns
+KEEP_OUT = 48
+
+# Free cells tried per respawn. If all of them are close to a chaser, the field is crowded and the last one is taken.
+KEEP_OUT_TRIES = 8
+
+
+class Placement:
+    """
+    Occupancy grid of the coins.
+    :param width: width of the playing field
+    :param height: height of the playing field
+    :param margin: distance of the coins from the edges of the field
+    :param size: number of coins
+    """
+
+    def __init__(self, width: int, height: int, margin: int, size: int):
+        area_width = width - 2 * margin
+        area_height = height - 2 * margin
+        cell_size = math.sqrt(area_width * area_height * MAX_FILL / max(size, 1))
+        self.cell_size = min(NOMINAL_CELL_SIZE, max(MIN_CELL_SIZE, cell_size))
+        self.margin = margin
+        self.area = (area_width, area_height)
+        self.columns = max(int(area_width // self.cell_size), 1)
+        self.rows = max(int(area_height // self.cell_size), 1)
+
+        # Free cells first, then the taken ones. position tells where a cell is in that list.
+        # Python arrays, a respawn swaps single items and that is several times faster than on numpy arrays,
+        # at 4 bytes per cell instead of the 36 of a list of ints
+        cells = self.columns * self.rows
+        self.free = array("i", range(cells))
+        self.free_count = cells
+        self.position = array("i", range(cells))
+
+        # Cells close to a chaser. Marked at the start of a respawn and cleared at its end, so no grid is built
+        # per tick, and a try costs one lookup however many chasers there are.
+        self.blocked = bytearray(cells)
+        self.blocked_rows = np.frombuffer(self.blocked, dtype=bool).reshape(self.rows, self.columns)
+
+        # Cell of each coin, -1 if it has none (eliminated, or placed without spacing)
+        self.cell_of = np.full(size, -1, dtype=np.int32)
+
+    def place(self, indices: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Place coins at the start of the draw, all in one go, while all cells are free.
+        :param indices: coins to place
+        :return: x and y arrays
+        """
+        order = rng.permutation(len(self.free)).astype(np.int32)
+        count = min(len(indices), len(order))
+        cells = order[:count]
+        free = np.concatenate([order[count:], cells])
+        position = np.empty_like(free)
+        position[free] = np.arange(len(free), dtype=np.int32)
+        self.free, self.position = array("i", free.tobytes()), array("i", position.tobytes())
+        self.free_count = len(free) - count
+        self.cell_of[indices[:count]] = cells
+        x, y = self.cell_positions(cells, rng.random(2 * count))
+
+        # Crowded: the rest goes anywhere
+        overflow = len(indices) - count
+        return (np.concatenate([x, (self.margin + self.area[0] * rng.random(overflow)).astype(np.float32)]),
+                np.concatenate([y, (self.margin + self.area[1] * rng.random(overflow)).astype(np.float32)]))
+
+    def respawn(self, indices: np.ndarray, chaser_boxes: Tuple[np.ndarray, ...],
+                uniform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        New places for coins that were hit and stay in the game.
+        :param indices: coins to place again
+        :param chaser_boxes: left, bottom, right and top of the chasers' collision boxes
+        :param uniform: (2 + KEEP_OUT_TRIES) random numbers in [0, 1) per coin
+        :return: x and y arrays
+        """
+        self.release(indices)
+        keep_out = self.keep_out_boxes(*chaser_boxes)
+        for first_row, last_row, first_column, last_column in keep_out:
+            self.blocked_rows[first_row:last_row, first_column:last_column] = True
+        try:
+            cells = self.take_cells(len(indices), uniform[2 * len(indices):].tolist())
+        finally:
+            for first_row, last_row, first_column, last_column in keep_out:
+                self.blocked_rows[first_row:last_row, first_column:last_column] = False
+        cells = np.array(cells, dtype=np.int32)
+        self.cell_of[indices] = cells
+
+        x, y = self.cell_positions(np.maximum(cells, 0), uniform[:2 * len(indices)])
+        # No free cell left: anywhere
+        crowded = cells < 0
+        x[crowded] = self.margin + self.area[0] * uniform[:len(indices)][crowded]
+        y[crowded] = self.margin + self.area[1] * uniform[len(indices):2 * len(indices)][crowded]
+        return x, y
+
+    def take_cells(self, count: int, tries: List[float]) -> List[int]:
+        """
+        Take free cells, preferring those that are not blocked.
+        :param count: number of cells
+        :param tries: KEEP_OUT_TRIES random numbers in [0, 1) per cell
+        :return: the cells, -1 for those that found no free cell
+        """
+        cells = [-1] * count
+        free, position, free_count, blocked = self.free, self.position, self.free_count, self.blocked
+        for i in range(count):
+            if not free_count:
+                break
+            for attempt in range(KEEP_OUT_TRIES):
+                cell = free[int(tries[i * KEEP_OUT_TRIES + attempt] * free_count)]
+                if not blocked[cell]:
+                    break
+            # Swap the cell to the end of the free cells and shorten them by one
+            free_count -= 1
+            last = free[free_count]
+            free[position[cell]], free[free_count] = last, cell
+            position[last], position[cell] = position[cell], free_count
+            cells[i] = cell
+        self.free_count = free_count
+        return cells
+
+    def release(self, indices: np.ndarray):
+        """ Give the cells of these coins back, e.g. when they are eliminated """
+        free, position, free_count = self.free, self.position, self.free_count
+        for cell in self.cell_of[indices].tolist():
+            if cell >= 0:
+                # Swap the cell to the start of the taken cells and count it as free again
+                first = free[free_count]
+                free[position[cell]], free[free_count] = first, cell
+                position[first], position[cell] = position[cell], free_count
+                free_count += 1
+        self.free_count = free_count
+        self.cell_of[indices] = -1
+
+    def cell_positions(self, cells: np.ndarray, uniform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Random spots around the middle of cells.
+        :param uniform: two random numbers in [0, 1) per cell
+        """
+        offset_x = 0.5 + (2 * uniform[:len(cells)] - 1) * JITTER
+        offset_y = 0.5 + (2 * uniform[len(cells):2 * len(cells)] - 1) * JITTER
+        x = self.margin + (cells % self.columns + offset_x) * self.cell_size
+        y = self.margin + (cells // self.columns + offset_y) * self.cell_size
+        return x.astype(np.float32), y.astype(np.float32)
+
+    def keep_out_boxes(self, left: np.ndarray, bottom: np.ndarray, right: np.ndarray,
+                       top: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """ Cells within KEEP_OUT of each of the boxes, as first and end row and first and end column """
+        first_columns = np.floor((left - KEEP_OUT - self.margin) / self.cell_size).astype(np.int32)
+        last_columns = np.floor((right + KEEP_OUT - self.margin) / self.cell_size).astype(np.int32)
+        first_rows = np.floor((bottom - KEEP_OUT - self.margin) / self.cell_size).astype(np.int32)
+        last_rows = np.floor((top + KEEP_OUT - self.margin) / self.cell_size).astype(np.int32)
+        return list(zip(np.maximum(first_rows, 0).tolist(), np.maximum(last_rows + 1, 0).tolist(),
+                        np.maximum(first_columns, 0).tolist(), np.maximum(last_columns + 1, 0).tolist()))
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """ The order of the free cells decides where the next coin goes, so it is saved as it is """
+        return {
+            "placement_free": np.frombuffer(self.free, dtype=np.int32).copy(),
+            "placement_free_count": np.array(self.free_count),
+            "placement_cell_of": self.cell_of.copy(),
+        }
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """
+        Continue from get_state.
+        :raises ValueError: if the state was saved with another grid
+        """
+        if len(state["placement_free"]) != len(self.free):
+            raise ValueError(f"Stand hat {len(state['placement_free'])} Felder für Lose, "
+                             f"dieses Spielfeld {len(self.free)}")
+        free = state["placement_free"].astype(np.int32)
+        position = np.empty_like(free)
+        position[free] = np.arange(len(free), dtype=np.int32)
+        self.free = array("i", free.tobytes())
+        self.free_count = int(state["placement_free_count"])
+        self.position = array("i", position.tobytes())
+        self.cell_of = state["placement_cell_of"].astype(np.int32)
@@ -0,0 +1,100 @@
+"""
+Per-phase frame timing, to find out what makes a frame slow when the projector stutters.
+
+A FrameProfiler is told when each phase of a frame ends and keeps one row per frame, the last
+MAX_ROWS of them. NullProfiler has the same methods doing nothing, so the game pays next to nothing
+when profiling is off.
+"""
+import csv
+import time
+from collections import deque
+from itertools import islice
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+# Phases of a frame, in the order they run. Update phases first, then drawing.
+# "bookkeeping" is the pacing controller and the event log.
+PHASES = ("movement", "animation", "collision", "hits", "bookkeeping", "sprites", "sprite_draw", "label_draw", "hud")
+
+# Frames used for the percentiles on the overlay
+WINDOW = 300
+
+# Frames kept for the CSV, the last ten minutes at 60 frames per second
+MAX_ROWS = 36000
+
+
+class NullProfiler:
+    """ Profiler that records nothing """
+
+    def start(self):
+        pass
+
+    def mark(self, phase: str):
+        pass
+
+    def end_frame(self, remaining: int):
+        pass
+
+
+class FrameProfiler:
+    """
+    Records how long each phase of every frame took.
+    Call start() where timing begins, mark(phase) when a phase ends, and end_frame() after drawing.
+    A phase marked several times in a frame gets the sum.
+    """
+
+    def __init__(self):
+        self.columns = {phase: i for i, phase in enumerate(PHASES)}
+        self.current = [0.0] * len(PHASES)
+        self.last = time.perf_counter()
+        self.last_frame: Optional[float] = None
+        # Frames recorded so far, also those no longer kept
+        self.frames = 0
+        self.rows: Deque[Tuple] = deque(maxlen=MAX_ROWS)
+        self.recent = deque(maxlen=WINDOW)
+
+    def start(self):
+        """ Start timing, e.g. at the beginning of on_update or on_draw """
+        self.last = time.perf_counter()
+
+    def mark(self, phase: str):
+        """ The phase has ended, it gets the time since the previous mark or start """
+        now = time.perf_counter()
+        self.current[self.columns[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self, remaining: int):
+        """
+        Store the frame and start a new one.
+        :param remaining: number of coins left, stored with the frame
+        """
+        now = time.perf_counter()
+        interval = now - self.last_frame if self.last_frame is not None else 0.0
+        self.last_frame = now
+        self.rows.append((self.frames, interval, *self.current, remaining))
+        self.frames += 1
+        if interval > 0:
+            self.recent.append(interval)
+        self.current = [0.0] * len(PHASES)
+
+    def percentiles(self) -> Tuple[float, float, float]:
+        """ p50, p95 and p99 of the recent frame times in milliseconds """
+        if not self.recent:
+            return 0.0, 0.0, 0.0
+        p50, p95, p99 = np.percentile(np.fromiter(self.recent, dtype=np.float64), (50, 95, 99))
+        return 1000 * float(p50), 1000 * float(p95), 1000 * float(p99)
+
+    def averages(self, frames: int) -> List[float]:
+        """ Average seconds of each phase over the last frames """
+        last = list(islice(reversed(self.rows), frames))
+        return [sum(row[2 + i] for row in last) / max(len(last), 1) for i in range(len(PHASES))]
+
+    def write_csv(self, filename: str):
+        """ The frames kept, times in milliseconds """
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame", "frame_ms") + tuple(f"{phase}_ms" for phase in PHASES) + ("remaining",))
+            for frame, interval, *phases, remaining in self.rows:
+                writer.writerow([frame, f"{1000 * interval:.3f}"] + [f"{1000 * value:.3f}" for value in phases] +
+                                [remaining])
@@ -0,0 +1,142 @@
+"""
+Recording of the draw as a video, for everyone who missed it, rendered offscreen as fast as the machine can.
+
+The game is stepped at a fixed frame rate instead of by the clock, so the video plays at the right speed however
+long a frame took to render. Every frame is read back from OpenGL into one of a few reusable buffers and queued
+for an encoder thread that feeds it to ffmpeg through a pipe: rendering the next frame, writing the previous one
+and encoding by ffmpeg all run at the same time. When ffmpeg falls behind, no buffer is free and rendering waits
+for one to come back, so memory use stays fixed.
+
+On a machine without a display, pyglet's headless mode renders with Mesa's software renderer (llvmpipe):
+PYGLET_HEADLESS=true python adventure.py -i TombolaLose.xlsx -p prizes.txt --record draw.mp4
+"""
+import queue
+import shutil
+import subprocess
+import threading
+from typing import Optional
+
+from pyglet import gl
+
+# Frames per second of the video. Every frame advances the draw by 1 / RECORD_FPS seconds.
+RECORD_FPS = 30
+
+# Size of the video, the offscreen window has this size
+RECORD_SIZE = (1280, 720)
+
+# Frames that can be on their way to ffmpeg at once
+FRAME_BUFFERS = 4
+
+# Seconds ffmpeg gets to finish the file after the last frame, before it is killed
+CLOSE_TIMEOUT = 60
+
+# H.264 that every player understands; veryfast keeps the encoder ahead of a software renderer
+ENCODER_OPTIONS = ("-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p")
+
+
+class RecorderError(ValueError):
+    """ The video cannot be recorded """
+
+
+class FrameRecorder:
+    """
+    Reads back rendered frames and has ffmpeg encode them into a video file.
+    :param filename: video file to write, the format follows the extension, e.g. .mp4
+    :param width: width of the frames
+    :param height: height of the frames
+    :param fps: frames per second of the video
+    :raises RecorderError: if ffmpeg cannot be started
+    """
+
+    def __init__(self, filename: str, width: int, height: int, fps: int = RECORD_FPS):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RecorderError("ffmpeg nicht gefunden, es wird für die Aufnahme gebraucht")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.count = 0
+
+        # OpenGL rows start at the bottom, ffmpeg turns the picture upright
+        command = [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                   "-s", f"{width}x{height}", "-r", str(fps), "-i", "-", "-vf", "vflip", *ENCODER_OPTIONS, filename]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except OSError as error:
+            raise RecorderError(f"ffmpeg startet nicht ({error})")
+
+        # Buffers go round: free -> filled by capture() -> written by the encoder thread -> free again
+        self.free: "queue.Queue" = queue.Queue()
+        for _ in range(FRAME_BUFFERS):
+            self.free.put((gl.GLubyte * (3 * width * height))())
+        self.frames: "queue.Queue" = queue.Queue(maxsize=FRAME_BUFFERS)
+        self.error: Optional[OSError] = None
+        self.thread = threading.Thread(target=self._encode, name="encoder", daemon=True)
+        self.thread.start()
+
+    @property
+    def seconds(self) -> float:
+        """ Length of the video so far """
+        return self.count / self.fps
+
+    def capture(self):
+        """
+        Read the frame just rendered and queue it for the encoder. Waits while all buffers are in use.
+        :raises RecorderError: if ffmpeg stopped taking frames
+        """
+        if self.error is not None:
+            raise RecorderError(f"ffmpeg nimmt keine Bilder mehr an ({self.error})")
+        buffer = self.free.get()
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        gl.glReadPixels(0, 0, self.width, self.height, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, buffer)
+        self.frames.put(buffer)
+        self.count += 1
+
+    def _encode(self):
+        """ Write queued frames to ffmpeg until close() queues None """
+        while True:
+            buffer = self.frames.get()
+            if buffer is None:
+                return
+            if self.error is None:
+                try:
+                    self.process.stdin.write(memoryview(buffer))
+                except OSError as error:
+                    # Keep handing the buffers back, capture() reports the error
+                    self.error = error
+            self.free.put(buffer)
+
+    def close(self):
+        """
+        Write the remaining frames and wait for ffmpeg to finish the file.
+        :raises RecorderError: if ffmpeg failed
+        """
+        try:
+            self.frames.put(None)
+            self.thread.join()
+        finally:
+            self._stop(CLOSE_TIMEOUT)
+        if self.process.returncode != 0:
+            raise RecorderError(f"ffmpeg ist mit Fehler {self.process.returncode} beendet")
+
+    def abort(self):
+        """ Stop after an error during the recording: ffmpeg is killed and the frames still queued are dropped """
+        if self.error is None:
+            self.error = OSError("Aufnahme abgebrochen")
+        # Killed first, so a write the encoder thread is blocked in fails and the thread can finish
+        self.process.kill()
+        self.frames.put(None)
+        self.thread.join()
+        self._stop(0)
+
+    def _stop(self, timeout: float):
+        """ Close the pipe so ffmpeg finishes, and kill it if it has not finished within the timeout """
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,361 @@
+"""
+Loads the roster of players: a `Name` and a `Lose` column, from .xlsx, .csv or .tsv.
+
+Rows are streamed straight into a NameTable and a NumPy array of lives, without pandas or xlrd.
+A player who appears on several rows gets the sum of their tickets.
+"""
+import codecs
+import csv
+import html
+import os
+import re
+import zipfile
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Sequence, Tuple, Union
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+NAME_COLUMN = "Name"
+LIVES_COLUMN = "Lose"
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_CHUNK_SIZE = 1 << 20
+
+_TEXT_RUN = re.compile(r"<(?:\w+:)?t(?: [^>]*)?>([^<]*)</(?:\w+:)?t>")
+_PHONETIC_HINT = re.compile(r"<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>", re.DOTALL)
+
+# A worksheet row and a cell: attributes and content. {ns} stands for the namespace prefix of the sheet, usually empty.
+_ROW_PATTERN = r'<{ns}row\b([^>]*?)(?:/>|>(.*?)</{ns}row>)'
+_CELL_PATTERN = r'<{ns}c\b([^>]*?)(?:/>|>(.*?)</{ns}c>)'
+# Any cell start tag, to make sure _CELL_PATTERN did not miss one
+_CELL_START = r'<{ns}c[\s/>]'
+_VALUE_PATTERN = r'<{ns}v>([^<]*)</{ns}v>'
+_INLINE_PATTERN = r'<{ns}is>(.*?)</{ns}is>'
+_ATTRIBUTE = re.compile(r'([\w:]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_CELL_REFERENCE = re.compile(r"([A-Z]+)\d+$")
+# Number of a worksheet row, as Excel shows it
+_ROW_NUMBER = re.compile(r'(?:^|\s)r\s*=\s*["\'](\d+)["\']')
+# Content of a cell without a value: nothing, or just a formula
+_NO_VALUE = re.compile(r"\s*(?:<(?:\w+:)?f\b[^>]*?(?:/>|>[^<]*</(?:\w+:)?f>)\s*)*$")
+
+# Cell types whose <v> holds the text as it is: numbers, formula strings, booleans, errors and ISO dates
+_PLAIN_TYPES = ("n", "str", "b", "e", "d")
+
+
+class RosterError(ValueError):
+    """ The roster file cannot be read or does not have the expected columns """
+
+
+class NameTable(Sequence[str]):
+    """
+    Player names packed into one UTF-8 buffer, with the offset of every name in it.
+    A Python string costs about 50 bytes on top of its text, a name here costs its text and 8 bytes.
+    Names are decoded when they are looked up, which happens for labels and winners, not per tick.
+    :param names: the names, each once
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        encoded = [name.encode("utf-8") for name in names]
+        self.data = b"".join(encoded)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=self.offsets[1:])
+
+    @classmethod
+    def from_buffer(cls, data: bytes, offsets: np.ndarray) -> "NameTable":
+        """ A table from an existing buffer and its offsets, the first offset being 0 """
+        table = cls()
+        table.data = data
+        table.offsets = offsets
+        return table
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "NameTable"]:
+        """ A name, or a slice of the table """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return NameTable(self[i] for i in range(start, stop, step))
+            stop = max(start, stop)
+            offsets = self.offsets[start:stop + 1]
+            return NameTable.from_buffer(self.data[offsets[0]:offsets[-1]], offsets - offsets[0])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Name index out of range")
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data = self.data
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        """ Memory held by the names """
+        return len(self.data) + self.offsets.nbytes
+
+
+class Roster(NamedTuple):
+    """
+    Players and their number of lives (= number of tickets, i.e. Lose, they bought).
+    :param names: player names, each name once
+    :param lives: lives per player, same order as names
+    """
+    names: NameTable
+    lives: np.ndarray
+
+    def head(self, count: int) -> "Roster":
+        """ First count players, e.g. for debugging with fewer coins """
+        return Roster(self.names[:count], self.lives[:count])
+
+
+def load_roster(filename: str) -> Roster:
+    """
+    Read a roster file. The format is chosen by the file extension.
+    :param filename: path to an .xlsx, .csv or .tsv file
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        rows = read_xlsx_rows(filename)
+    elif extension == '.csv':
+        rows = read_delimited_rows(filename, None)
+    elif extension in ('.tsv', '.tab'):
+        rows = read_delimited_rows(filename, '\t')
+    elif extension == '.xls':
+        raise RosterError(f"{filename}: altes Excel-Format, bitte als .xlsx oder .csv speichern")
+    else:
+        raise RosterError(f"{filename}: unbekanntes Format, erwartet .xlsx, .csv oder .tsv")
+
+    return collect_roster(rows, filename)
+
+
+def collect_roster(rows: Iterator[Tuple[int, List[str]]], filename: str = "") -> Roster:
+    """
+    Turn rows of cells into a roster. The first row holds the column headings.
+    :param rows: row numbers, as shown in Excel, and cell texts of each row
+    :param filename: used in error messages
+    """
+    _, header = next(rows, (0, None))
+    if header is None:
+        raise RosterError(f"{filename}: Datei ist leer")
+    header = [cell.strip() for cell in header]
+    missing = [column for column in (NAME_COLUMN, LIVES_COLUMN) if column not in header]
+    if missing:
+        raise RosterError(f"{filename}: Spalte(n) {', '.join(missing)} fehlen, gefunden: {', '.join(header)}")
+    name_column = header.index(NAME_COLUMN)
+    lives_column = header.index(LIVES_COLUMN)
+
+    # Dicts keep insertion order, so players stay in the order of the file
+    tickets: Dict[str, int] = {}
+    for line, row in rows:
+        name = row[name_column].strip() if name_column < len(row) else ""
+        if not name:
+            continue
+        lives = row[lives_column].strip() if lives_column < len(row) else ""
+        tickets[name] = tickets.get(name, 0) + parse_lives(lives, name, line, filename)
+
+    # The names are packed, only the table stays alive, not the strings of the file
+    return Roster(NameTable(tickets), np.fromiter(tickets.values(), dtype=np.int32, count=len(tickets)))
+
+
+def parse_lives(text: str, name: str, line: int, filename: str) -> int:
+    """ Number of tickets in a cell, which may come as "3" or "3.0" from Excel """
+    try:
+        value = float(text)
+    except ValueError:
+        raise RosterError(f"{filename}, Zeile {line}: '{text}' ist keine Anzahl Lose für {name}") from None
+    if value < 0 or value != int(value):
+        raise RosterError(f"{filename}, Zeile {line}: {text} ist keine Anzahl Lose für {name}")
+    return int(value)
+
+
+def read_delimited_rows(filename: str, delimiter: Optional[str]) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Numbered rows of a CSV or TSV file. A byte order mark, as written by Excel, is skipped.
+    :param delimiter: column separator, None to choose between "," and ";" (German Excel) by the header
+    """
+    with open(filename, newline='', encoding='utf-8-sig') as file:
+        if delimiter is None:
+            header = file.readline()
+            delimiter = ';' if header.count(';') > header.count(',') else ','
+            file.seek(0)
+        yield from enumerate(csv.reader(file, delimiter=delimiter), start=1)
+
+
+def read_xlsx_rows(filename: str) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Numbered rows of the first worksheet of an .xlsx file, streamed chunk by chunk.
+    Empty cells in the middle of a row come back as empty strings.
+    """
+    try:
+        archive = zipfile.ZipFile(filename)
+    except zipfile.BadZipFile:
+        raise RosterError(f"{filename}: keine gültige .xlsx-Datei") from None
+
+    with archive:
+        shared_strings = read_shared_strings(archive)
+        with archive.open(first_sheet_path(archive)) as sheet:
+            yield from parse_sheet(sheet, shared_strings)
+
+
+def parse_sheet(sheet, shared_strings: List[str]) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Rows of worksheet XML, with their number from the r attribute, as Excel shows it. Empty rows are skipped. Rows and cells are picked out with regular expressions chunk by chunk, which is
+    several times faster than an XML parser calling back into Python for every element.
+    :param sheet: binary file with the worksheet XML
+    :param shared_strings: strings that cells of type "s" refer to
+    :raises RosterError: for a cell that cannot be read, rather than losing a player or their tickets
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    patterns = None
+    row_end = ""
+    columns: Dict[str, int] = {}
+    # Number of the last row. A row without an r attribute follows the one before.
+    line = 0
+
+    while True:
+        chunk = sheet.read(_CHUNK_SIZE)
+        text = pending + decoder.decode(chunk, final=not chunk)
+
+        if patterns is None:
+            # Some tools write "x:row" instead of "row"
+            root = re.search(r"<(\w+:)?worksheet\b", text)
+            if root is None and chunk:
+                pending = text
+                continue
+            prefix = re.escape((root.group(1) or "") if root else "")
+            patterns = [re.compile(pattern.replace("{ns}", prefix), re.DOTALL)
+                        for pattern in (_ROW_PATTERN, _CELL_PATTERN, _CELL_START, _VALUE_PATTERN, _INLINE_PATTERN)]
+            row_end = f"</{(root.group(1) or '') if root else ''}row>"
+
+        # Only parse complete rows, the rest waits for the next chunk
+        end = text.rfind(row_end) if chunk else len(text)
+        if end < 0:
+            pending = text
+            continue
+        end += len(row_end) if chunk else 0
+        pending = text[end:]
+
+        row_pattern, cell_pattern, cell_start, value_pattern, inline_pattern = patterns
+        for row_attributes, content in row_pattern.findall(text, 0, end):
+            number = _ROW_NUMBER.search(row_attributes)
+            line = int(number.group(1)) if number else line + 1
+            cells = cell_pattern.findall(content)
+            if len(cells) != len(cell_start.findall(content)):
+                raise RosterError(f"Tabellenblatt: Zeile {line} mit unlesbarer Zelle: {content[:200]}")
+            row: List[str] = []
+            for attributes, cell in cells:
+                reference, value = parse_cell(attributes, cell, shared_strings, value_pattern, inline_pattern)
+                column = columns.get(reference) if reference else len(row)
+                if column is None:
+                    column = columns[reference] = column_index(reference, len(row))
+                if column > len(row):
+                    row.extend([""] * (column - len(row)))
+                row.append(value)
+            if row:
+                yield line, row
+
+        if not chunk:
+            break
+
+
+def parse_cell(attributes: str, content: str, shared_strings: List[str], value_pattern: Pattern,
+               inline_pattern: Pattern) -> Tuple[str, str]:
+    """
+    Column letters and text of a worksheet cell, whatever the order of its attributes.
+    :param attributes: the attributes of the <c> tag
+    :param content: what is between <c> and </c>
+    :return: column letters, empty if the cell has no reference, and the text of the cell
+    :raises RosterError: if the cell has a type or content this does not know
+    """
+    values = {name.split(":")[-1]: double if double is not None else single
+              for name, double, single in _ATTRIBUTE.findall(attributes)}
+    reference = values.get("r", "")
+    column = _CELL_REFERENCE.match(reference)
+    if reference and column is None:
+        raise RosterError(f"Tabellenblatt: Zelle mit ungültiger Adresse {reference}")
+    cell_type = values.get("t", "n")
+
+    if cell_type == "inlineStr":
+        inline = inline_pattern.search(content)
+        if inline is None:
+            raise RosterError(f"Tabellenblatt: Zelle {reference} ohne Text")
+        # Rich text is split into several runs, each with its own <t>. Phonetic hints are left out.
+        value = "".join(_TEXT_RUN.findall(_PHONETIC_HINT.sub("", inline.group(1))))
+    else:
+        found = value_pattern.search(content)
+        if found is None:
+            # A cell with only a style, or a formula that was never calculated, is empty
+            if not _NO_VALUE.match(content):
+                raise RosterError(f"Tabellenblatt: Zelle {reference} nicht lesbar: {content[:200]}")
+            value = ""
+        elif cell_type == "s":
+            try:
+                value = shared_strings[int(found.group(1))]
+            except (ValueError, IndexError):
+                raise RosterError(f"Tabellenblatt: Zelle {reference} verweist auf unbekannten Text "
+                                  f"{found.group(1)}") from None
+            # Shared strings are unescaped already
+            return (column.group(1) if column else ""), value
+        elif cell_type in _PLAIN_TYPES:
+            value = found.group(1)
+        else:
+            raise RosterError(f"Tabellenblatt: Zelle {reference} hat unbekannten Typ {cell_type}")
+    if "&" in value:
+        value = html.unescape(value)
+    return (column.group(1) if column else ""), value
+
+
+def read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    """
+    Strings that cells of type "s" refer to by index. Every <si> counts, an empty <si/> too, or the strings
+    after it would be shifted.
+    """
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as file:
+        for _, element in iterparse(file):
+            if element.tag != _MAIN_NS + "si":
+                continue
+            # Plain text is one <t>, rich text one <t> in each run <r>. Phonetic hints (<rPh>) are left out.
+            texts = [child if child.tag == _MAIN_NS + "t" else child.find(_MAIN_NS + "t")
+                     for child in element if child.tag in (_MAIN_NS + "t", _MAIN_NS + "r")]
+            strings.append("".join(text.text or "" for text in texts if text is not None))
+            element.clear()
+    return strings
+
+
+def first_sheet_path(archive: zipfile.ZipFile) -> str:
+    """ Path inside the archive of the first worksheet in the workbook """
+    with archive.open("xl/workbook.xml") as file:
+        sheet = next((element for _, element in iterparse(file) if element.tag == _MAIN_NS + "sheet"), None)
+    if sheet is None:
+        raise RosterError("Arbeitsmappe enthält kein Tabellenblatt")
+    relation_id = sheet.get(_REL_NS + "id")
+
+    with archive.open("xl/_rels/workbook.xml.rels") as file:
+        for _, element in iterparse(file):
+            if element.tag == _PACKAGE_REL_NS + "Relationship" and element.get("Id") == relation_id:
+                target = element.get("Target")
+                return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise RosterError("Tabellenblatt nicht gefunden")
+
+
+def column_index(reference: Optional[str], default: int) -> int:
+    """ Zero-based column of a cell reference like "B2" """
+    if not reference:
+        return default
+    column = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        column = column * 26 + ord(char.upper()) - ord('A') + 1
+    return column - 1
@@ -0,0 +1,825 @@
+"""
+Headless game core for the Tombola draw.
+
+Coins, chasers, lives and elimination live here without any arcade or OpenGL
+dependency (only NumPy), so a whole draw can be stepped as fast as the CPU allows.
+GameView in adventure.py only renders the state held by a Simulation.
+
+Run a draw without a window with:
+python simulation.py -i TombolaLose.xlsx -p prizes.txt
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from placement import KEEP_OUT_TRIES, Placement
+from profiling import NullProfiler
+from roster import NameTable, RosterError, load_roster
+from spatial import SpatialGrid
+
+COIN_DIAMETER = 10
+
+# Half the width of the visible coin in gold_1.png at COIN_SCALE, used for hit tests
+COIN_HIT_RADIUS = 16
+
+# How fast to move (pixels per frame at FRAME_RATE), and how fast to run the animation
+MOVEMENT_SPEED = 8
+UPDATES_PER_FRAME = 5
+MABEL_SPEED = MOVEMENT_SPEED
+
+# Frames per second the speeds are given for. Movement is scaled by the real frame time.
+FRAME_RATE = 60
+
+# Longest frame time a tick moves for, so a stalled frame does not make the chasers jump across the field
+MAX_TICK_TIME = 0.1
+
+PLAYER_SCALE = 1.2
+
+# Collision box of a chaser (left, bottom, right, top) relative to its centre, before scaling.
+# Default sprite box includes too much empty space side-to-side.
+CHASER_HIT_BOX = (-22, -64, 22, 28)
+
+# Number of frames in the walk animation
+WALK_FRAMES = 8
+
+# Constants used to track if the player is facing left or right
+RIGHT_FACING = 0
+LEFT_FACING = 1
+
+# Padding for the coins
+PADDING = 25
+
+# Colour tiers of a coin. Tiers only change on a hit, so people with few tickets are not shown up initially.
+TIER_NORMAL = 0
+TIER_BRASS = 1
+TIER_ORANGE = 2
+TIER_RED = 3
+
+DEFAULT_CHASERS = ('Mabel', 'Robin')
+
+# Random headings and positions drawn ahead in one call to the generator, per kind
+RANDOM_BLOCK = 4096
+
+# Stands in for no movement along an axis in the swept collision test, see ChaserTable.sweep_test
+_TINY = np.finfo(np.float64).tiny
+
+# Cosine and sine of every whole degree. Chasers only turn by whole degrees, so these replace np.cos and np.sin.
+COS_TABLE = np.cos(np.radians(np.arange(360)))
+SIN_TABLE = np.sin(np.radians(np.arange(360)))
+
+
+def random_xy_position(width: int, height: int, rng: np.random.Generator) -> Tuple[int, int]:
+    """
+    Random position for a coin, keeping clear of the edges of the field.
+    :param width: width of the playing field
+    :param height: height of the playing field
+    :param rng: random number generator to draw from
+    """
+    return (
+        int(rng.integers(COIN_DIAMETER + PADDING, width - COIN_DIAMETER - PADDING)),
+        int(rng.integers(COIN_DIAMETER + PADDING, height - COIN_DIAMETER - PADDING))
+    )
+
+
+def random_xy_positions(count: int, width: int, height: int,
+                        rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorised random_xy_position for many coins at once.
+    :param count: number of positions to draw
+    :return: x and y arrays
+    """
+    return (
+        rng.integers(COIN_DIAMETER + PADDING, width - COIN_DIAMETER - PADDING, count).astype(np.float32),
+        rng.integers(COIN_DIAMETER + PADDING, height - COIN_DIAMETER - PADDING, count).astype(np.float32)
+    )
+
+
+class RandomStream:
+    """
+    Random numbers for the hot path, drawn ahead from the generator of the draw in blocks and handed out in order.
+    A tick takes a slice of a buffer instead of calling the generator, which is refilled once per RANDOM_BLOCK numbers.
+    The same seed gives the same numbers in the same order; get_state includes what is left in the buffers.
+    :param rng: random number generator of the draw
+    :param width: width of the playing field, for positions
+    :param height: height of the playing field, for positions
+    :param block: numbers drawn per refill
+    """
+
+    def __init__(self, rng: np.random.Generator, width: int, height: int, block: int = RANDOM_BLOCK):
+        self.rng = rng
+        self.width = width
+        self.height = height
+        self.block = block
+        self._angles = np.zeros(0, dtype=np.int16)
+        self._angle_next = 0
+        self._x = np.zeros(0, dtype=np.float32)
+        self._y = np.zeros(0, dtype=np.float32)
+        self._position_next = 0
+        self._uniform = np.zeros(0, dtype=np.float64)
+        self._uniform_next = 0
+
+    def angles(self, count: int) -> np.ndarray:
+        """ Headings in whole degrees between -90 and 90 """
+        if self._angle_next + count > len(self._angles):
+            fresh = self.rng.integers(-90, 91, max(self.block, count)).astype(np.int16)
+            self._angles = np.concatenate([self._angles[self._angle_next:], fresh])
+            self._angle_next = 0
+        angles = self._angles[self._angle_next:self._angle_next + count]
+        self._angle_next += count
+        return angles
+
+    def positions(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ Positions like random_xy_positions, as x and y arrays """
+        if self._position_next + count > len(self._x):
+            x, y = random_xy_positions(max(self.block, count), self.width, self.height, self.rng)
+            self._x = np.concatenate([self._x[self._position_next:], x])
+            self._y = np.concatenate([self._y[self._position_next:], y])
+            self._position_next = 0
+        end = self._position_next + count
+        x, y = self._x[self._position_next:end], self._y[self._position_next:end]
+        self._position_next = end
+        return x, y
+
+    def uniform(self, count: int) -> np.ndarray:
+        """ Numbers in [0, 1) """
+        if self._uniform_next + count > len(self._uniform):
+            self._uniform = np.concatenate([self._uniform[self._uniform_next:],
+                                            self.rng.random(max(self.block, count))])
+            self._uniform_next = 0
+        uniform = self._uniform[self._uniform_next:self._uniform_next + count]
+        self._uniform_next += count
+        return uniform
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """ Numbers drawn but not handed out yet """
+        return {
+            "stream_angles": self._angles[self._angle_next:].copy(),
+            "stream_x": self._x[self._position_next:].copy(),
+            "stream_y": self._y[self._position_next:].copy(),
+            "stream_uniform": self._uniform[self._uniform_next:].copy(),
+        }
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """ Continue from get_state. States without buffers, e.g. from before the buffers existed, are ignored. """
+        if "stream_angles" not in state:
+            return
+        self._angles = state["stream_angles"].astype(np.int16)
+        self._angle_next = 0
+        self._x = state["stream_x"].astype(np.float32)
+        self._y = state["stream_y"].astype(np.float32)
+        self._position_next = 0
+        self._uniform = state.get("stream_uniform", np.zeros(0)).astype(np.float64)
+        self._uniform_next = 0
+
+
+def map_prizes_to_winners(winners: List[str], prizes: List[str],
+                          rng: np.random.Generator) -> List[Tuple[str, str]]:
+    """
+    Hand out the prizes to the winners in random order. The lists passed in are left as they are.
+    :param rng: random number generator to shuffle with, the draw's own to make the result reproducible
+    """
+    winners = [winners[i] for i in rng.permutation(len(winners))]
+    prizes = [prizes[i] for i in rng.permutation(len(prizes))]
+
+    return list(zip(winners, prizes))
+
+
+def read_prizes(prizes_file: str) -> List[str]:
+
+    with open(prizes_file, 'r') as file:
+        prizes = file.readlines()
+
+    return prizes
+
+
+def format_winners(winners_with_prizes: List[Tuple[str, str]]) -> str:
+    """ Contents of winners.txt, one "name - prize" per line """
+    return "".join(f"{name} - {prize}\n" for (name, prize) in winners_with_prizes)
+
+
+def write_winners(winners_with_prizes: List[Tuple[str, str]], filename: str = 'winners.txt'):
+    """
+    Save winners to file, one "name - prize" per line.
+    :param winners_with_prizes: list of (name, prize)
+    :param filename: file to write
+    """
+    with open(filename, "w") as f:
+        f.write(format_winners(winners_with_prizes))
+
+
+def colour_tiers(lives: np.ndarray, tiers: np.ndarray) -> np.ndarray:
+    """
+    Colour tiers of coins after they have been hit.
+    :param lives: lives left after the hit
+    :param tiers: current tiers, kept where lives are not low yet
+    """
+    return np.select([lives == 3, lives == 2, lives == 1], [TIER_BRASS, TIER_ORANGE, TIER_RED], tiers)
+
+
+def fast_draw(lives: Sequence[int], winner_count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Survivors of a draw, computed directly instead of simulating it.
+
+    Coins are spread uniformly and respawn uniformly, so every hit catches one of the remaining coins
+    at random. That is the same process as every coin being caught at rate 1 on its own clock: the time
+    a coin with n lives is eliminated is Gamma(n) distributed, and the winners are the coins eliminated
+    last. A coin with no lives still leaves at its first hit.
+    :param lives: number of lives per coin
+    :param winner_count: number of coins left when the draw stops
+    :param rng: random number generator to draw from
+    :return: indices of the winning coins, in ascending order
+    """
+    hits_needed = np.maximum(np.asarray(lives, dtype=np.float64), 1)
+    if winner_count >= len(hits_needed):
+        return np.arange(len(hits_needed))
+    eliminated_at = rng.standard_gamma(hits_needed)
+    return np.sort(np.argpartition(eliminated_at, -winner_count)[-winner_count:])
+
+
+def chi_square_p_value(statistic: float, dof: int) -> float:
+    """ Upper tail of the chi-square distribution, Wilson-Hilferty approximation """
+    if dof <= 0:
+        return 1.0
+    z = ((statistic / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare_fast_draw(lives: Sequence[int], prize_count: int, draws: int, width: int, height: int,
+                      seed: Optional[int] = None) -> float:
+    """
+    Check that fast_draw picks winners like the simulated game: run both many times, count wins per
+    number of lives and compare the counts with a chi-square test of homogeneity.
+    :param lives: number of lives per coin
+    :param prize_count: number of prizes
+    :param draws: number of draws of each kind
+    :return: p-value of the test
+    """
+    lives = np.asarray(lives, dtype=np.int32)
+    names = [str(i) for i in range(len(lives))]
+    seeds = np.random.SeedSequence(seed).spawn(2 * draws)
+
+    simulated_wins = np.zeros(len(lives))
+    fast_wins = np.zeros(len(lives))
+    for i in range(draws):
+        sim = Simulation(names, lives, prize_count, width, height, seed=seeds[2 * i])
+        sim.run()
+        simulated_wins[sim.coins.alive_index] += 1
+        fast_wins[fast_draw(lives, prize_count, np.random.default_rng(seeds[2 * i + 1]))] += 1
+
+    classes = np.unique(lives)
+    simulated = np.array([simulated_wins[lives == n].sum() for n in classes])
+    fast = np.array([fast_wins[lives == n].sum() for n in classes])
+    coins = np.array([(lives == n).sum() for n in classes])
+
+    print("Lose  Münzen  P(Gewinn) Spiel  P(Gewinn) schnell")
+    for n, count, sim_count, fast_count in zip(classes, coins, simulated, fast):
+        print(f"{n:4d}  {count:6d}  {sim_count / (draws * count):15.3f}  {fast_count / (draws * count):17.3f}")
+
+    table = np.array([simulated, fast])
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+    used = expected.min(axis=0) > 0
+    statistic = float((((table - expected) ** 2)[:, used] / expected[:, used]).sum())
+    p_value = chi_square_p_value(statistic, int(used.sum()) - 1)
+    print(f"chi2 = {statistic:.2f}, dof = {int(used.sum()) - 1}, p = {p_value:.3f}")
+    return p_value
+
+
+class Hits(NamedTuple):
+    """
+    Coins caught by the chasers in one tick. Lives <= 0 means the coin is eliminated.
+    :param index: coin indices, each coin at most once, in the order the chasers reached them
+    :param lives: lives left after the tick
+    """
+    index: np.ndarray
+    lives: np.ndarray
+
+
+NO_HITS = Hits(np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.int32))
+
+
+class CoinTable:
+    """
+    All ticket holders on the field, one row per coin stored column by column.
+    :param names: player names to attach to the coins
+    :param lives: number of lives per player (equals number of tickets bought).
+    :param x: initial x positions
+    :param y: initial y positions
+    """
+
+    def __init__(self, names: Sequence[str], lives: Sequence[int], x: np.ndarray, y: np.ndarray):
+        # Packed, a list of strings would cost several times the rest of the table
+        self.names = names if isinstance(names, NameTable) else NameTable(names)
+        self.name_index = np.arange(len(self.names), dtype=np.int32)
+        self.lives = np.asarray(lives, dtype=np.int32).copy()
+        self.x = np.asarray(x, dtype=np.float32)
+        self.y = np.asarray(y, dtype=np.float32)
+        self.tier = np.full(len(self.names), TIER_NORMAL, dtype=np.int8)
+
+        # Every coin starts on the field, even with zero lives: it leaves at its first hit
+        self.alive = np.ones(len(self.names), dtype=bool)
+        self.alive_index = np.arange(len(self.names), dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def remaining(self) -> int:
+        return len(self.alive_index)
+
+    def name(self, index: int) -> str:
+        return self.names[self.name_index[index]]
+
+    def hit(self, indices: np.ndarray, respawn: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]) -> Hits:
+        """
+        Take a life from each coin that was hit. Coins with lives left reappear somewhere else.
+        :param indices: coins that were hit, a coin hit by two chasers appears twice
+        :param respawn: new x and y positions for the given coins
+        :return: each coin hit once, in the order it was first hit
+        """
+        if len(indices) == 0:
+            return NO_HITS
+
+        hit, first, count = np.unique(indices, return_index=True, return_counts=True)
+        in_order = np.argsort(first)
+        hit, count = hit[in_order], count[in_order]
+        self.lives[hit] -= count.astype(np.int32)
+        lives = self.lives[hit]
+
+        survivors = hit[lives > 0]
+        self.x[survivors], self.y[survivors] = respawn(survivors)
+        self.tier[survivors] = colour_tiers(self.lives[survivors], self.tier[survivors])
+
+        if len(survivors) < len(hit):
+            self.alive[hit[lives <= 0]] = False
+            self.alive_index = np.flatnonzero(self.alive)
+
+        return Hits(hit, lives)
+
+
+class ChaserTable:
+    """
+    Movement and animation state of all chasers, e.g. Mabel and Robin, one row per chaser stored column by column.
+    Chasers collect the coins. All of them are moved, bounced and animated together in one batch.
+    :param characters: name of the character of each chaser, used by the renderer to pick textures
+    :param x: initial x positions
+    :param y: initial y positions
+    :param speed: pixels per frame at FRAME_RATE
+    """
+
+    def __init__(self, characters: Sequence[str], x: np.ndarray, y: np.ndarray, speed: float = MOVEMENT_SPEED):
+        count = len(characters)
+        self.characters = list(characters)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.speed = np.full(count, speed, dtype=np.float64)
+
+        # Start moving to the right
+        self.change_x = self.speed.copy()
+        self.change_y = np.zeros(count)
+
+        # Default to face-right
+        self.face_direction = np.full(count, RIGHT_FACING, dtype=np.int8)
+
+        # Used for flipping between image sequences
+        self.cur_texture = np.zeros(count, dtype=np.int32)
+
+        left, bottom, right, top = CHASER_HIT_BOX
+        self.box = (left * PLAYER_SCALE, bottom * PLAYER_SCALE, right * PLAYER_SCALE, top * PLAYER_SCALE)
+
+    def __len__(self) -> int:
+        return len(self.characters)
+
+    @property
+    def left(self) -> np.ndarray:
+        return self.x + self.box[0]
+
+    @property
+    def bottom(self) -> np.ndarray:
+        return self.y + self.box[1]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.x + self.box[2]
+
+    @property
+    def top(self) -> np.ndarray:
+        return self.y + self.box[3]
+
+    def frame(self, index: int) -> Optional[int]:
+        """ Walk animation frame to show for a chaser, None when standing still """
+        if self.change_x[index] == 0 and self.change_y[index] == 0:
+            return None
+        return int(self.cur_texture[index]) // UPDATES_PER_FRAME
+
+    def add(self, characters: Sequence[str], x: np.ndarray, y: np.ndarray, speed: float):
+        """ More chasers, starting to the right like the first ones """
+        added = ChaserTable(characters, x, y, speed)
+        self.characters.extend(added.characters)
+        for column in ("x", "y", "speed", "change_x", "change_y", "face_direction", "cur_texture"):
+            setattr(self, column, np.concatenate([getattr(self, column), getattr(added, column)]))
+
+    def truncate(self, count: int):
+        """ Keep only the first count chasers """
+        del self.characters[count:]
+        for column in ("x", "y", "speed", "change_x", "change_y", "face_direction", "cur_texture"):
+            setattr(self, column, getattr(self, column)[:count])
+
+    def set_speed(self, speed: float):
+        """ Change the speed of all chasers, keeping their heading """
+        moving = self.speed > 0
+        factor = np.divide(speed, self.speed, out=np.ones_like(self.speed), where=moving)
+        self.change_x *= factor
+        self.change_y *= factor
+        self.change_x[~moving] = speed
+        self.speed[:] = speed
+
+    def update(self, width: int, height: int, stream: RandomStream, frames: float = 1.0):
+        """
+        Move one step, turning around at the edges of the field.
+        :param width: width of the playing field
+        :param height: height of the playing field
+        :param stream: random headings for chasers that turn
+        :param frames: length of the step in frames at FRAME_RATE, i.e. delta_time * FRAME_RATE
+        """
+        speed = self.speed
+
+        # Change direction if end of screen.
+        # Hit left edge: x velocity positive, y velocity +ve or -ve. Angle between -90 and 90 (⊃), add nothing.
+        # Hit right edge: x velocity negative. Angle between 90 and -90 (⊂), add 180 degrees.
+        # Hit top edge: y velocity negative, angle between 180 and 0 (⋃), subtract 90 degrees.
+        # Hit bottom edge: y velocity positive, angle between 0 and 180 (⋂), add 90 degrees.
+        # If x already changed, only y is turned around.
+        at_left = self.left < COIN_DIAMETER
+        at_right = ~at_left & (self.right > width - COIN_DIAMETER)
+        x_changed = at_left | at_right
+        at_top = self.top > height - COIN_DIAMETER
+        at_bottom = ~at_top & (self.bottom < COIN_DIAMETER)
+        turned = (at_top | at_bottom) & ~x_changed
+
+        # A random angle between -90 and 90 degrees, only for the chasers at an edge
+        turning = x_changed | turned
+        if turning.any():
+            theta = np.zeros(len(self), dtype=np.int32)
+            theta[turning] = stream.angles(int(np.count_nonzero(turning)))
+
+            angle = np.where(at_right, theta + 180, theta)[x_changed] % 360
+            self.change_x[x_changed] = speed[x_changed] * COS_TABLE[angle]
+            self.change_y[x_changed] = speed[x_changed] * SIN_TABLE[angle]
+
+            self.change_y[at_top & x_changed] = -np.abs(self.change_y[at_top & x_changed])
+            self.change_y[at_bottom & x_changed] = np.abs(self.change_y[at_bottom & x_changed])
+            angle = np.where(at_top, theta - 90, theta + 90)[turned] % 360
+            self.change_x[turned] = speed[turned] * COS_TABLE[angle]
+            self.change_y[turned] = speed[turned] * SIN_TABLE[angle]
+
+        self.x += self.change_x * frames
+        self.y += self.change_y * frames
+
+    def update_animation(self):
+
+        # Figure out if we need to flip face left or right
+        self.face_direction[self.change_x < 0] = LEFT_FACING
+        self.face_direction[self.change_x > 0] = RIGHT_FACING
+
+        # Walking animation, idle chasers keep their frame
+        moving = (self.change_x != 0) | (self.change_y != 0)
+        self.cur_texture[moving] += 1
+        self.cur_texture[self.cur_texture > (WALK_FRAMES - 1) * UPDATES_PER_FRAME] = 0
+
+    def hit_test(self, x: np.ndarray, y: np.ndarray, owners: np.ndarray) -> np.ndarray:
+        """
+        Which of the given coin positions touch the collision box of their chaser.
+        :param owners: the chaser to test each position against
+        :return: boolean mask over the positions
+        """
+        return ((x >= self.left[owners] - COIN_HIT_RADIUS) & (x <= self.right[owners] + COIN_HIT_RADIUS) &
+                (y >= self.bottom[owners] - COIN_HIT_RADIUS) & (y <= self.top[owners] + COIN_HIT_RADIUS))
+
+    def sweep_test(self, x: np.ndarray, y: np.ndarray, owners: np.ndarray, start_x: np.ndarray,
+                   start_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Which of the given coin positions the collision box of their chaser touched anywhere on its way from the
+        start position to where it is now. A fast chaser cannot jump over a coin between two ticks.
+        :param owners: the chaser to test each position against
+        :param start_x: x positions of all chasers before the step
+        :param start_y: y positions of all chasers before the step
+        :return: boolean mask over the positions, and the time of impact of each, from 0 at the start of the
+                 step to 1 at its end
+        """
+        # Seen from the chaser the coin moves backwards along the chaser's path, through the box at its start.
+        # A chaser that does not move along an axis moves by a tiny amount instead, which needs no special case:
+        # the coin then enters and leaves at +-inf if it is within the box, or both on the same side if it is not.
+        motion_x = start_x - self.x
+        motion_x[motion_x == 0] = _TINY
+        motion_y = start_y - self.y
+        motion_y[motion_y == 0] = _TINY
+        enter_x, exit_x = _slab(x, motion_x[owners], (start_x + (self.box[0] - COIN_HIT_RADIUS))[owners],
+                                (start_x + (self.box[2] + COIN_HIT_RADIUS))[owners])
+        enter_y, exit_y = _slab(y, motion_y[owners], (start_y + (self.box[1] - COIN_HIT_RADIUS))[owners],
+                                (start_y + (self.box[3] + COIN_HIT_RADIUS))[owners])
+        enter = np.maximum(np.maximum(enter_x, enter_y), 0)
+        leave = np.minimum(np.minimum(exit_x, exit_y), 1)
+        return enter <= leave, enter
+
+
+def _slab(position: np.ndarray, motion: np.ndarray, low: np.ndarray,
+          high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    When a point moving by motion in a step is between low and high along one axis.
+    :param motion: never 0
+    :return: times of entering and leaving, in steps
+    """
+    with np.errstate(over="ignore"):
+        to_low = (low - position) / motion
+        to_high = (high - position) / motion
+    return np.minimum(to_low, to_high), np.maximum(to_low, to_high)
+
+
+class Simulation:
+    """
+    State of one draw: coins with their lives, the chasers, and the end condition.
+    :param names: player names, one per coin
+    :param lives: number of lives per coin (equals number of tickets bought)
+    :param prize_count: the draw stops when no more coins than prizes are left
+    :param width: width of the playing field
+    :param height: height of the playing field
+    :param chasers: characters chasing the coins, taken in turn when there are more chasers than characters
+    :param seed: seed for the random number generator, None for a random draw
+    :param chaser_count: number of chasers, None for one per character
+    """
+
+    def __init__(self, names: Sequence[str], lives: Sequence[int], prize_count: int, width: int, height: int,
+                 chasers: Sequence[str] = DEFAULT_CHASERS, seed: Optional[int] = None,
+                 chaser_count: Optional[int] = None):
+        self.width = width
+        self.height = height
+        self.prize_count = prize_count
+        self.rng = np.random.default_rng(seed)
+        # Headings and respawn positions come from the generator of the draw, drawn ahead in blocks
+        self.stream = RandomStream(self.rng, width, height)
+        self.tick = 0
+        # Seconds of game time, the sum of the delta_time of all ticks
+        self.elapsed = 0.0
+
+        # Coins keep a minimum spacing, see placement.py
+        self.placement = Placement(width, height, COIN_DIAMETER + PADDING, len(names))
+        self.coins = CoinTable(names, lives, *self.placement.place(np.arange(len(names)), self.rng))
+        self.grid = SpatialGrid(width, height, len(self.coins))
+        self.grid.insert(self.coins.alive_index, self.coins.x, self.coins.y)
+
+        self.characters = tuple(chasers)
+        self.chasers = ChaserTable([], np.zeros(0), np.zeros(0))
+        self.add_chasers(len(self.characters) if chaser_count is None else chaser_count, MOVEMENT_SPEED)
+
+        # Told when each phase of a tick ends, see profiling.py
+        self.profiler = NullProfiler()
+
+    @property
+    def remaining(self) -> int:
+        return self.coins.remaining
+
+    @property
+    def finished(self) -> bool:
+        """ Stop when there are as many coins as prizes left (i.e. 10 winners) """
+        return self.coins.remaining <= self.prize_count
+
+    @property
+    def speed(self) -> float:
+        """ Speed of the chasers in pixels per frame """
+        return float(self.chasers.speed[0]) if len(self.chasers) else MOVEMENT_SPEED
+
+    def add_chasers(self, count: int, speed: float):
+        """ More chasers at random positions, taking the characters in turn """
+        first = len(self.chasers)
+        characters = [self.characters[i % len(self.characters)] for i in range(first, first + count)]
+        self.chasers.add(characters, *self.stream.positions(len(characters)), speed)
+
+    def set_pace(self, count: int, speed: float):
+        """
+        Change the number of chasers and their speed. New chasers start at random positions.
+        :param count: number of chasers
+        :param speed: pixels per frame at FRAME_RATE
+        """
+        if count > len(self.chasers):
+            self.add_chasers(count - len(self.chasers), speed)
+        self.chasers.truncate(count)
+        self.chasers.set_speed(speed)
+
+    def step(self, delta_time: float = 1 / FRAME_RATE) -> Hits:
+        """
+        Advance the draw by one tick.
+        :param delta_time: seconds since the previous tick, movement is scaled by it
+        :return: the coins hit in this tick
+        """
+        if self.finished:
+            return NO_HITS
+
+        profiler = self.profiler
+        delta_time = min(delta_time, MAX_TICK_TIME)
+        self.tick += 1
+        self.elapsed += delta_time
+        start_x, start_y = self.chasers.x.copy(), self.chasers.y.copy()
+        self.move_chasers(delta_time * FRAME_RATE)
+        profiler.mark("movement")
+        self.animate_chasers()
+        profiler.mark("animation")
+        indices = self.find_hits(start_x, start_y)
+        profiler.mark("collision")
+        hits = self.apply_hits(indices)
+        profiler.mark("hits")
+        return hits
+
+    def move_chasers(self, frames: float = 1.0):
+        self.chasers.update(self.width, self.height, self.stream, frames)
+
+    def animate_chasers(self):
+        self.chasers.update_animation()
+
+    def apply_hits(self, indices: np.ndarray) -> Hits:
+        """
+        Take lives, respawn and eliminate the coins that were hit.
+        :param indices: coins that were hit, as returned by find_hits
+        """
+        hits = self.coins.hit(indices, self.respawn_positions)
+
+        # Keep the spatial index and the occupancy grid in step with respawned and eliminated coins
+        respawned = hits.index[hits.lives > 0]
+        self.grid.move(respawned, self.coins.x[respawned], self.coins.y[respawned])
+        eliminated = hits.index[hits.lives <= 0]
+        self.grid.remove(eliminated)
+        self.placement.release(eliminated)
+
+        return hits
+
+    def respawn_positions(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ Free places for coins that were hit, away from the chasers """
+        chasers = self.chasers
+        return self.placement.respawn(indices, (chasers.left, chasers.bottom, chasers.right, chasers.top),
+                                      self.stream.uniform((2 + KEEP_OUT_TRIES) * len(indices)))
+
+    def find_hits(self, start_x: Optional[np.ndarray] = None, start_y: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Indices of all coins that collided with a chaser, once per chaser, in the order the chasers reached them.
+        :param start_x: x positions of the chasers before they moved in this tick, None to only test where they are
+        :param start_y: y positions of the chasers before they moved in this tick
+        """
+        chasers = self.chasers
+        if not len(chasers):
+            return NO_HITS.index
+        coins = self.coins
+        if start_x is None:
+            start_x, start_y = chasers.x, chasers.y
+
+        # One lookup of the grid cells along the path of all chasers in this tick,
+        # then one test of all candidates against the path of their chaser
+        moved_x = chasers.x - start_x
+        moved_y = chasers.y - start_y
+        candidates, owners = self.grid.query_many(chasers.left - np.maximum(moved_x, 0) - COIN_HIT_RADIUS,
+                                                  chasers.bottom - np.maximum(moved_y, 0) - COIN_HIT_RADIUS,
+                                                  chasers.right - np.minimum(moved_x, 0) + COIN_HIT_RADIUS,
+                                                  chasers.top - np.minimum(moved_y, 0) + COIN_HIT_RADIUS)
+        hit, impact = chasers.sweep_test(coins.x[candidates], coins.y[candidates], owners, start_x, start_y)
+        # Coins reached at the same time, e.g. all that touch a chaser from the start, go by index,
+        # so the order does not depend on how the grid holds the candidates
+        return candidates[hit][np.lexsort((candidates[hit], impact[hit]))]
+
+    def run(self, max_ticks: Optional[int] = None) -> int:
+        """
+        Step until the draw is finished.
+        :param max_ticks: give up after this many ticks, None to run to the end
+        :return: number of ticks run
+        """
+        start = self.tick
+        while not self.finished and (max_ticks is None or self.tick - start < max_ticks):
+            self.step()
+        return self.tick - start
+
+    def winners(self) -> List[str]:
+        return [self.coins.name(index) for index in self.coins.alive_index]
+
+    def winners_with_prizes(self, prizes: List[str]) -> List[Tuple[str, str]]:
+        return map_prizes_to_winners(self.winners(), prizes, self.rng)
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Everything needed to continue the draw exactly, as copies of plain arrays.
+        Names are not included, they come from the roster again.
+        """
+        coins = self.coins
+        chasers = self.chasers
+        return {
+            "tick": np.array(self.tick),
+            "elapsed": np.array(self.elapsed),
+            "field": np.array([self.width, self.height]),
+            "prize_count": np.array(self.prize_count),
+            "rng": np.array(json.dumps(self.rng.bit_generator.state)),
+            "coin_lives": coins.lives.copy(),
+            "coin_x": coins.x.copy(),
+            "coin_y": coins.y.copy(),
+            "coin_tier": coins.tier.copy(),
+            "coin_alive": coins.alive.copy(),
+            "chaser_character": np.array(chasers.characters, dtype=str),
+            "chaser_x": chasers.x.copy(),
+            "chaser_y": chasers.y.copy(),
+            "chaser_speed": chasers.speed.copy(),
+            "chaser_change_x": chasers.change_x.copy(),
+            "chaser_change_y": chasers.change_y.copy(),
+            "chaser_face_direction": chasers.face_direction.copy(),
+            "chaser_cur_texture": chasers.cur_texture.copy(),
+            **self.stream.get_state(),
+            **self.placement.get_state(),
+        }
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """
+        Continue a draw from get_state. The simulation must have been created with the same roster.
+        :raises ValueError: if the state does not fit this roster or playing field
+        """
+        if len(state["coin_lives"]) != len(self.coins):
+            raise ValueError(f"Stand hat {len(state['coin_lives'])} Lose, die Losliste {len(self.coins)}")
+        if tuple(state["field"]) != (self.width, self.height):
+            raise ValueError(f"Stand ist für ein Spielfeld von {state['field'][0]}x{state['field'][1]}, "
+                             f"dieses ist {self.width}x{self.height}")
+
+        self.tick = int(state["tick"])
+        self.elapsed = float(state["elapsed"])
+        self.prize_count = int(state["prize_count"])
+        self.rng.bit_generator.state = json.loads(str(state["rng"]))
+        self.stream.set_state(state)
+        if "placement_free" in state:
+            self.placement.set_state(state)
+
+        coins = self.coins
+        coins.lives[:] = state["coin_lives"]
+        coins.x[:] = state["coin_x"]
+        coins.y[:] = state["coin_y"]
+        coins.tier[:] = state["coin_tier"]
+        coins.alive[:] = state["coin_alive"]
+        coins.alive_index = np.flatnonzero(coins.alive)
+
+        self.grid = SpatialGrid(self.width, self.height, len(coins))
+        self.grid.insert(coins.alive_index, coins.x[coins.alive_index], coins.y[coins.alive_index])
+
+        chasers = ChaserTable([str(character) for character in state["chaser_character"]],
+                              state["chaser_x"], state["chaser_y"])
+        chasers.speed = state["chaser_speed"].astype(np.float64)
+        chasers.change_x = state["chaser_change_x"].astype(np.float64)
+        chasers.change_y = state["chaser_change_y"].astype(np.float64)
+        chasers.face_direction = state["chaser_face_direction"].astype(np.int8)
+        chasers.cur_texture = state["chaser_cur_texture"].astype(np.int32)
+        self.chasers = chasers
+
+
+def main():
+    """ Run a draw without a window and write winners.txt """
+
+    parser = argparse.ArgumentParser(description='Weihnachtstombola ohne Fenster.')
+    parser.add_argument('-i', metavar='excelfile', dest='excelfile', type=str,
+                        help='Pfad zur Excel- (.xlsx), CSV- oder TSV-Datei, die die Namen und Lose enthält.')
+    parser.add_argument('-p', metavar='prizes', dest='prizes', type=str,
+                        help='Pfad zu einer .txt-Datei, die die Preise enthält.')
+    parser.add_argument('--seed', type=int, default=None, help='Startwert für den Zufallsgenerator.')
+    parser.add_argument('--width', type=int, default=1920, help='Breite des Spielfelds.')
+    parser.add_argument('--height', type=int, default=1080, help='Höhe des Spielfelds.')
+    parser.add_argument('--chasers', type=int, default=len(DEFAULT_CHASERS), help='Anzahl Jäger.')
+    parser.add_argument('--verify-fast', metavar='draws', type=int, default=None,
+                        help='Schnelle Ziehung gegen das simulierte Spiel prüfen, mit so vielen Ziehungen.')
+
+    args = parser.parse_args()
+
+    if args.verify_fast:
+        # Small field with few coins, so each simulated draw takes a fraction of a second
+        lives = [1 + i % 5 for i in range(30)]
+        p_value = compare_fast_draw(lives, 5, args.verify_fast, 800, 600, args.seed)
+        sys.exit(0 if p_value > 0.01 else 1)
+
+    if args.excelfile is None or args.prizes is None:
+        parser.error("-i und -p werden benötigt")
+
+    try:
+        roster = load_roster(args.excelfile)
+    except RosterError as error:
+        parser.error(str(error))
+    prizes = read_prizes(args.prizes)
+
+    sim = Simulation(roster.names, roster.lives, len(prizes), args.width, args.height, seed=args.seed,
+                     chaser_count=args.chasers)
+
+    start = time.perf_counter()
+    ticks = sim.run()
+    elapsed = time.perf_counter() - start
+    print(f"{ticks} ticks in {elapsed:.2f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+
+    winners_with_prizes = sim.winners_with_prizes(prizes)
+    write_winners(winners_with_prizes)
+    for (name, prize) in winners_with_prizes:
+        print(f"{name} - {prize.strip()}")
+
+
+if __name__ == "__main__":
+    main()
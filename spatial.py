@@ -0,0 +1,158 @@
+"""
+Uniform grid over coin positions, so the chasers only test the coins close to them.
+
+The grid is kept in flat arrays, a few bytes per coin instead of a set per cell: the coins sorted by cell, and
+where the run of each cell starts in that order. A query takes one slice per row of cells it overlaps.
+Moving a coin does not re-sort all of them: its entry is marked stale, and the coins moved since the last
+rebuild are kept sorted by cell in a second, much shorter order that queries slice the same way. Once that
+grows too long, everything is sorted again.
+"""
+import math
+from array import array
+from typing import List, Tuple
+
+import numpy as np
+
+# Side of a grid cell in pixels. Roughly the size of a chaser, so a query touches only a few cells.
+GRID_CELL_SIZE = 64
+
+# All coins are sorted again once more than this many moved or left, or a sixteenth of them if that is more
+REBUILD_MIN_CHANGES = 64
+
+
+class SpatialGrid:
+    """
+    Spatial index of coins.
+    :param width: width of the playing field
+    :param height: height of the playing field
+    :param size: number of coins that can be indexed
+    :param cell_size: side of a grid cell
+    """
+
+    def __init__(self, width: int, height: int, size: int, cell_size: float = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = int(math.ceil(width / cell_size)) + 1
+        self.rows = int(math.ceil(height / cell_size)) + 1
+        self.limits = np.array([[self.columns - 1], [self.rows - 1], [self.columns - 1], [self.rows - 1]])
+
+        # Cell each coin is in, -1 if the coin is not in the grid
+        self.cell_of = np.full(size, -1, dtype=np.int32)
+
+        # Coins whose entry in the sorted order is out of date, because they moved or left since it was sorted
+        self.stale = np.zeros(size, dtype=bool)
+        # Stale coins that are still in the grid, once each
+        self.moved = array('i')
+        self.changes = 0
+        self.rebuild()
+
+    def cell_ids(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """ Cells of the given positions. Positions off the field are clamped to the border cells. """
+        column = np.clip((x // self.cell_size).astype(np.int32), 0, self.columns - 1)
+        row = np.clip((y // self.cell_size).astype(np.int32), 0, self.rows - 1)
+        return row * self.columns + column
+
+    def _sorted(self, indices: np.ndarray) -> Tuple[np.ndarray, List[int]]:
+        """ The given coins sorted by cell, and where the run of each cell starts, with one more for the end """
+        cells = self.cell_of[indices]
+        starts = np.zeros(self.columns * self.rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.columns * self.rows), out=starts[1:])
+        if len(starts) <= 1 << 16:
+            # NumPy sorts 16 bit integers stably with a radix sort, several times faster
+            cells = cells.astype(np.uint16)
+        return indices[np.argsort(cells, kind='stable')].astype(np.int32), starts.tolist()
+
+    def rebuild(self):
+        """ Sort all coins in the grid by cell again, so no entry is stale """
+        self.order, self.starts = self._sorted(np.flatnonzero(self.cell_of >= 0))
+        self.moved_order, self.moved_starts = self._sorted(self.order[:0])
+        self.stale[:] = False
+        self.moved = array('i')
+        self.changes = 0
+
+    def _changed(self, count: int):
+        """ Sort the moved coins again after a change, or all of them once enough have changed """
+        self.changes += count
+        if self.changes > max(REBUILD_MIN_CHANGES, len(self.order) // 16):
+            self.rebuild()
+        else:
+            moved = np.array(self.moved, dtype=np.int32)
+            self.moved_order, self.moved_starts = self._sorted(moved[self.cell_of[moved] >= 0])
+
+    def insert(self, indices: np.ndarray, x: np.ndarray, y: np.ndarray):
+        """
+        Add coins to the grid.
+        :param indices: coins to add
+        :param x: x positions of these coins
+        :param y: y positions of these coins
+        """
+        self.cell_of[indices] = self.cell_ids(x, y)
+        self.rebuild()
+
+    def move(self, indices: np.ndarray, x: np.ndarray, y: np.ndarray):
+        """
+        Update coins that have moved, e.g. after a respawn. Only coins that changed cell are touched.
+        :param indices: coins that moved
+        :param x: new x positions of these coins
+        :param y: new y positions of these coins
+        """
+        cells = self.cell_ids(x, y)
+        changed = np.asarray(indices)[cells != self.cell_of[indices]]
+        self.cell_of[indices] = cells
+        if len(changed):
+            self.moved.extend(changed[~self.stale[changed]].tolist())
+            self.stale[changed] = True
+            self._changed(len(changed))
+
+    def remove(self, indices: np.ndarray):
+        """ Take coins out of the grid, e.g. when they are eliminated """
+        indices = np.asarray(indices)[self.cell_of[indices] >= 0]
+        if len(indices):
+            self.cell_of[indices] = -1
+            self.stale[indices] = True
+            self._changed(len(indices))
+
+    def query(self, left: float, bottom: float, right: float, top: float) -> np.ndarray:
+        """
+        Coins in all cells overlapping a rectangle. Candidates only, the caller does the exact test.
+        :return: coin indices
+        """
+        candidates, _ = self.query_many(np.array([left]), np.array([bottom]), np.array([right]), np.array([top]))
+        return candidates
+
+    def query_many(self, left: np.ndarray, bottom: np.ndarray, right: np.ndarray,
+                   top: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Coins in the cells overlapping each of several rectangles, gathered in one go.
+        :return: coin indices, and for each the rectangle it was found for
+        """
+        bounds = np.minimum(np.maximum((np.array([left, bottom, right, top]) // self.cell_size).astype(np.int32), 0),
+                            self.limits)
+
+        # The cells of one row of a rectangle follow each other in the sorted order, so each row is one slice
+        order, starts = self.order, self.starts
+        moved_order, moved_starts = self.moved_order, self.moved_starts
+        found = []
+        counts = []
+        moved_found = []
+        moved_counts = []
+        for first_column, first_row, last_column, last_row in zip(*bounds.tolist()):
+            count = moved_count = 0
+            for row in range(first_row * self.columns, last_row * self.columns + 1, self.columns):
+                first, last = row + first_column, row + last_column + 1
+                found.append(order[starts[first]:starts[last]])
+                count += starts[last] - starts[first]
+                if moved_starts[first] != moved_starts[last]:
+                    moved_found.append(moved_order[moved_starts[first]:moved_starts[last]])
+                    moved_count += moved_starts[last] - moved_starts[first]
+            counts.append(count)
+            moved_counts.append(moved_count)
+        candidates = np.concatenate(found).astype(np.intp)
+        owners = np.repeat(np.arange(len(counts)), counts)
+        if not self.changes:
+            return candidates, owners
+
+        current = ~self.stale[candidates]
+        if moved_found:
+            return (np.concatenate([candidates[current], *moved_found]),
+                    np.concatenate([owners[current], np.repeat(np.arange(len(moved_counts)), moved_counts)]))
+        return candidates[current], owners[current]
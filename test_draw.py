@@ -0,0 +1,113 @@
+"""
+Tests of the headless draw: resuming from a checkpoint, replaying a log, and the fast draw.
+
+python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from checkpoint import CheckpointError, read_checkpoint, roster_digest, write_checkpoint
+from eventlog import DrawSettings, EventLogError, EventLogWriter, read_log, replay, same_hits
+from simulation import DEFAULT_CHASERS, Simulation, compare_fast_draw
+
+NAMES = [f"Person {i}" for i in range(300)]
+LIVES = np.random.default_rng(7).integers(1, 6, len(NAMES)).astype(np.int32)
+PRIZES = 10
+WIDTH = 800
+HEIGHT = 600
+SEED = 1234
+FRAME = 1 / 60
+
+# Tick at which the checkpoint is taken, well before the end of the draw
+CHECKPOINT_TICK = 200
+
+
+def new_simulation() -> Simulation:
+    return Simulation(NAMES, LIVES, PRIZES, WIDTH, HEIGHT, seed=SEED)
+
+
+def test_checkpoint_resumes_the_same_draw(tmp_path):
+    filename = str(tmp_path / "checkpoint.npz")
+    digest = roster_digest(NAMES, LIVES)
+    sim = new_simulation()
+    sim.run(CHECKPOINT_TICK)
+    state = sim.get_state()
+    state["roster"] = np.array(digest)
+    write_checkpoint(filename, state)
+
+    resumed = new_simulation()
+    resumed.set_state(read_checkpoint(filename, digest))
+    assert resumed.tick == CHECKPOINT_TICK
+    while not sim.finished:
+        assert same_hits(sim.step(FRAME), resumed.step(FRAME))
+    assert resumed.finished
+    assert resumed.winners() == sim.winners()
+
+
+def test_checkpoint_of_another_roster_is_refused(tmp_path):
+    filename = str(tmp_path / "checkpoint.npz")
+    state = new_simulation().get_state()
+    state["roster"] = np.array(roster_digest(NAMES, LIVES))
+    write_checkpoint(filename, state)
+
+    with pytest.raises(CheckpointError):
+        read_checkpoint(filename, roster_digest(NAMES, LIVES + 1))
+
+
+def test_replay_repeats_the_logged_draw(tmp_path):
+    filename = str(tmp_path / "draw.log")
+    settings = DrawSettings(SEED, roster_digest(NAMES, LIVES), PRIZES, WIDTH, HEIGHT, list(DEFAULT_CHASERS), 2, None)
+    sim, _ = settings.simulation(NAMES, LIVES)
+    log = EventLogWriter.create(filename, settings)
+    # Uneven frame times, as a real game has them
+    frames = np.random.default_rng(3).uniform(0.5 * FRAME, 2 * FRAME, 100000)
+    while not sim.finished:
+        delta_time = float(frames[sim.tick])
+        log.record(sim.tick + 1, delta_time, sim.step(delta_time))
+    log.close()
+
+    logged_settings, records = read_log(filename)
+    assert logged_settings == settings
+    replayed = replay(logged_settings, records, NAMES, LIVES)
+    assert replayed.tick == sim.tick
+    assert replayed.winners() == sim.winners()
+
+
+def test_replay_notices_other_hits(tmp_path):
+    filename = str(tmp_path / "draw.log")
+    settings = DrawSettings(SEED, roster_digest(NAMES, LIVES), PRIZES, WIDTH, HEIGHT, list(DEFAULT_CHASERS), 2, None)
+    sim, _ = settings.simulation(NAMES, LIVES)
+    log = EventLogWriter.create(filename, settings)
+    while not sim.finished:
+        log.record(sim.tick + 1, FRAME, sim.step(FRAME))
+    log.close()
+
+    _, records = read_log(filename)
+    # Replaying with other frame times moves the chasers elsewhere
+    records = [record._replace(delta_time=2 * record.delta_time) for record in records]
+    with pytest.raises(EventLogError):
+        replay(settings, records, NAMES, LIVES)
+
+
+def test_collision_finds_the_coins_a_test_of_every_coin_finds():
+    # Many fast chasers, so the grid lookups of their paths overlap and coins respawn and leave all the time
+    sim = Simulation(NAMES, LIVES, PRIZES, WIDTH, HEIGHT, seed=SEED, chaser_count=12)
+    sim.chasers.set_speed(40)
+    while not sim.finished:
+        sim.tick += 1
+        start_x, start_y = sim.chasers.x.copy(), sim.chasers.y.copy()
+        sim.move_chasers()
+        found = sim.find_hits(start_x, start_y)
+
+        alive = sim.coins.alive_index
+        owners = np.repeat(np.arange(len(sim.chasers)), len(alive))
+        coins = np.tile(alive, len(sim.chasers))
+        hit, _ = sim.chasers.sweep_test(sim.coins.x[coins], sim.coins.y[coins], owners, start_x, start_y)
+        assert np.array_equal(np.sort(found), np.sort(coins[hit]))
+        sim.apply_hits(found)
+
+
+def test_fast_draw_picks_winners_like_the_game():
+    # Few coins, so many draws run quickly. A loose alpha: this is to catch a wrong formula, not a small bias.
+    p_value = compare_fast_draw([1, 1, 2, 2, 3, 3, 4, 5], 2, 150, 400, 300, seed=3)
+    assert p_value > 0.001
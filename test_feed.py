@@ -0,0 +1,81 @@
+"""
+Tests of the WebSocket framing of the live feed, and of a subscriber following a feed.
+
+python -m pytest -q
+"""
+import base64
+import json
+import os
+import socket
+
+import numpy as np
+import pytest
+
+from feed import _OP_CLOSE, _OP_PING, _OP_TEXT, EventFeed, accept_key, decode_frame, encode_frame
+from simulation import Hits
+
+
+@pytest.mark.parametrize("length", [0, 125, 126, 65535, 65536])
+@pytest.mark.parametrize("mask", [False, True])
+def test_frames_round_trip(length, mask):
+    payload = os.urandom(length)
+    frame = encode_frame(payload, _OP_PING, mask=mask)
+    assert decode_frame(frame + b"next") == (_OP_PING, payload, len(frame))
+    # A frame cut anywhere is not complete yet
+    for end in (0, 1, 3, 9, len(frame) - 1):
+        if end < len(frame):
+            assert decode_frame(frame[:end]) is None
+
+
+def test_frames_as_in_the_rfc():
+    # RFC 6455, section 5.7: "Hello" unmasked and masked with the key 37 fa 21 3d
+    assert encode_frame(b"Hello") == bytes.fromhex("810548656c6c6f")
+    assert decode_frame(bytes.fromhex("818537fa213d7f9f4d5158")) == (_OP_TEXT, b"Hello", 11)
+    # RFC 6455, section 1.3
+    assert accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+
+def receive_event(connection: socket.socket, buffer: bytes):
+    """ The next frame from the feed, and what is left in the buffer """
+    while True:
+        frame = decode_frame(buffer)
+        if frame is not None:
+            opcode, payload, used = frame
+            return opcode, payload, buffer[used:]
+        data = connection.recv(65536)
+        assert data, "feed closed the connection"
+        buffer += data
+
+
+def test_subscriber_follows_the_draw():
+    names = ["Anna", "Ben", "Cem"]
+    feed = EventFeed(names.__getitem__, port=0)
+    connection = socket.create_connection(feed.address, timeout=10)
+    try:
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        connection.sendall(f"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode("ascii"))
+        buffer = b""
+        while b"\r\n\r\n" not in buffer:
+            buffer += connection.recv(4096)
+        response, _, buffer = buffer.partition(b"\r\n\r\n")
+        assert accept_key(key) in response.decode("latin-1")
+
+        opcode, payload, buffer = receive_event(connection, buffer)
+        assert opcode == _OP_TEXT and json.loads(payload)["type"] == "hello"
+
+        feed.publish_tick(5, 0.1, 2, Hits(np.array([0, 2]), np.array([1, -1])))
+        opcode, payload, buffer = receive_event(connection, buffer)
+        event = json.loads(payload)
+        assert event["tick"] == 5 and event["remaining"] == 2
+        assert event["hits"] == [{"name": "Anna", "lives": 1}, {"name": "Cem", "lives": 0}]
+
+        feed.publish_winners([("Anna", "Fahrrad\n")])
+        opcode, payload, buffer = receive_event(connection, buffer)
+        assert json.loads(payload)["winners"] == [{"name": "Anna", "prize": "Fahrrad"}]
+
+        feed.close()
+        opcode, _, _ = receive_event(connection, buffer)
+        assert opcode == _OP_CLOSE
+    finally:
+        connection.close()
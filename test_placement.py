@@ -0,0 +1,75 @@
+"""
+Tests of the occupancy grid that places and respawns coins.
+
+python -m pytest -q
+"""
+import numpy as np
+
+from placement import KEEP_OUT, KEEP_OUT_TRIES, Placement
+
+WIDTH = 800
+HEIGHT = 600
+MARGIN = 20
+
+
+def check_cells(placement: Placement):
+    """ The free list is a permutation, position its inverse, and the taken cells are exactly the coins' cells """
+    free = np.frombuffer(placement.free, dtype=np.int32)
+    position = np.frombuffer(placement.position, dtype=np.int32)
+    assert sorted(free.tolist()) == list(range(len(free)))
+    assert (position[free] == np.arange(len(free))).all()
+    taken = placement.cell_of[placement.cell_of >= 0]
+    assert len(np.unique(taken)) == len(taken)
+    assert sorted(free[placement.free_count:].tolist()) == sorted(taken.tolist())
+    assert not any(placement.blocked)
+
+
+def test_place_respawn_and_release_keep_the_free_list():
+    rng = np.random.default_rng(5)
+    size = 300
+    placement = Placement(WIDTH, HEIGHT, MARGIN, size)
+    x, y = placement.place(np.arange(size), rng)
+    check_cells(placement)
+    assert placement.free_count == len(placement.free) - size
+
+    alive = np.ones(size, dtype=bool)
+    boxes = tuple(np.array([value], dtype=np.float32) for value in (300, 200, 340, 240))
+    for _ in range(200):
+        hit = rng.choice(np.flatnonzero(alive), 5, replace=False)
+        x[hit], y[hit] = placement.respawn(hit, boxes, rng.random((2 + KEEP_OUT_TRIES) * len(hit)))
+        eliminated = rng.choice(np.flatnonzero(alive), 1)
+        placement.release(eliminated)
+        alive[eliminated] = False
+        check_cells(placement)
+    assert (placement.cell_of[~alive] == -1).all()
+
+    # Coins stay in their cells
+    placed = np.flatnonzero(placement.cell_of >= 0)
+    columns = ((x[placed] - MARGIN) // placement.cell_size).astype(int)
+    rows = ((y[placed] - MARGIN) // placement.cell_size).astype(int)
+    assert (rows * placement.columns + columns == placement.cell_of[placed]).all()
+
+
+def test_respawn_avoids_the_chasers():
+    rng = np.random.default_rng(8)
+    size = 50
+    placement = Placement(WIDTH, HEIGHT, MARGIN, size)
+    placement.place(np.arange(size), rng)
+    boxes = tuple(np.array([value], dtype=np.float32) for value in (300, 200, 340, 240))
+    for _ in range(100):
+        x, y = placement.respawn(np.arange(10), boxes, rng.random((2 + KEEP_OUT_TRIES) * 10))
+        near = (x > 300 - KEEP_OUT) & (x < 340 + KEEP_OUT) & (y > 200 - KEEP_OUT) & (y < 240 + KEEP_OUT)
+        assert not near.any()
+    check_cells(placement)
+
+
+def test_state_restores_the_free_list():
+    rng = np.random.default_rng(2)
+    placement = Placement(WIDTH, HEIGHT, MARGIN, 100)
+    placement.place(np.arange(100), rng)
+    placement.release(np.arange(0, 100, 3))
+
+    restored = Placement(WIDTH, HEIGHT, MARGIN, 100)
+    restored.set_state(placement.get_state())
+    check_cells(restored)
+    assert restored.free == placement.free and restored.position == placement.position
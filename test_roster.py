@@ -0,0 +1,99 @@
+"""
+Tests of reading the roster from .xlsx, .csv and .tsv files.
+
+python -m pytest -q
+"""
+import zipfile
+
+import pytest
+
+from roster import RosterError, load_roster
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+ xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Lose" sheetId="1" r:id="rId1"/></sheets></workbook>"""
+
+_RELATIONS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+ Target="worksheets/sheet1.xml"/></Relationships>"""
+
+_MAIN = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+
+
+def write_xlsx(path, rows: str, shared_strings: str = None) -> str:
+    """ A minimal .xlsx with one worksheet of the given <row> elements """
+    filename = str(path / "lose.xlsx")
+    with zipfile.ZipFile(filename, "w") as archive:
+        archive.writestr("xl/workbook.xml", _WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", _RELATIONS)
+        archive.writestr("xl/worksheets/sheet1.xml", f"<worksheet {_MAIN}><sheetData>{rows}</sheetData></worksheet>")
+        if shared_strings is not None:
+            archive.writestr("xl/sharedStrings.xml", f"<sst {_MAIN}>{shared_strings}</sst>")
+    return filename
+
+
+def test_empty_shared_string_keeps_the_indices(tmp_path):
+    # Excel writes an empty shared string as <si/>, the strings after it must keep their index
+    shared_strings = ("<si><t>Name</t></si><si><t>Lose</t></si><si/>"
+                      "<si><r><t>Ann</t></r><r><rPr><b/></rPr><t>a</t></r><rPh><t>ア</t></rPh></si>"
+                      "<si><t>B&amp;B</t></si>")
+    rows = ('<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+            '<row r="2"><c r="A2" t="s"><v>2</v></c><c r="B2"><v>5</v></c></row>'
+            '<row r="3"><c r="A3" t="s"><v>3</v></c><c r="B3"><v>2</v></c></row>'
+            '<row r="4"><c r="A4" t="s"><v>4</v></c><c r="B4"><v>3.0</v></c></row>')
+    roster = load_roster(write_xlsx(tmp_path, rows, shared_strings))
+    assert list(roster.names) == ["Anna", "B&B"]
+    assert roster.lives.tolist() == [2, 3]
+
+
+def test_xlsx_error_names_the_row_shown_in_excel(tmp_path):
+    rows = ('<row r="1"><c r="A1" t="inlineStr"><is><t>Name</t></is></c>'
+            '<c r="B1" t="inlineStr"><is><t>Lose</t></is></c></row>'
+            '<row r="5"><c r="A5" t="inlineStr"><is><t>Ann</t></is></c><c r="B5"><v>2</v></c></row>'
+            '<row r="9"><c r="A9" t="inlineStr"><is><t>Bob</t></is></c><c r="B9"><v>1.5</v></c></row>')
+    with pytest.raises(RosterError, match="Zeile 9"):
+        load_roster(write_xlsx(tmp_path, rows))
+
+
+def test_inline_strings_and_gaps(tmp_path):
+    # Cells may be missing in the middle of a row and come in any attribute order
+    rows = ('<row r="1"><c r="A1" t="inlineStr"><is><t>Nr</t></is></c>'
+            '<c r="C1" t="inlineStr"><is><t>Name</t></is></c><c t="inlineStr" r="D1"><is><t>Lose</t></is></c></row>'
+            '<row r="2"><c r="C2" t="inlineStr"><is><t xml:space="preserve"> Eva </t></is></c>'
+            '<c r="D2"><v>4</v></c></row>'
+            '<row r="3"><c r="A3"><v>3</v></c></row>'
+            '<row r="4"><c r="C4" t="inlineStr"><is><t>Eva</t></is></c><c r="D4"><v>1</v></c></row>')
+    roster = load_roster(write_xlsx(tmp_path, rows))
+    assert list(roster.names) == ["Eva"]
+    assert roster.lives.tolist() == [5]
+
+
+@pytest.mark.parametrize("extension, text", [
+    (".csv", "Name,Lose\nAnn,2\nBob,1\nAnn,3\n"),
+    # German Excel writes semicolons, and a byte order mark
+    (".csv", "\ufeffName;Lose\nAnn;2\nBob;1\nAnn;3\n"),
+    (".tsv", "Lose\tName\n2\tAnn\n1\tBob\n3\tAnn\n"),
+])
+def test_delimited_files(tmp_path, extension, text):
+    filename = tmp_path / f"lose{extension}"
+    filename.write_text(text, encoding="utf-8")
+    roster = load_roster(str(filename))
+    assert list(roster.names) == ["Ann", "Bob"]
+    assert roster.lives.tolist() == [5, 1]
+    assert list(roster._replace(names=roster.names[:1]).names) == ["Ann"]
+
+
+def test_csv_error_names_the_line(tmp_path):
+    filename = tmp_path / "lose.csv"
+    filename.write_text("Name,Lose\nAnn,2\n\nBob,zwei\n", encoding="utf-8")
+    with pytest.raises(RosterError, match="Zeile 4"):
+        load_roster(str(filename))
+
+
+def test_missing_column(tmp_path):
+    filename = tmp_path / "lose.csv"
+    filename.write_text("Name,Tickets\nAnn,2\n", encoding="utf-8")
+    with pytest.raises(RosterError, match="Lose"):
+        load_roster(str(filename))
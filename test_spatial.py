@@ -0,0 +1,57 @@
+"""
+Tests of the spatial grid against a brute-force search over all coins.
+
+python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+import spatial
+from spatial import GRID_CELL_SIZE, SpatialGrid
+
+WIDTH = 1920
+HEIGHT = 1080
+
+
+def brute_force(grid: SpatialGrid, x: np.ndarray, y: np.ndarray, alive: np.ndarray,
+                box: np.ndarray) -> np.ndarray:
+    """ Coins in the cells overlapping a box, checked one by one """
+    left, bottom, right, top = box
+    first_column, last_column = max(int(left // GRID_CELL_SIZE), 0), min(int(right // GRID_CELL_SIZE), grid.columns - 1)
+    first_row, last_row = max(int(bottom // GRID_CELL_SIZE), 0), min(int(top // GRID_CELL_SIZE), grid.rows - 1)
+    cells = grid.cell_ids(x, y)
+    column, row = cells % grid.columns, cells // grid.columns
+    return np.flatnonzero(alive & (column >= first_column) & (column <= last_column) &
+                          (row >= first_row) & (row <= last_row))
+
+
+@pytest.mark.parametrize("rebuild_min_changes", [50, 1000000])
+def test_queries_match_brute_force(monkeypatch, rebuild_min_changes):
+    # Once with rebuilds now and then, once with every change kept in the moved coins
+    monkeypatch.setattr(spatial, "REBUILD_MIN_CHANGES", rebuild_min_changes)
+    rng = np.random.default_rng(0)
+    size = 2000
+    grid = SpatialGrid(WIDTH, HEIGHT, size)
+    # Some coins a little off the field, they are clamped to the border cells
+    x = rng.uniform(-10, WIDTH + 10, size)
+    y = rng.uniform(-10, HEIGHT + 10, size)
+    alive = np.ones(size, dtype=bool)
+    grid.insert(np.arange(size), x, y)
+
+    for step in range(150):
+        moved = rng.choice(np.flatnonzero(alive), 20, replace=False)
+        x[moved], y[moved] = rng.random(20) * WIDTH, rng.random(20) * HEIGHT
+        grid.move(moved, x[moved], y[moved])
+        if step % 3 == 0:
+            removed = rng.choice(np.flatnonzero(alive), 5, replace=False)
+            alive[removed] = False
+            grid.remove(removed)
+
+        left, bottom = rng.random(4) * WIDTH, rng.random(4) * HEIGHT
+        boxes = np.array([left, bottom, left + rng.random(4) * 300, bottom + rng.random(4) * 300])
+        candidates, owners = grid.query_many(*boxes)
+        for k in range(boxes.shape[1]):
+            found = candidates[owners == k]
+            assert len(found) == len(np.unique(found))
+            assert np.array_equal(np.sort(found), brute_force(grid, x, y, alive, boxes[:, k]))
+        assert np.array_equal(np.sort(grid.query(*boxes[:, 0])), np.sort(candidates[owners == 0]))
@@ -0,0 +1,75 @@
+"""
+Tests of the snapshots the worker process hands to the game, and of a worker that dies.
+
+python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from checkpoint import roster_digest
+from eventlog import DrawSettings
+from simulation import DEFAULT_CHASERS, Simulation
+from worker import SimulationWorker, SnapshotBuffer, WorkerError, _SharedSnapshots, follow
+
+NAMES = [f"Person {i}" for i in range(300)]
+LIVES = np.random.default_rng(7).integers(1, 6, len(NAMES)).astype(np.int32)
+PRIZES = 10
+WIDTH = 800
+HEIGHT = 600
+SEED = 1234
+CHASERS = 4
+
+
+def new_simulation() -> Simulation:
+    return Simulation(NAMES, LIVES, PRIZES, WIDTH, HEIGHT, seed=SEED)
+
+
+def test_follower_catches_up_with_the_snapshots():
+    sim = new_simulation()
+    shared = _SharedSnapshots(bytearray(_SharedSnapshots.size(len(NAMES), CHASERS)), len(NAMES), CHASERS)
+    follower = new_simulation()
+    for _ in range(5):
+        sim.run(sim.tick + 40)
+        shared.publish(sim)
+        follow(follower, shared.buffers[int(shared.latest[0])].read())
+
+        assert follower.tick == sim.tick
+        for column in ("x", "y", "lives", "tier", "alive"):
+            assert np.array_equal(getattr(follower.coins, column), getattr(sim.coins, column)), column
+        assert np.array_equal(follower.coins.alive_index, sim.coins.alive_index)
+        assert np.array_equal(follower.chasers.x, sim.chasers.x)
+        assert np.array_equal(follower.grid.cell_of, sim.grid.cell_of)
+
+
+def test_snapshot_being_written_is_not_read():
+    buffer = SnapshotBuffer(bytearray(SnapshotBuffer.size(len(NAMES), CHASERS)), 0, len(NAMES), CHASERS)
+    buffer.write(new_simulation())
+    assert buffer.read() is not None
+
+    # The writer is in the middle of a snapshot
+    buffer.arrays["sequence"][0] += 1
+    assert buffer.read() is None
+    buffer.arrays["sequence"][0] += 1
+
+    # The writer started and finished another snapshot while this one was copied
+    class Overwritten(dict):
+        def items(self):
+            self["sequence"][0] += 2
+            return super().items()
+
+    buffer.arrays = Overwritten(buffer.arrays)
+    assert buffer.read() is None
+
+
+def test_worker_that_dies_is_reported():
+    settings = DrawSettings(SEED, roster_digest(NAMES, LIVES), PRIZES, WIDTH, HEIGHT, list(DEFAULT_CHASERS), 2, None)
+    worker = SimulationWorker(settings, NAMES, LIVES, [f"Preis {i}" for i in range(PRIZES)])
+    try:
+        worker.process.kill()
+        worker.process.join()
+        # What the worker published before it died may still be read once, after that it is an error
+        with pytest.raises(WorkerError):
+            for _ in range(2):
+                worker.snapshot()
+    finally:
+        worker.close()
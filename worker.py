@@ -0,0 +1,376 @@
+"""
+The draw in a worker process, so a slow frame (GC pause, text drawing, audio decoding) does not hold it back.
+
+The worker steps the draw at a steady FRAME_RATE on its own core and after every tick publishes a snapshot
+of coins and chasers into shared memory. There are two snapshot buffers, written in turn, each with a sequence
+number that is odd while the buffer is being written: the game copies the latest complete snapshot when it
+draws a frame and retries in the rare case the worker came round to that buffer meanwhile. Neither side
+ever waits for the other.
+
+The worker also does what belongs to the course of the draw: target-duration pacing, the event log and the
+checkpoints. The winners come back through a pipe once the draw is over.
+
+Try it without a window, with frames that take 50 ms to draw:
+python worker.py -i TombolaLose.xlsx -p prizes.txt --frame-ms 50
+"""
+import argparse
+import atexit
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from checkpoint import CheckpointWriter, roster_digest
+from eventlog import DrawSettings, EventLogWriter
+from pacing import MAX_CHASERS
+from roster import RosterError, load_roster
+from simulation import FRAME_RATE, Hits, Simulation, read_prizes
+
+# Snapshot fields: name, type, and whether there is one per coin, one per chaser or a single one
+_FIELDS = (
+    ("sequence", np.uint64, "one"),
+    ("tick", np.int64, "one"),
+    ("elapsed", np.float64, "one"),
+    ("chaser_count", np.int64, "one"),
+    ("chaser_x", np.float64, "chaser"),
+    ("chaser_y", np.float64, "chaser"),
+    ("chaser_speed", np.float64, "chaser"),
+    ("chaser_change_x", np.float64, "chaser"),
+    ("chaser_change_y", np.float64, "chaser"),
+    ("chaser_cur_texture", np.int32, "chaser"),
+    ("chaser_face_direction", np.int8, "chaser"),
+    ("coin_x", np.float32, "coin"),
+    ("coin_y", np.float32, "coin"),
+    ("coin_lives", np.int32, "coin"),
+    ("coin_tier", np.int8, "coin"),
+    ("coin_alive", np.bool_, "coin"),
+)
+
+# The worker falls this far behind before it stops catching up and continues from now
+MAX_LAG = 0.25
+
+# Seconds to wait for the worker to start, numpy has to be imported in a fresh process
+START_TIMEOUT = 30.0
+
+# Attempts to read a snapshot that the worker is overwriting at the same moment
+READ_RETRIES = 5
+
+
+class WorkerError(ValueError):
+    """ The draw cannot be started or failed in the worker process """
+
+
+class SnapshotBuffer:
+    """
+    One snapshot, as numpy arrays over a piece of shared memory.
+    :param buffer: the shared memory
+    :param offset: where this snapshot starts in it
+    :param coins: number of coins
+    :param chasers: most chasers a snapshot can hold
+    """
+
+    def __init__(self, buffer, offset: int, coins: int, chasers: int):
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, dtype, per in _FIELDS:
+            count = {"one": 1, "chaser": chasers, "coin": coins}[per]
+            self.arrays[name] = np.ndarray((count,), dtype=dtype, buffer=buffer, offset=offset)
+            # Keep every field 8-byte aligned
+            offset += -(-count * np.dtype(dtype).itemsize // 8) * 8
+        self.end = offset
+
+    @staticmethod
+    def size(coins: int, chasers: int) -> int:
+        return sum(-(-{"one": 1, "chaser": chasers, "coin": coins}[per] * np.dtype(dtype).itemsize // 8) * 8
+                   for _, dtype, per in _FIELDS)
+
+    def write(self, sim: Simulation):
+        """ Copy the state of the draw in; the sequence number is odd meanwhile """
+        arrays = self.arrays
+        arrays["sequence"][0] += 1
+        arrays["tick"][0] = sim.tick
+        arrays["elapsed"][0] = sim.elapsed
+
+        chasers = sim.chasers
+        count = min(len(chasers), len(arrays["chaser_x"]))
+        arrays["chaser_count"][0] = count
+        for column in ("x", "y", "speed", "change_x", "change_y", "cur_texture", "face_direction"):
+            arrays["chaser_" + column][:count] = getattr(chasers, column)[:count]
+
+        coins = sim.coins
+        arrays["coin_x"][:] = coins.x
+        arrays["coin_y"][:] = coins.y
+        arrays["coin_lives"][:] = coins.lives
+        arrays["coin_tier"][:] = coins.tier
+        arrays["coin_alive"][:] = coins.alive
+        arrays["sequence"][0] += 1
+
+    def read(self) -> Optional[Dict[str, np.ndarray]]:
+        """ A copy of the snapshot, None if it was being written while copying """
+        sequence = int(self.arrays["sequence"][0])
+        if sequence % 2:
+            return None
+        count = int(self.arrays["chaser_count"][0])
+        snapshot = {name: array[:count].copy() if name.startswith("chaser_") and name != "chaser_count"
+                    else array.copy() for name, array in self.arrays.items()}
+        if int(self.arrays["sequence"][0]) != sequence:
+            return None
+        return snapshot
+
+
+class _SharedSnapshots:
+    """ Index of the latest complete snapshot, followed by the two snapshot buffers """
+
+    def __init__(self, buffer, coins: int, chasers: int):
+        self.latest = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=0)
+        first = SnapshotBuffer(buffer, 8, coins, chasers)
+        self.buffers = (first, SnapshotBuffer(buffer, first.end, coins, chasers))
+
+    @staticmethod
+    def size(coins: int, chasers: int) -> int:
+        return 8 + 2 * SnapshotBuffer.size(coins, chasers)
+
+    def publish(self, sim: Simulation):
+        back = 1 - int(self.latest[0])
+        self.buffers[back].write(sim)
+        self.latest[0] = back
+
+
+def follow(sim: Simulation, snapshot: Dict[str, np.ndarray]) -> Hits:
+    """
+    Bring a simulation that is not stepped itself up to a snapshot from the worker.
+    :return: the coins whose lives changed since the previous snapshot, like the hits of a tick
+    """
+    coins = sim.coins
+    changed = np.flatnonzero(snapshot["coin_lives"] != coins.lives)
+    lives = snapshot["coin_lives"][changed]
+    coins.lives[changed] = lives
+    coins.x[changed] = snapshot["coin_x"][changed]
+    coins.y[changed] = snapshot["coin_y"][changed]
+    coins.tier[changed] = snapshot["coin_tier"][changed]
+
+    # Keep the spatial index in step, the level of detail looks up coins near the chasers in it
+    respawned = changed[lives > 0]
+    eliminated = changed[lives <= 0]
+    sim.grid.move(respawned, coins.x[respawned], coins.y[respawned])
+    if len(eliminated):
+        coins.alive[eliminated] = False
+        coins.alive_index = np.flatnonzero(coins.alive)
+        sim.grid.remove(eliminated)
+
+    chasers = sim.chasers
+    count = int(snapshot["chaser_count"][0])
+    if count > len(chasers):
+        characters = [sim.characters[i % len(sim.characters)] for i in range(len(chasers), count)]
+        chasers.add(characters, snapshot["chaser_x"][len(chasers):], snapshot["chaser_y"][len(chasers):], 0)
+    chasers.truncate(count)
+    for column in ("x", "y", "speed", "change_x", "change_y", "cur_texture", "face_direction"):
+        getattr(chasers, column)[:] = snapshot["chaser_" + column]
+
+    sim.tick = int(snapshot["tick"][0])
+    sim.elapsed = float(snapshot["elapsed"][0])
+    return Hits(changed, lives)
+
+
+def _work(memory_name: str, chaser_capacity: int, settings: DrawSettings, names: Sequence[str], lives: np.ndarray,
+          prizes: List[str], resume_state: Optional[Dict[str, np.ndarray]], event_log: Optional[str],
+          checkpoint: Optional[str], connection, stop):
+    """ Entry point of the worker process. Errors while starting are sent back, later ones end the process. """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    log = None
+    checkpoints = None
+    try:
+        shared = _SharedSnapshots(memory.buf, len(names), chaser_capacity)
+        sim, pacing = settings.simulation(names, lives)
+        if resume_state is not None:
+            sim.set_state(resume_state)
+            if pacing is not None:
+                pacing.set_state(resume_state)
+        if event_log is not None:
+            log = EventLogWriter.resume(event_log, sim.tick) if resume_state is not None else \
+                EventLogWriter.create(event_log, settings)
+        if checkpoint is not None:
+            checkpoints = CheckpointWriter(checkpoint, roster_digest(names, lives))
+    except (OSError, ValueError) as error:
+        connection.send(("error", str(error)))
+        memory.close()
+        return
+
+    shared.publish(sim)
+    connection.send(("ready", None))
+
+    # Fixed time step: the same frame time every tick, on a steady clock
+    delta_time = 1 / FRAME_RATE
+    next_tick = time.perf_counter()
+    while not sim.finished and not stop.is_set():
+        next_tick += delta_time
+        wait = next_tick - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        elif wait < -MAX_LAG:
+            next_tick = time.perf_counter()
+
+        hits = sim.step(delta_time)
+        if pacing is not None:
+            pacing.update(hits, delta_time)
+        if log is not None:
+            log.record(sim.tick, delta_time, hits)
+        if checkpoints is not None and checkpoints.due:
+            if log is not None:
+                log.flush()
+            state = sim.get_state()
+            if pacing is not None:
+                state.update(pacing.get_state())
+            checkpoints.save(state)
+        shared.publish(sim)
+
+    if sim.finished:
+        connection.send(("winners", sim.winners_with_prizes(prizes)))
+    if log is not None:
+        log.close()
+    if checkpoints is not None:
+        checkpoints.close(remove=sim.finished)
+    memory.close()
+
+
+class SimulationWorker:
+    """
+    Runs a draw in a worker process and hands out its latest state.
+    :param settings: settings of the draw
+    :param names: player names, one per coin
+    :param lives: lives per coin
+    :param prizes: prizes, handed out by the worker at the end so the draw stays reproducible
+    :param resume_state: saved state to continue from, None for a new draw
+    :param event_log: file to log every tick to, None for no log
+    :param checkpoint: file to save the state to every few seconds, None for no checkpoints
+    :raises WorkerError: if the worker cannot start the draw, e.g. the log does not fit the saved state
+    """
+
+    def __init__(self, settings: DrawSettings, names: Sequence[str], lives: np.ndarray, prizes: List[str],
+                 resume_state: Optional[Dict[str, np.ndarray]] = None, event_log: Optional[str] = None,
+                 checkpoint: Optional[str] = None):
+        chasers = max(MAX_CHASERS, settings.chaser_count)
+        self.memory = shared_memory.SharedMemory(create=True, size=_SharedSnapshots.size(len(names), chasers))
+        self.shared = _SharedSnapshots(self.memory.buf, len(names), chasers)
+        self.last_read: Tuple[int, int] = (-1, -1)
+        self.result: Optional[List[Tuple[str, str]]] = None
+
+        # Spawn, not fork: the same on Windows, and the game's window and threads stay out of the worker
+        context = multiprocessing.get_context("spawn")
+        self.stop = context.Event()
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_work, name="simulation", daemon=True,
+                                       args=(self.memory.name, chasers, settings, names, lives, prizes,
+                                             resume_state, event_log, checkpoint, child, self.stop))
+        self.process.start()
+        atexit.register(self.close)
+
+        start = time.perf_counter()
+        while not self.connection.poll(0.1):
+            if not self.process.is_alive() or time.perf_counter() - start > START_TIMEOUT:
+                self.close()
+                raise WorkerError("Simulationsprozess startet nicht")
+        kind, message = self.connection.recv()
+        if kind == "error":
+            self.close()
+            raise WorkerError(message)
+
+    def snapshot(self) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Copy of the latest state, None if there is none newer than the one read before.
+        :raises WorkerError: if there is none because the worker process has ended
+        """
+        for _ in range(READ_RETRIES):
+            latest = int(self.shared.latest[0])
+            buffer = self.shared.buffers[latest]
+            if (latest, int(buffer.arrays["sequence"][0])) == self.last_read:
+                break
+            snapshot = buffer.read()
+            if snapshot is not None:
+                self.last_read = (latest, int(snapshot["sequence"][0]))
+                return snapshot
+        # Nothing new: the worker may be gone
+        self.winners()
+        return None
+
+    def winners(self) -> Optional[List[Tuple[str, str]]]:
+        """
+        Winners with their prizes once the draw is over, None before.
+        :raises WorkerError: if the worker process has ended without them, e.g. it crashed
+        """
+        if self.result is None and self.connection.poll():
+            try:
+                self.result = self.connection.recv()[1]
+            except EOFError:
+                # The worker is gone, a message it sent would have come first
+                pass
+        if self.result is None and not self.process.is_alive():
+            raise WorkerError(f"Simulationsprozess ist abgebrochen (Exit-Code {self.process.exitcode})")
+        return self.result
+
+    def close(self):
+        """ Stop the worker, which saves its log and checkpoint, and free the shared memory """
+        if self.memory is None:
+            return
+        self.stop.set()
+        self.process.join(timeout=5)
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+        atexit.unregister(self.close)
+
+
+def main():
+    """ Run a draw in a worker while pretending to draw slow frames, and show that the tick rate stays steady """
+
+    parser = argparse.ArgumentParser(description='Ziehung im Simulationsprozess ohne Fenster durchspielen.')
+    parser.add_argument('-i', metavar='excelfile', dest='excelfile', type=str, required=True,
+                        help='Pfad zur Excel- (.xlsx), CSV- oder TSV-Datei, die die Namen und Lose enthält.')
+    parser.add_argument('-p', metavar='prizes', dest='prizes', type=str, required=True,
+                        help='Pfad zu einer .txt-Datei, die die Preise enthält.')
+    parser.add_argument('--frame-ms', type=float, default=50.0, help='Dauer eines simulierten Bildes in ms.')
+    parser.add_argument('--chasers', type=int, default=2, help='Anzahl Jäger.')
+    parser.add_argument('--seed', type=int, default=None, help='Startwert für den Zufallsgenerator.')
+
+    args = parser.parse_args()
+
+    try:
+        roster = load_roster(args.excelfile)
+    except RosterError as error:
+        parser.error(str(error))
+    prizes = read_prizes(args.prizes)
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    settings = DrawSettings(seed, roster_digest(roster.names, roster.lives), len(prizes), 1920, 1080,
+                            ['Mabel', 'Robin'], args.chasers, None)
+    mirror, _ = settings.simulation(roster.names, roster.lives)
+
+    start = time.perf_counter()
+    worker = SimulationWorker(settings, roster.names, roster.lives, prizes)
+    print(f"Simulationsprozess gestartet in {time.perf_counter() - start:.1f}s")
+
+    frames = 0
+    report = time.perf_counter()
+    report_tick = 0
+    try:
+        while worker.winners() is None:
+            snapshot = worker.snapshot()
+            if snapshot is not None:
+                follow(mirror, snapshot)
+            time.sleep(args.frame_ms / 1000)
+            frames += 1
+            now = time.perf_counter()
+            if now - report >= 2:
+                print(f"{(mirror.tick - report_tick) / (now - report):5.1f} Ticks/s bei "
+                      f"{frames / (now - report):4.1f} Bildern/s, {mirror.remaining} Lose")
+                report, report_tick, frames = now, mirror.tick, 0
+    except WorkerError as error:
+        worker.close()
+        parser.error(str(error))
+    worker.close()
+    for (name, prize) in worker.winners():
+        print(f"{name} - {prize.strip()}")
+
+
+if __name__ == "__main__":
+    main()